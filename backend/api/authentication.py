@@ -0,0 +1,152 @@
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+
+from foodgram.constants import TOKEN_CACHE_MAX_SIZE, TOKEN_CACHE_TTL
+
+
+class TokenCache:
+    """
+    Кэш токен -> (юзер, токен) в памяти процесса.
+    LRU с ограничением размера и временем жизни записи.
+    Каждое чтение сверяет поколение юзера в общем кэше CACHES['shared']:
+    выход, смена пароля или блокировка в одном процессе сразу видны всем
+    остальным. При SHARED=True в общий кэш дублируются и сами записи.
+    """
+    key_prefix = 'auth-token'
+
+    def __init__(self, max_size, ttl, shared=False, cache_alias='shared'):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared = shared
+        self.cache_alias = cache_alias
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _generation_key(self, user_id):
+        return f'{self.key_prefix}-gen:{user_id}'
+
+    def _token_key(self, key):
+        return f'{self.key_prefix}:{key}'
+
+    def _generation(self, user_id):
+        """
+        Поколение юзера, случайная строка. Если ключа нет (ещё не было
+        или вытеснен), создаётся новое: записи со старым не совпадут.
+        """
+        generation_key = self._generation_key(user_id)
+        generation = self.cache.get(generation_key)
+        if generation is None:
+            self.cache.add(generation_key, uuid.uuid4().hex, None)
+            generation = self.cache.get(generation_key)
+        return generation
+
+    def _is_valid(self, entry):
+        user, token, generation, expires = entry
+        return (expires > time.monotonic()
+                and generation == self._generation(user.pk))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None and self.shared:
+            entry = self.cache.get(self._token_key(key))
+            if entry is not None:
+                entry = entry[:3] + (time.monotonic() + self.ttl,)
+        if entry is None or not self._is_valid(entry):
+            with self._lock:
+                self.misses += 1
+            return None
+        self._store(key, entry, hit=True)
+        return entry[0], entry[1]
+
+    def set(self, key, user, token):
+        entry = (
+            user, token, self._generation(user.pk),
+            time.monotonic() + self.ttl
+        )
+        self._store(key, entry)
+        if self.shared:
+            self.cache.set(self._token_key(key), entry, self.ttl)
+
+    def _store(self, key, entry, hit=False):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id):
+        """
+        Удаление всех записей юзера: выход, смена пароля, блокировка.
+        Поколение меняется ещё раз после коммита: до него другой процесс
+        мог прочитать из базы старый токен и закэшировать его.
+        """
+        with self._lock:
+            stale = [
+                key for key, (user, *_) in self._entries.items()
+                if user.pk == user_id
+            ]
+            for key in stale:
+                del self._entries[key]
+        self._next_generation(user_id)
+        transaction.on_commit(lambda: self._next_generation(user_id))
+
+    def _next_generation(self, user_id):
+        self.cache.set(self._generation_key(user_id), uuid.uuid4().hex, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Количество попаданий и промахов кэша в текущем процессе."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+            }
+
+
+token_cache = TokenCache(
+    max_size=settings.TOKEN_CACHE.get('MAX_SIZE', TOKEN_CACHE_MAX_SIZE),
+    ttl=settings.TOKEN_CACHE.get('TTL', TOKEN_CACHE_TTL),
+    shared=settings.TOKEN_CACHE.get('SHARED', False),
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Аутентификация по токену без запроса в БД на каждый запрос.
+    Токен ищется в token_cache, при промахе - обычный запрос Token + User.
+    """
+    cache = token_cache
+
+    def authenticate_credentials(self, key):
+        cached = self.cache.get(key)
+        if cached is not None:
+            user, token = cached
+            return copy.copy(user), token
+
+        user, token = super().authenticate_credentials(key)
+        self.cache.set(key, user, token)
+        return copy.copy(user), token
@@ -0,0 +1,179 @@
+"""
+Несколько запросов к API за один HTTP-запрос: POST /api/batch/.
+Подзапросы выполняются вью из api.urls напрямую, без middleware.
+Юзер берётся из внешнего запроса (DRF ForcedAuthentication через
+_force_auth_user), права и троттлинг проверяются для каждого подзапроса.
+Одинаковые GET-подзапросы выполняются один раз: общий кэш пачки -
+только их ответы. Юзер и токен не ищутся заново, остальное каждый
+подзапрос читает сам. Пачку только из GET можно выполнить параллельно
+в пуле потоков (parallel).
+"""
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+config = settings.BATCH
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Заголовки подзапроса, которые попадают в ответ пачки.
+RESPONSE_HEADERS = ('Content-Type', 'Location', 'ETag', 'Last-Modified')
+# Что копируется из внешнего запроса в подзапросы.
+ENVIRON_KEYS = (
+    'SERVER_NAME', 'SERVER_PORT', 'SERVER_PROTOCOL', 'REMOTE_ADDR',
+    'wsgi.url_scheme', 'wsgi.version', 'wsgi.multithread',
+    'wsgi.multiprocess', 'wsgi.run_once', 'wsgi.errors',
+)
+SKIPPED_HEADERS = (
+    'HTTP_CONTENT_LENGTH', 'HTTP_CONTENT_TYPE', 'HTTP_IF_NONE_MATCH',
+    'HTTP_IF_MODIFIED_SINCE', 'HTTP_ACCEPT_ENCODING',
+)
+
+
+class BatchError(Exception):
+    """Подзапрос нельзя выполнить: ответ с этим статусом и текстом."""
+
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def build_request(request, method, url, body):
+    """WSGIRequest подзапроса с заголовками и юзером внешнего запроса."""
+    parts = urlsplit(url)
+    data = b'' if body is None else json.dumps(body).encode()
+    environ = {
+        key: value for key, value in request.META.items()
+        if key in ENVIRON_KEYS
+        or key.startswith('HTTP_') and key not in SKIPPED_HEADERS
+    }
+    environ.update({
+        'REQUEST_METHOD': method,
+        'PATH_INFO': parts.path,
+        'SCRIPT_NAME': '',
+        'QUERY_STRING': parts.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(data)),
+        'HTTP_ACCEPT': 'application/json',
+        'wsgi.input': io.BytesIO(data),
+    })
+    subrequest = WSGIRequest(environ)
+    subrequest.user = request.user
+    if request.user.is_authenticated:
+        subrequest._force_auth_user = request.user
+        subrequest._force_auth_token = request.auth
+    return subrequest
+
+
+def get_view(path):
+    if not path.startswith(config['PREFIX']):
+        raise BatchError(400, f'Путь должен начинаться с {config["PREFIX"]}')
+    try:
+        match = resolve(path)
+    except Resolver404:
+        raise BatchError(404, 'Страница не найдена.')
+    if match.url_name == 'batch':
+        raise BatchError(400, 'Вложенные пачки не поддерживаются.')
+    return match
+
+
+def get_body(response):
+    if response.streaming:
+        content = b''.join(response.streaming_content)
+    else:
+        content = response.content
+    if not content:
+        return None
+    if response.get('Content-Type', '').startswith('application/json'):
+        return json.loads(content)
+    return content.decode('utf-8', errors='replace')
+
+
+def close_response(response):
+    """
+    response.close() без сигнала request_finished: его обработчик
+    закрыл бы соединения с базой, которые нужны внешнему запросу.
+    """
+    for closable in response._closable_objects:
+        closable.close()
+
+
+def run(request, method, url, body=None):
+    """Ответ одного подзапроса: status, headers, body."""
+    try:
+        match = get_view(urlsplit(url).path)
+        subrequest = build_request(request, method, url, body)
+        subrequest.resolver_match = match
+        response = match.func(subrequest, *match.args, **match.kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        result = {
+            'status': response.status_code,
+            'headers': {
+                header: response[header] for header in RESPONSE_HEADERS
+                if response.has_header(header)
+            },
+            'body': get_body(response),
+        }
+        close_response(response)
+        return result
+    except BatchError as error:
+        return {'status': error.status, 'headers': {},
+                'body': {'detail': error.detail}}
+    except Exception:
+        logger.exception('Ошибка подзапроса %s %s', method, url)
+        return {'status': 500, 'headers': {},
+                'body': {'detail': 'Ошибка сервера.'}}
+
+
+def run_in_thread(request, method, url, body=None):
+    """run() в потоке пула: соединения с базой потока закрываются."""
+    try:
+        return run(request, method, url, body)
+    finally:
+        connections.close_all()
+
+
+def run_batch(request, subrequests, parallel=False):
+    """
+    Ответы подзапросов в их порядке. subrequests - словари method, url,
+    body. parallel выполняет пачку в пуле, только если в ней нет записи.
+    """
+    keys = [
+        (item['method'], item['url'])
+        if item['method'] in SAFE_METHODS and item.get('body') is None
+        else index
+        for index, item in enumerate(subrequests)
+    ]
+    unique = {}
+    for key, item in zip(keys, subrequests):
+        unique.setdefault(key, item)
+
+    parallel = parallel and all(
+        item['method'] in SAFE_METHODS for item in subrequests
+    ) and len(unique) > 1
+    if parallel:
+        with ThreadPoolExecutor(
+                max_workers=min(config['MAX_WORKERS'], len(unique))) as pool:
+            futures = {
+                key: pool.submit(
+                    run_in_thread, request, item['method'], item['url'],
+                    item.get('body')
+                )
+                for key, item in unique.items()
+            }
+            results = {key: future.result() for key, future in futures.items()}
+    else:
+        results = {
+            key: run(request, item['method'], item['url'], item.get('body'))
+            for key, item in unique.items()
+        }
+    return [results[key] for key in keys]
@@ -0,0 +1,33 @@
+import os
+
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    С несколькими воркерами общий кэш - memcached: кэш процесса не общий,
+    а таблица в базе - запрос к ней на каждый запрос к API (поколение
+    токенов, троттлинг) и неатомарный incr.
+    """
+    workers = int(os.getenv('GUNICORN_WORKERS', default=1))
+    backend = settings.CACHES['shared']['BACKEND']
+    if workers <= 1:
+        return []
+    if backend.endswith('LocMemCache'):
+        return [Error(
+            f'CACHES["shared"] - {backend}, а GUNICORN_WORKERS={workers}: '
+            'отозванные токены будут работать в других воркерах.',
+            hint='Используйте memcached (SHARED_CACHE_BACKEND).',
+            id='api.E001',
+        )]
+    if backend.endswith('DatabaseCache'):
+        return [Error(
+            f'CACHES["shared"] - {backend}, а GUNICORN_WORKERS={workers}: '
+            'каждый запрос к API обращается к базе, счётчики троттлинга '
+            'меняются неатомарно.',
+            hint='Используйте memcached (SHARED_CACHE_BACKEND).',
+            id='api.E002',
+        )]
+    return []
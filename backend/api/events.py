@@ -0,0 +1,245 @@
+"""
+Поток событий юзера (Server-Sent Events): GET /api/events/?ticket=.
+Изменения избранного, списка покупок и подписок пишутся в UserEvent
+(api.signals) и после коммита публикуются в шину процесса. События из
+других процессов шина забирает из таблицы одним запросом раз в
+POLL_INTERVAL секунд на процесс, а не на соединение. Переподключение
+с Last-Event-ID досылает пропущенные события из таблицы.
+
+Соединение ждёт событий в очереди и не держит соединение с базой.
+Чтобы тысячи открытых потоков не занимали по потоку ОС, сервис events
+запускается gunicorn с воркером gevent (GUNICORN_WORKER_CLASS=gevent).
+EventSource не умеет передавать заголовок Authorization, поэтому поток
+открывается по подписанному билету (POST /api/events/ticket/).
+
+Контракт для клиента:
+- новый EventSource открывается по свежему билету, не старше
+  TICKET_MAX_AGE секунд;
+- поток закрывается через MAX_AGE секунд, EventSource переподключается
+  сам по тому же url с заголовком Last-Event-ID. Первое сообщение потока
+  задаёт id, поэтому Last-Event-ID есть всегда. С Last-Event-ID билет
+  принимается RETENTION_DAYS дней;
+- билет привязан к токену, с которым он выдан (в подписанных данных -
+  хеш ключа): после выхода из системы или нового входа старый билет
+  не принимается ни для нового потока, ни для переподключения;
+- ответ 403 (выход из системы, билет истёк) закрывает EventSource:
+  клиент берёт новый билет и открывает поток заново.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import BaseRenderer
+
+from recipe.models import UserEvent
+
+logger = logging.getLogger(__name__)
+
+config = settings.EVENTS
+TICKET_SALT = 'user-events'
+
+
+def get_token_hash(key):
+    """Хеш ключа токена: сам ключ в url (и в логах nginx) не попадает."""
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def get_ticket(token):
+    """Билет для юзера токена, действует, пока действует этот токен."""
+    return signing.dumps(
+        [token.user_id, get_token_hash(token.key)], salt=TICKET_SALT
+    )
+
+
+def read_ticket(ticket, reconnect=False):
+    """
+    id юзера из билета. BadSignature, если билет чужой, истёк или выдан
+    по токену, которого у юзера уже нет.
+    При переподключении (reconnect) билет действует RETENTION_DAYS:
+    события старше всё равно не хранятся.
+    """
+    max_age = (
+        config['RETENTION_DAYS'] * 24 * 60 * 60 if reconnect
+        else config['TICKET_MAX_AGE']
+    )
+    user_id, token_hash = signing.loads(
+        ticket, salt=TICKET_SALT, max_age=max_age
+    )
+    key = Token.objects.filter(
+        user_id=user_id, user__is_active=True
+    ).values_list('key', flat=True).first()
+    if key is None or not hmac.compare_digest(
+            get_token_hash(key), token_hash):
+        raise signing.BadSignature('Токен билета отозван.')
+    return user_id
+
+
+class Subscription:
+    """Очередь событий одного открытого потока."""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=config['QUEUE_SIZE'])
+        self.seen = deque(maxlen=config['QUEUE_SIZE'])
+        self.overflow = False
+
+    def put(self, event):
+        """Событие в очередь, если его ещё не было (шина и таблица)."""
+        if event['id'] in self.seen:
+            return
+        self.seen.append(event['id'])
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # Клиент не успевает читать: поток закроется, клиент
+            # переподключится с Last-Event-ID и получит события из таблицы.
+            self.overflow = True
+
+
+class EventBus:
+    """Подписки процесса по юзерам и опрос таблицы UserEvent."""
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+        self._poller = None
+        self._cursor = None
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id)
+        if self._cursor is None:
+            # Опрос начинается с событий, появившихся после подписки.
+            self._cursor = UserEvent.objects.filter(
+                created__lte=self.get_settled()
+            ).aggregate(Max('id'))['id__max'] or 0
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+            if self._poller is None:
+                self._poller = threading.Thread(
+                    target=self.run_poller, name='user-events', daemon=True
+                )
+                self._poller.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_id, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.put(event)
+
+    def get_settled(self):
+        return timezone.now() - timedelta(seconds=config['SETTLE_SECONDS'])
+
+    def poll(self):
+        """
+        События юзеров с открытыми потоками из таблицы.
+        Курсор сдвигается только по событиям старше SETTLE_SECONDS:
+        транзакция с меньшим id может закоммититься позже.
+        """
+        with self._lock:
+            user_ids = list(self._subscriptions)
+        if not user_ids:
+            return
+        settled = self.get_settled()
+        for event in UserEvent.objects.filter(
+                id__gt=self._cursor, user_id__in=user_ids):
+            self.publish(event.user_id, event.to_dict())
+            if event.created <= settled:
+                self._cursor = event.id
+
+    def run_poller(self):
+        try:
+            while True:
+                time.sleep(config['POLL_INTERVAL'])
+                with self._lock:
+                    if not self._subscriptions:
+                        self._poller = None
+                        return
+                try:
+                    self.poll()
+                except Exception:
+                    logger.exception('Ошибка опроса событий юзеров')
+                    connection.close()
+        finally:
+            connection.close()
+
+
+bus = EventBus()
+
+
+def format_event(event):
+    return (
+        f'id: {event["id"]}\nevent: {event["kind"]}\n'
+        f'data: {json.dumps(event)}\n\n'
+    )
+
+
+def stream(user_id, last_event_id=None):
+    """
+    Генератор потока SSE. Закрывается через MAX_AGE секунд или при
+    переполнении очереди, клиент переподключается сам.
+    """
+    subscription = bus.subscribe(user_id)
+    try:
+        if last_event_id is None:
+            # id без данных задаёт Last-Event-ID для переподключения.
+            cursor = UserEvent.objects.filter(
+                user_id=user_id
+            ).aggregate(cursor=Max('id'))['cursor'] or 0
+            yield f'retry: {config["RETRY_MS"]}\nid: {cursor}\n\n'
+        else:
+            yield f'retry: {config["RETRY_MS"]}\n\n'
+        if last_event_id is not None:
+            missed = list(UserEvent.objects.filter(
+                user_id=user_id, id__gt=last_event_id
+            )[:config['QUEUE_SIZE'] + 1])
+            if len(missed) > config['QUEUE_SIZE']:
+                # Пропущено слишком много: клиенту проще перечитать данные.
+                yield 'event: reset\ndata: {}\n\n'
+            else:
+                for event in missed:
+                    subscription.seen.append(event.id)
+                    yield format_event(event.to_dict())
+        # Открытый поток не держит соединение с базой.
+        connection.close()
+
+        deadline = time.monotonic() + config['MAX_AGE']
+        while time.monotonic() < deadline and not subscription.overflow:
+            try:
+                event = subscription.queue.get(timeout=config['HEARTBEAT'])
+            except queue.Empty:
+                yield ': ping\n\n'
+                continue
+            yield format_event(event)
+    finally:
+        bus.unsubscribe(subscription)
+
+
+class EventStreamRenderer(BaseRenderer):
+    """text/event-stream для согласования формата; ошибки - в JSON."""
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, ensure_ascii=False).encode()
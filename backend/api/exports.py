@@ -0,0 +1,160 @@
+"""
+Выгрузка списка покупок в txt, csv и pdf.
+Файлы строит фоновая задача shopping_list_export и кладёт в
+SHOPPING_LIST_EXPORT['ROOT'] под версией списка покупок, поэтому
+повторный запрос при неизменном списке отдаёт готовый файл.
+Скачивание - по подписанному токену, сам файл отдаёт nginx
+(X-Accel-Redirect).
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, HttpResponse
+from django.urls import reverse
+
+from .utils import aggregate_ingredients, create_text_with_ingredients
+
+TOKEN_SALT = 'shopping-list-export'
+
+# A4 при 150 dpi.
+PDF_PAGE_SIZE = (1240, 1754)
+PDF_MARGIN = 100
+PDF_FONT_SIZE = 32
+PDF_LINE_HEIGHT = 48
+
+export_storage = FileSystemStorage(
+    location=settings.SHOPPING_LIST_EXPORT['ROOT']
+)
+
+
+def get_cart_version(rows, recipes=()):
+    """
+    Версия списка покупок: хеш строк (название, единица, количество)
+    и рецептов (название, автор) из заголовка.
+    """
+    return hashlib.sha1(
+        json.dumps([rows, recipes], ensure_ascii=False).encode()
+    ).hexdigest()[:20]
+
+
+def get_export_path(user_id, version, export_format):
+    return f'shopping_lists/{user_id}/{version}.{export_format}'
+
+
+def render_txt(shopping_list, recipes=()):
+    return create_text_with_ingredients(shopping_list, recipes).encode()
+
+
+def render_csv(shopping_list, recipes=()):
+    """Таблица сумм; рецепты в таблицу не попадают."""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(('Ингредиент', 'Количество', 'Единица измерения'))
+    writer.writerows(
+        (item['name'], item['amount'], item['measurement_unit'])
+        for item in shopping_list
+    )
+    # BOM, чтобы Excel открыл файл в utf-8.
+    return output.getvalue().encode('utf-8-sig')
+
+
+def get_pdf_font():
+    from PIL import ImageFont
+
+    try:
+        return ImageFont.truetype(
+            settings.SHOPPING_LIST_EXPORT['PDF_FONT'], PDF_FONT_SIZE
+        )
+    except OSError:
+        return ImageFont.load_default()
+
+
+def render_pdf(shopping_list, recipes=()):
+    """PDF из страниц-изображений Pillow, по строке на ингредиент."""
+    # Pillow нужен только воркеру задач, веб-воркеры его не импортируют.
+    from PIL import Image, ImageDraw
+
+    font = get_pdf_font()
+    lines = create_text_with_ingredients(
+        shopping_list, recipes
+    ).splitlines()
+    per_page = (PDF_PAGE_SIZE[1] - 2 * PDF_MARGIN) // PDF_LINE_HEIGHT
+    pages = []
+    for start in range(0, len(lines), per_page):
+        page = Image.new('L', PDF_PAGE_SIZE, 255)
+        draw = ImageDraw.Draw(page)
+        for number, line in enumerate(lines[start:start + per_page]):
+            draw.text(
+                (PDF_MARGIN, PDF_MARGIN + number * PDF_LINE_HEIGHT),
+                line, font=font, fill=0
+            )
+        pages.append(page)
+    output = io.BytesIO()
+    pages[0].save(
+        output, 'PDF', save_all=True, append_images=pages[1:],
+        resolution=150
+    )
+    return output.getvalue()
+
+
+EXPORT_FORMATS = {
+    'txt': ('text/plain; charset=utf-8', render_txt),
+    'csv': ('text/csv; charset=utf-8', render_csv),
+    'pdf': ('application/pdf', render_pdf),
+}
+
+
+def build_export(user_id, rows, export_format, recipes=()):
+    """Файл выгрузки для строк списка покупок, если его ещё нет."""
+    path = get_export_path(
+        user_id, get_cart_version(rows, recipes), export_format
+    )
+    if not export_storage.exists(path):
+        render = EXPORT_FORMATS[export_format][1]
+        export_storage.save(
+            path, ContentFile(render(aggregate_ingredients(rows), recipes))
+        )
+    return path
+
+
+def get_download_info(path, request):
+    token = signing.dumps(path, salt=TOKEN_SALT)
+    return {
+        'token': token,
+        'url': request.build_absolute_uri(reverse(
+            'recipe-shopping-cart-file', kwargs={'token': token}
+        )),
+    }
+
+
+def read_download_token(token):
+    """Путь к файлу из токена. BadSignature, если токен чужой или истёк."""
+    return signing.loads(
+        token, salt=TOKEN_SALT,
+        max_age=settings.SHOPPING_LIST_EXPORT['TOKEN_MAX_AGE']
+    )
+
+
+def serve_export(path):
+    export_format = os.path.splitext(path)[1].lstrip('.')
+    content_type = EXPORT_FORMATS[export_format][0]
+    if settings.SHOPPING_LIST_EXPORT['X_ACCEL_REDIRECT']:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = (
+            settings.SHOPPING_LIST_EXPORT['X_ACCEL_PREFIX'] + path
+        )
+    else:
+        response = FileResponse(
+            export_storage.open(path), content_type=content_type
+        )
+    response['Content-Disposition'] = (
+        f'attachment; filename="shopping-list.{export_format}"'
+    )
+    return response
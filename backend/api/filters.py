@@ -1,32 +1,65 @@
-from django_filters import FilterSet, ModelMultipleChoiceFilter, NumberFilter
+from django.db.models import Exists, OuterRef
+from django_filters import FilterSet, MultipleChoiceFilter, NumberFilter
 
-from recipe.models import Recipe, Tag
+from recipe.models import Favorite, Recipe, ShoppingCart
+from .utils import get_tag_ids
+
+
+def get_tag_choices():
+    return [(slug, slug) for slug in get_tag_ids()]
 
 
 class RecipeFilterSet(FilterSet):
-    """Кастомный фильтр."""
-    is_favorited = NumberFilter(
-        field_name='is_favorited', method='filter_by_favorite'
-    )
-    is_in_shopping_cart = NumberFilter(
-        field_name='is_in_shopping_cart', method='filter_by_shopping_cart'
-    )
-    tags = ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all()
+    """
+    Кастомный фильтр.
+    Фильтры заданы явно и только по индексированным полям. Тэги и флаги
+    фильтруются через EXISTS, поэтому рецепты в выдаче не повторяются
+    и DISTINCT не нужен.
+    """
+    is_favorited = NumberFilter(method='filter_by_favorite')
+    is_in_shopping_cart = NumberFilter(method='filter_by_shopping_cart')
+    tags = MultipleChoiceFilter(
+        choices=get_tag_choices, method='filter_by_tags'
     )
 
+    def filter_by_tags(self, queryset, name, value):
+        tag_ids = get_tag_ids()
+        return queryset.annotate(
+            has_tags=Exists(Recipe.tags.through.objects.filter(
+                recipe=OuterRef('pk'),
+                tag_id__in=[tag_ids.get(slug) for slug in value]
+            ))
+        ).filter(has_tags=True)
+
+    def filter_by_user_relation(self, queryset, model, annotation):
+        """
+        Рецепты из избранного или списка покупок юзера.
+        Если вьюсет уже добавил аннотацию, фильтр идёт по ней.
+        """
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.none()
+        if annotation not in queryset.query.annotations:
+            queryset = queryset.annotate(**{annotation: Exists(
+                model.objects.filter(user=user, recipe=OuterRef('pk'))
+            )})
+        return queryset.filter(**{annotation: True})
+
     def filter_by_favorite(self, queryset, name, value):
         if value:
-            return queryset.filter(is_favorited=True)
+            return self.filter_by_user_relation(
+                queryset, Favorite, 'is_favorited'
+            )
         return queryset
 
     def filter_by_shopping_cart(self, queryset, name, value):
         if value:
-            return queryset.filter(is_in_shopping_cart=True)
+            return self.filter_by_user_relation(
+                queryset, ShoppingCart, 'is_in_shopping_cart'
+            )
         return queryset
 
     class Meta:
         model = Recipe
-        exclude = ('image', 'cooking_time', 'ingredients')
+        fields = ('author', 'name', 'tags', 'is_favorited',
+                  'is_in_shopping_cart')
@@ -0,0 +1,74 @@
+import json
+import timeit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from foodgram.middleware import brotli, compress
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер сжатия ответов: время на сжатие и экономия байт '
+        'для каждого уровня gzip и brotli.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def get_payloads(self):
+        """Каталог ингредиентов и типичный список рецептов."""
+        with open(
+                f'{settings.BASE_DIR}/static/data/ingredients.json',
+                encoding='utf-8'
+        ) as file:
+            ingredients = [
+                dict(id=i, **row) for i, row in enumerate(json.load(file), 1)
+            ]
+        recipes = {
+            'count': 100, 'next': None, 'previous': None,
+            'results': [{
+                'id': i,
+                'author': {'id': i % 10, 'email': f'user{i % 10}@example.com',
+                           'first_name': 'Имя', 'last_name': 'Фамилия'},
+                'name': f'Рецепт {i}',
+                'image': f'http://localhost/media/recipe/image/{i}.png',
+                'text': f'Описание рецепта {i}. ' * 20,
+                'cooking_time': i % 120 + 1,
+                'tags': [{'id': 1, 'name': 'Завтрак', 'color': '#00FF00',
+                          'slug': 'breakfast'}],
+                'ingredients': [
+                    dict(ingredient, amount=i % 500 + 1)
+                    for ingredient in ingredients[i * 8:(i + 1) * 8]
+                ],
+                'is_favorited': bool(i % 3), 'is_in_shopping_cart': False,
+            } for i in range(100)]
+        }
+        return {
+            'ingredients': json.dumps(ingredients, ensure_ascii=False),
+            'recipes?limit=100': json.dumps(recipes, ensure_ascii=False),
+        }
+
+    def handle(self, *args, **options):
+        levels = [('gzip', level) for level in range(1, 10)]
+        if brotli is not None:
+            levels += [('br', quality) for quality in range(0, 12)]
+        else:
+            self.stdout.write('brotli не установлен, только gzip.')
+
+        for name, payload in self.get_payloads().items():
+            body = payload.encode()
+            self.stdout.write(f'{name}: {len(body)} байт')
+            for encoding, level in levels:
+                compressed = compress(body, encoding, level)
+                seconds = min(timeit.repeat(
+                    lambda: compress(body, encoding, level),
+                    number=1, repeat=options['repeat']
+                ))
+                self.stdout.write(
+                    f'  {encoding:<4} {level:>2}: {len(compressed):>8} байт '
+                    f'({len(compressed) / len(body):.1%}), '
+                    f'{seconds * 1000:.2f} мс, '
+                    f'{(len(body) - len(compressed)) / seconds / 2 ** 20:.0f}'
+                    f' МБ сэкономлено/с'
+                )
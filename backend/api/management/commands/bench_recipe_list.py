@@ -0,0 +1,132 @@
+import random
+import timeit
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.fast_serializers import get_recipe_rows, serialize_recipe_rows
+from api.serializers import ListRecipeSerializer
+from api.views import RecipeViewSet
+from recipe import read_model
+from recipe.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                           ShoppingCart, Tag, User)
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер времени ListRecipeSerializer и fast_serializers на '
+        'сгенерированных данных. Идентичность вывода проверяет '
+        'tests/test_fast_serializers.py.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=500)
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--ingredients', type=int, default=8,
+                            help='Ингредиентов в рецепте.')
+        parser.add_argument('--limit', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = self.generate(options)
+            for fields_query in ('', 'id,name,image,cooking_time'):
+                for current_user in (None, user):
+                    self.compare(current_user, fields_query, options)
+            transaction.set_rollback(True)
+
+    def generate(self, options):
+        """Тестовые данные, откатываются после замера."""
+        rnd = random.Random(0)
+        # Уникальный префикс: в базе могут быть данные прошлых замеров.
+        prefix = f'bench-{uuid.uuid4().hex[:8]}'
+        User.objects.bulk_create(
+            User(username=f'{prefix}-{i}', email=f'{prefix}-{i}@example.com',
+                 first_name='Имя', last_name='Фамилия')
+            for i in range(options['users'])
+        )
+        users = list(User.objects.filter(username__startswith=prefix))
+        used_colors = set(Tag.objects.values_list('color', flat=True))
+        colors = (
+            color for color in (f'#{value:06X}' for value in range(1 << 24))
+            if color not in used_colors
+        )
+        tags = [
+            Tag.objects.create(name=f'{prefix}-{i}', color=next(colors),
+                               slug=f'{prefix}-{i}')
+            for i in range(3)
+        ]
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'{prefix}-{i}', measurement_unit=unit)
+            for i, unit in enumerate(['г', 'мл', 'шт.'] * 100)
+        )
+        ingredients = list(Ingredient.objects.filter(name__startswith=prefix))
+        Recipe.objects.bulk_create(
+            Recipe(author=rnd.choice(users), name=f'Рецепт {i}',
+                   text='Описание рецепта. ' * 20, cooking_time=i % 120 + 1,
+                   image='recipe/image/bench.png' if i % 2 else '')
+            for i in range(options['recipes'])
+        )
+        recipes = list(Recipe.objects.filter(author__in=users))
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for recipe in recipes
+            for tag in rnd.sample(tags, rnd.randint(1, len(tags)))
+        )
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(recipe=recipe, ingredient=ingredient,
+                               amount=rnd.randint(1, 500))
+            for recipe in recipes
+            for ingredient in rnd.sample(ingredients, options['ingredients'])
+        )
+        user = users[0]
+        Favorite.objects.bulk_create(
+            Favorite(user=user, recipe=recipe) for recipe in recipes[::3]
+        )
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=user, recipe=recipe) for recipe in recipes[::5]
+        )
+        # bulk_create не отправляет сигналы, а чтение карточки не сохраняет.
+        read_model.refresh(recipe.pk for recipe in recipes)
+        return user
+
+    def compare(self, user, fields_query, options):
+        params = {'limit': options['limit']}
+        if fields_query:
+            params['fields'] = fields_query
+        request = Request(APIRequestFactory().get('/api/recipes/', params))
+        if user is not None:
+            request.user = user
+        view = RecipeViewSet(
+            request=request, action='list', format_kwarg=None, kwargs={}
+        )
+        fields = view.get_requested_fields()
+        queryset = view.get_queryset()
+        limit = options['limit']
+
+        def serializer_path():
+            return JSONRenderer().render(ListRecipeSerializer(
+                queryset.all()[:limit], many=True, fields=fields,
+                context={'request': request}
+            ).data)
+
+        def fast_path():
+            return JSONRenderer().render(serialize_recipe_rows(
+                get_recipe_rows(queryset.all(), fields)[:limit],
+                fields, request
+            ))
+
+        slow = min(timeit.repeat(serializer_path, number=1,
+                                 repeat=options['repeat']))
+        fast = min(timeit.repeat(fast_path, number=1,
+                                 repeat=options['repeat']))
+        self.stdout.write(
+            f'user={"auth" if user else "anon"} '
+            f'fields={fields_query or "all"} limit={limit}: '
+            f'serializer {slow * 1000:.1f} ms, fast {fast * 1000:.1f} ms, '
+            f'x{slow / fast:.1f}'
+        )
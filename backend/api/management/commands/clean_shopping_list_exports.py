@@ -0,0 +1,27 @@
+import os
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.exports import export_storage
+
+
+class Command(BaseCommand):
+    help = 'Удаление старых выгрузок списков покупок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        deleted = 0
+        for root, _, files in os.walk(export_storage.location):
+            for name in files:
+                path = os.path.relpath(
+                    os.path.join(root, name), export_storage.location
+                )
+                if export_storage.get_modified_time(path) < cutoff:
+                    export_storage.delete(path)
+                    deleted += 1
+        self.stdout.write(f'Удалено файлов: {deleted}')
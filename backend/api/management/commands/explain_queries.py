@@ -0,0 +1,242 @@
+import re
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.fast_serializers import get_recipe_rows
+from api.serializers import ListRecipeSerializer
+from api.utils import user_flags_changed
+from api.views import RecipeViewSet
+from recipe.models import (Favorite, IngredientInRecipe, Recipe, RecipeCard,
+                           RecipeChange, ShoppingCart, ShoppingListItem, Tag,
+                           User)
+
+# Все поля списка рецептов: с флагами юзера, если они есть в запросе.
+LIST_FIELDS = set(ListRecipeSerializer.Meta.fields)
+
+# Строки плана, которые означают полный проход по таблице или сортировку.
+PROBLEMS = {
+    'sqlite': (
+        (re.compile(r'SCAN (TABLE )?(?P<table>\w+)(?!\w| USING)'), 'scan'),
+        (re.compile(r'USE TEMP B-TREE FOR (ORDER BY|GROUP BY|DISTINCT)'),
+         'sort'),
+    ),
+    'postgresql': (
+        (re.compile(r'Seq Scan on (?P<table>\w+)'), 'scan'),
+        (re.compile(r'(?<!Incremental )Sort\b'), 'sort'),
+    ),
+}
+
+
+def get_view_queryset(viewset, action, params=None, user=None):
+    """Queryset, который вьюсет строит для запроса с такими параметрами."""
+    request = Request(APIRequestFactory().get('/', params or {}))
+    if user is not None:
+        request.user = user
+    view = viewset(request=request, action=action, format_kwarg=None,
+                   kwargs={})
+    return view.filter_queryset(view.get_queryset())
+
+
+def get_list_rows(params=None, user=None):
+    """
+    Запрос страницы списка рецептов, как его выполняет RecipeViewSet.list:
+    values() рецептов с присоединённой карточкой (recipe.read_model).
+    """
+    return get_recipe_rows(
+        get_view_queryset(RecipeViewSet, 'list', params, user),
+        LIST_FIELDS
+    )[:6]
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAIN основных запросов api.views и api.filters: поиск полных '
+        'проходов по таблицам и сортировок, предложения индексов. '
+        'Тэги и ингредиенты читаются из справочника recipe.catalog и '
+        'карточек рецептов, их запросы - только сборка карточек.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sql', action='store_true',
+                            help='Показать SQL запросов.')
+
+    def get_queries(self):
+        """
+        (название, queryset, индексы-кандидаты).
+        Кандидат - (модель, поля), подходящий для условий запроса.
+        Запросы, для которых в базе нет данных (юзера, рецептов, тэгов),
+        пропускаются.
+        """
+        user = User.objects.first()
+        tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        recipe_ids = list(Recipe.objects.values_list('pk', flat=True)[:100])
+        queries = [
+            ('Лента рецептов',
+             get_list_rows(),
+             [(Recipe, ['-pub_date']), (RecipeCard, ['recipe'])]),
+        ]
+        if user is not None:
+            queries += [
+                ('Лента рецептов с is_favorited/is_in_shopping_cart',
+                 get_list_rows(user=user),
+                 [(Favorite, ['user', 'recipe']),
+                  (ShoppingCart, ['user', 'recipe'])]),
+                ('Рецепты автора',
+                 get_list_rows({'author': user.pk}),
+                 [(Recipe, ['author', '-pub_date'])]),
+                ('Избранное',
+                 get_list_rows({'is_favorited': 1}, user=user),
+                 [(Favorite, ['user', 'recipe'])]),
+                ('Список покупок',
+                 get_list_rows({'is_in_shopping_cart': 1}, user=user),
+                 [(ShoppingCart, ['user', 'recipe'])]),
+                ('Подписки',
+                 User.objects.filter(following__user=user)[:6],
+                 [(User, ['username'])]),
+                ('Скачивание списка покупок',
+                 ShoppingListItem.objects.filter(user=user).values(
+                     'ingredient__name', 'ingredient__measurement_unit',
+                     'amount'
+                 ),
+                 [(ShoppingListItem, ['user', 'ingredient'])]),
+            ]
+        else:
+            self.stdout.write(self.style.WARNING(
+                'Юзеров нет: запросы избранного, покупок и подписок пропущены.'
+            ))
+        if recipe_ids:
+            validators = Recipe.objects.filter(pk=recipe_ids[0]).only(
+                'id', 'author_id', 'updated_at'
+            )
+            if user is not None:
+                validators = validators.annotate(
+                    flags_changed=user_flags_changed(user)
+                )
+            queries += [
+                ('ETag рецепта (ответ 304)',
+                 validators,
+                 [(RecipeChange, ['user_id', 'id'])]),
+                ('Тэги для сборки карточек',
+                 Recipe.tags.through.objects.filter(
+                     recipe_id__in=recipe_ids
+                 ).order_by('tag__name').values_list(
+                     'recipe_id', 'tag_id', 'tag__name'
+                 ),
+                 [(Recipe.tags.through, ['recipe', 'tag'])]),
+                ('Ингредиенты для сборки карточек',
+                 IngredientInRecipe.objects.filter(
+                     recipe_id__in=recipe_ids
+                 ).order_by('pk').values_list(
+                     'recipe_id', 'ingredient_id', 'ingredient__name'
+                 ),
+                 [(IngredientInRecipe, ['recipe'])]),
+            ]
+        else:
+            self.stdout.write(self.style.WARNING(
+                'Рецептов нет: запросы рецепта и сборки карточек пропущены.'
+            ))
+        if tags:
+            queries.append((
+                'Фильтр по тэгам',
+                get_list_rows({'tags': tags}),
+                [(Recipe.tags.through, ['recipe', 'tag'])]
+            ))
+        return queries
+
+    def find_problems(self, plan):
+        problems = []
+        for line in plan.splitlines():
+            for pattern, kind in PROBLEMS.get(connection.vendor, ()):
+                match = pattern.search(line)
+                if match:
+                    problems.append(
+                        (kind, match.groupdict().get('table'), line.strip())
+                    )
+        return problems
+
+    @staticmethod
+    def has_index(model, fields):
+        """Есть ли индекс или уникальное ограничение с такими первыми полями."""
+        names = [field.lstrip('-') for field in fields]
+        columns = [model._meta.get_field(name).column for name in names]
+        existing = [
+            [model._meta.get_field(field.lstrip('-')).column
+             for field in index.fields]
+            for index in model._meta.indexes
+        ]
+        existing += [
+            [model._meta.get_field(field).column for field in constraint.fields]
+            for constraint in model._meta.constraints
+            if hasattr(constraint, 'fields')
+        ]
+        existing += [
+            [model._meta.get_field(field).column for field in fields]
+            for fields in model._meta.unique_together
+        ]
+        existing += [
+            [field.column] for field in model._meta.fields
+            if field.db_index or field.unique
+        ]
+        return any(index[:len(columns)] == columns for index in existing)
+
+    @staticmethod
+    def get_relevant(candidates, kind, table):
+        """Кандидаты для проблемы: сортировка - все, проход - по таблице."""
+        return [
+            (model, fields) for model, fields in candidates
+            if kind == 'sort' or model._meta.db_table == table
+        ]
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'База данных: {connection.vendor}')
+        proposals = {}
+        unresolved = []
+        for name, queryset, candidates in self.get_queries():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            if options['sql']:
+                self.stdout.write(str(queryset.query))
+            plan = queryset.explain()
+            self.stdout.write(plan)
+            problems = self.find_problems(plan)
+            if not problems:
+                self.stdout.write(self.style.SUCCESS('  OK'))
+                continue
+            for kind, table, line in problems:
+                self.stdout.write(self.style.WARNING(f'  {kind}: {line}'))
+                missing = [
+                    (model, fields) for model, fields
+                    in self.get_relevant(candidates, kind, table)
+                    if not self.has_index(model, fields)
+                ]
+                for model, fields in missing:
+                    proposals[(model, tuple(fields))] = name
+                if not missing:
+                    unresolved.append((name, line))
+
+        if proposals:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                'Предлагаемые индексы (Meta.indexes, затем makemigrations):'
+            ))
+        for (model, fields), name in proposals.items():
+            index_name = '_'.join(
+                [model._meta.model_name] + [f.lstrip('-') for f in fields]
+            )[:26] + '_idx'
+            self.stdout.write(
+                f'  {model.__name__}: models.Index(fields={list(fields)}, '
+                f'name={index_name!r})  # {name}'
+            )
+        if unresolved:
+            # Кандидаты уже проиндексированы или не подходят: на маленьких
+            # таблицах планировщик выбирает полный проход и при индексе.
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                'Проблемы без предложенного индекса, нужен разбор плана:'
+            ))
+            for name, line in unresolved:
+                self.stdout.write(f'  {name}: {line}')
+        if not proposals and not unresolved:
+            self.stdout.write(self.style.SUCCESS(
+                'Новых индексов не требуется.'
+            ))
@@ -0,0 +1,105 @@
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Загрузка приложения так, как её делает воркер gunicorn
+# (с --preload - мастер) перед первым запросом.
+BOOT_CODE = '''
+import json, resource, time
+started = time.perf_counter()
+from foodgram.wsgi import application
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(json.dumps({
+    'seconds': time.perf_counter() - started,
+    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}))
+'''
+
+IMPORT_TIME_RE = re.compile(
+    r'^import time:\s+(?P<self>\d+) \|\s+(?P<cumulative>\d+) \| '
+    r'(?P<indent>\s*)(?P<module>\S+)$'
+)
+
+
+def parse_import_times(output):
+    """(модуль, своё время мкс, с зависимостями мкс) из вывода -X importtime."""
+    modules = []
+    for line in output.splitlines():
+        match = IMPORT_TIME_RE.match(line)
+        if match:
+            modules.append((
+                match['module'], int(match['self']), int(match['cumulative'])
+            ))
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        'Время импорта модулей при старте воркера (python -X importtime): '
+        'самые медленные модули и пакеты, время загрузки и память.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=25,
+                            help='Сколько модулей и пакетов показать.')
+        parser.add_argument('--sort', choices=('self', 'cumulative'),
+                            default='cumulative',
+                            help='Сортировка модулей.')
+        parser.add_argument('--module', action='append', default=[],
+                            help='Проверить, импортируется ли модуль при '
+                                 'старте (можно несколько раз).')
+
+    def handle(self, *args, **options):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', BOOT_CODE],
+            capture_output=True, text=True, env=os.environ.copy()
+        )
+        if result.returncode:
+            raise CommandError(result.stderr[-2000:])
+        boot = json.loads(result.stdout.strip().splitlines()[-1])
+        modules = parse_import_times(result.stderr)
+        limit = options['limit']
+
+        self.stdout.write(
+            f'Старт: {boot["seconds"] * 1000:.0f} мс, '
+            f'модулей: {len(modules)}, '
+            f'пиковая память: {boot["max_rss_kb"] // 1024} МБ'
+        )
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'Модули ({options["sort"]}, мс):'
+        ))
+        index = 1 if options['sort'] == 'self' else 2
+        for module, own, cumulative in sorted(
+                modules, key=lambda item: item[index], reverse=True)[:limit]:
+            self.stdout.write(
+                f'  {cumulative / 1000:8.1f} {own / 1000:8.1f}  {module}'
+            )
+
+        packages = defaultdict(int)
+        for module, own, _ in modules:
+            packages[module.split('.')[0]] += own
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            'Пакеты (сумма собственного времени модулей, мс):'
+        ))
+        for package, own in sorted(
+                packages.items(), key=lambda item: item[1],
+                reverse=True)[:limit]:
+            self.stdout.write(f'  {own / 1000:8.1f}  {package}')
+
+        loaded = {module for module, _, _ in modules}
+        for module in options['module']:
+            if module in loaded:
+                self.stdout.write(self.style.WARNING(
+                    f'{module} импортируется при старте.'
+                ))
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{module} при старте не импортируется.'
+                ))
@@ -1,3 +1,5 @@
+from django.core.paginator import InvalidPage
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
 
 from foodgram.constants import MAX_PAGE_SIZE
@@ -8,3 +10,23 @@ class CustomPagination(PageNumberPagination):
     page_query_param = 'page'
     page_size_query_param = 'limit'
     max_page_size = MAX_PAGE_SIZE
+
+    def paginate_queryset_lazily(self, queryset, request, view=None):
+        """
+        Как paginate_queryset, но страница - срез queryset, а не список:
+        для потоковой отдачи (api.streaming).
+        """
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            ))
+        self.request = request
+        return self.page.object_list
@@ -1,6 +1,8 @@
 import base64
 
+from django.conf import settings
 from django.core.files.base import ContentFile
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
@@ -9,8 +11,10 @@ from foodgram.constants import (
     MAX_VALUE_NAME, MIN_VALUE_COOKING_TIME, MIN_VALUE_PASSWORD, MIN_VALUE_NAME,
     MIN_VALUE_TEXT, MIN_VALUE_AMOUNT
 )
+from jobs.models import Job
 from recipe.models import (Favorite, Follow, Ingredient, IngredientInRecipe,
-                           Recipe, ShoppingCart, Tag, User)
+                           Recipe, ShoppingCart, ShoppingListItem, Tag, User)
+from .exports import get_download_info
 
 
 class Base64ImageField(serializers.ImageField):
@@ -97,6 +101,19 @@ class CustomUserSerializer(UserSerializer):
         )
 
 
+class ProfileSerializer(CustomUserSerializer):
+    """
+    Профиль юзера со счётчиками.
+    Поля берутся из аннотаций get_profile_queryset, без запросов на поле.
+    """
+    is_subscribed = serializers.BooleanField(read_only=True)
+    recipes_count = serializers.IntegerField(read_only=True)
+    favorites_count = serializers.IntegerField(read_only=True)
+    shopping_cart_count = serializers.IntegerField(read_only=True)
+    subscriptions_count = serializers.IntegerField(read_only=True)
+    subscribers_count = serializers.IntegerField(read_only=True)
+
+
 class CustomUserForRecipeSerializer(UserSerializer):
     """Мини сериализатор юзера."""
 
@@ -257,7 +274,24 @@ class SubscribeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError('Подписки не существует.')
 
 
-class ListRecipeSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    Сериализатор с выбором полей.
+    fields - какие поля оставить, omit - какие убрать.
+    Вью отдают рецепты с ?fields=/?omit= через api.fast_serializers;
+    здесь - эталон для сравнения с ними (bench_recipe_list, тесты).
+    """
+
+    def __init__(self, *args, fields=None, omit=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        allowed = set(self.fields) if fields is None else set(fields)
+        if omit is not None:
+            allowed -= set(omit)
+        for field_name in set(self.fields) - allowed:
+            self.fields.pop(field_name)
+
+
+class ListRecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Отображение списка рецептов.
     Дополнительные параметры is_favorited, is_in_shopping_cart для отображения
@@ -385,7 +419,12 @@ class CreateUpdateRecipeSerializer(serializers.ModelSerializer):
                 )
             )
         IngredientInRecipe.objects.bulk_create(ingredients_data)
+        # bulk_create не отправляет сигналы, списки покупок обновляем сами.
+        ShoppingListItem.objects.add_to_carts(recipe.pk, {
+            item.ingredient.pk: item.amount for item in ingredients_data
+        })
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
@@ -397,6 +436,7 @@ class CreateUpdateRecipeSerializer(serializers.ModelSerializer):
 
         return new_recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
@@ -411,3 +451,51 @@ class CreateUpdateRecipeSerializer(serializers.ModelSerializer):
         instance.save()
 
         return instance
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """
+    Статус фоновой задачи. Трейсбек ошибки видит только staff,
+    остальным - короткое сообщение.
+    """
+    result = serializers.SerializerMethodField()
+    error = serializers.SerializerMethodField()
+    url = serializers.HyperlinkedIdentityField(view_name='jobs-detail')
+
+    class Meta:
+        model = Job
+        fields = (
+            'id', 'url', 'name', 'status', 'attempts', 'max_attempts',
+            'result', 'error', 'created', 'finished'
+        )
+
+    def get_result(self, obj):
+        result = obj.get_result()
+        if result and 'export_path' in result:
+            result.update(get_download_info(
+                result.pop('export_path'), self.context['request']
+            ))
+        return result
+
+    def get_error(self, obj):
+        if not obj.error or self.context['request'].user.is_staff:
+            return obj.error
+        return 'Ошибка при выполнении задачи.'
+
+
+class BatchItemSerializer(serializers.Serializer):
+    """Подзапрос пачки: метод, путь с параметрами и JSON-тело."""
+    method = serializers.ChoiceField(
+        choices=('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+    )
+    url = serializers.CharField(max_length=2000)
+    body = serializers.JSONField(required=False)
+
+
+class BatchSerializer(serializers.Serializer):
+    """Пачка запросов к API. Размер ограничен BATCH['MAX_REQUESTS']."""
+    requests = serializers.ListField(
+        child=BatchItemSerializer(), min_length=1,
+        max_length=settings.BATCH['MAX_REQUESTS']
+    )
+    parallel = serializers.BooleanField(default=False)
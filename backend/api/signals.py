@@ -0,0 +1,88 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from foodgram.metrics import registry
+from recipe.models import (Favorite, Follow, Recipe, ShoppingCart, User,
+                           UserEvent)
+from .authentication import token_cache
+from .events import bus
+from .utils import reset_profiles
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Выход через djoser (token/logout) удаляет токен."""
+    token_cache.invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    """Смена пароля, блокировка или удаление юзера."""
+    token_cache.invalidate_user(instance.pk)
+    reset_profiles(instance.pk)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def reset_flags_profile(sender, instance, **kwargs):
+    """Изменились счётчики избранного и списка покупок в профиле."""
+    reset_profiles(instance.user_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def reset_follow_profiles(sender, instance, **kwargs):
+    reset_profiles(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def reset_author_profile(sender, instance, created=True, **kwargs):
+    """Счётчик рецептов меняется только при создании и удалении."""
+    if created:
+        reset_profiles(instance.author_id)
+
+
+@receiver(post_save, sender=Favorite)
+def count_favorite(sender, created, **kwargs):
+    if created:
+        registry.inc('favorites_added_total')
+
+
+@receiver(post_save, sender=ShoppingCart)
+def count_shopping_cart(sender, created, **kwargs):
+    if created:
+        registry.inc('shopping_cart_added_total')
+
+
+# Модель -> (тип события, поле с id рецепта или автора).
+USER_EVENT_KINDS = {
+    Favorite: (UserEvent.FAVORITE, 'recipe_id'),
+    ShoppingCart: (UserEvent.SHOPPING_CART, 'recipe_id'),
+    Follow: (UserEvent.FOLLOW, 'author_id'),
+}
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def publish_user_event(sender, instance, created=None, **kwargs):
+    """Событие для /api/events/: добавление (post_save) или удаление."""
+    if created is False:
+        return
+    kind, field = USER_EVENT_KINDS[sender]
+    event = UserEvent.objects.create(
+        user_id=instance.user_id, kind=kind,
+        object_id=getattr(instance, field), active=bool(created)
+    )
+    transaction.on_commit(
+        lambda: bus.publish(event.user_id, event.to_dict())
+    )
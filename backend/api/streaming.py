@@ -0,0 +1,98 @@
+"""
+Потоковая отдача больших списков в JSON.
+Объекты читаются курсором (queryset.iterator, на postgresql - серверный)
+пачками по STREAM_CHUNK_SIZE, каждая пачка сериализуется и кодируется
+отдельно: память ограничена пачкой, а первые байты уходят клиенту до
+конца выборки. iterator() не выполняет prefetch_related, поэтому связанные
+объекты подгружаются на каждую пачку (stream_prefetch).
+Ошибка посреди потока обрывает ответ: статус уже отправлен.
+"""
+from django.db.models import prefetch_related_objects
+from django.db.models.query import QuerySet
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from foodgram.constants import STREAM_CHUNK_SIZE
+from recipe.exchange import chunks
+
+
+class StreamingJSONRenderer(JSONRenderer):
+    """
+    JSON-массив по частям: одна часть на пачку элементов.
+    Кодирование - как у JSONRenderer (UNICODE_JSON, COMPACT_JSON).
+    """
+
+    def encode(self, data):
+        return super().render(data)
+
+    def render_stream(self, batches, envelope=None):
+        """
+        Байты JSON для пачек элементов. envelope - словарь, в поле results
+        которого вставляется массив (ответ паджинатора).
+        """
+        if envelope is not None:
+            yield self.encode(envelope)[:-1] + b',"results":'
+        yield b'['
+        first = True
+        for batch in batches:
+            if not batch:
+                continue
+            body = b','.join(self.encode(item) for item in batch)
+            yield body if first else b',' + body
+            first = False
+        yield b']'
+        if envelope is not None:
+            yield b'}'
+
+
+class StreamingListMixin:
+    """
+    stream_list() вместо Response для списков: JSON отдаётся потоком,
+    остальные форматы (browsable API) - обычным ответом.
+    """
+    stream_prefetch = ()
+
+    def serialize_chunk(self, objects, serializer_class=None, prefetch=None):
+        """Пачка объектов через сериализатор вьюсета или serializer_class."""
+        prefetch = self.stream_prefetch if prefetch is None else prefetch
+        if prefetch:
+            prefetch_related_objects(objects, *prefetch)
+        serializer_class = serializer_class or self.get_serializer_class()
+        return serializer_class(
+            objects, many=True, context=self.get_serializer_context()
+        ).data
+
+    def stream_list(self, items, serialize=None):
+        """
+        items - queryset или итератор уже готовых элементов.
+        serialize(пачка) -> список словарей, по умолчанию serialize_chunk.
+        """
+        serialize = serialize or self.serialize_chunk
+        page = None
+        if self.paginator is not None and isinstance(items, QuerySet):
+            page = self.paginator.paginate_queryset_lazily(
+                items, self.request, view=self
+            )
+        if page is not None:
+            items = page
+
+        if not isinstance(self.request.accepted_renderer, JSONRenderer):
+            data = serialize(list(items))
+            if page is not None:
+                return self.get_paginated_response(data)
+            return Response(data)
+
+        envelope = None
+        if page is not None:
+            envelope = self.paginator.get_paginated_response([]).data
+            del envelope['results']
+        if isinstance(items, QuerySet):
+            items = items.iterator(chunk_size=STREAM_CHUNK_SIZE)
+        renderer = StreamingJSONRenderer()
+        return StreamingHttpResponse(
+            renderer.render_stream(
+                map(serialize, chunks(items, STREAM_CHUNK_SIZE)), envelope
+            ),
+            content_type=renderer.media_type
+        )
@@ -0,0 +1,14 @@
+from jobs.registry import task
+from recipe.models import User
+from .exports import build_export
+from .utils import get_cart_recipes, get_shopping_list_rows
+
+
+@task('shopping_list_export', priority=10)
+def export_shopping_list(payload, job):
+    """Файл списка покупок в выбранном формате."""
+    user = User.objects.get(pk=payload['user_id'])
+    return {'export_path': build_export(
+        user.pk, get_shopping_list_rows(user), payload['export'],
+        get_cart_recipes(user)
+    )}
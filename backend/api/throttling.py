@@ -0,0 +1,185 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+from foodgram.constants import MAX_PAGE_SIZE, PAGE_SIZE
+
+
+def endpoint_key(view):
+    """Имя эндпоинта для настроек стоимости: 'recipe.download_shopping_cart'."""
+    basename = getattr(view, 'basename', None)
+    action = getattr(view, 'action', None)
+    if basename and action:
+        return f'{basename}.{action}'
+    return view.__class__.__name__
+
+
+class MeasuredCosts:
+    """
+    Измеренная стоимость эндпоинтов в процессе.
+    Хранится скользящее среднее времени ответа (EWMA) в миллисекундах.
+    """
+    weight = 0.2
+
+    def __init__(self):
+        self._durations = {}
+        self._lock = threading.Lock()
+
+    def record(self, key, duration_ms):
+        with self._lock:
+            previous = self._durations.get(key)
+            if previous is None:
+                self._durations[key] = duration_ms
+            else:
+                self._durations[key] = (
+                    previous + self.weight * (duration_ms - previous)
+                )
+
+    def get(self, key):
+        return self._durations.get(key)
+
+
+measured_costs = MeasuredCosts()
+
+
+class MeasuredCostMixin:
+    """
+    Замер времени обработки запроса вьюсетом для CostThrottle.
+    Замер заканчивается в finalize_response: отдача потокового ответа
+    зависит от скорости клиента и в стоимость не входит (её замеряют
+    metrics и querylog).
+    """
+
+    def initial(self, request, *args, **kwargs):
+        request.started_at = time.monotonic()
+        super().initial(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        started_at = getattr(request, 'started_at', None)
+        if started_at is None or response.status_code >= 400:
+            return response
+        measured_costs.record(
+            endpoint_key(self), (time.monotonic() - started_at) * 1000
+        )
+        return response
+
+
+class CostThrottle(BaseThrottle):
+    """
+    Ограничение запросов по стоимости. У каждого юзера и каждого IP своё
+    ведро: CAPACITY токенов, пополнение RATE токенов в секунду, запрос
+    списывает свою стоимость.
+    Ведро - счётчики списанного в общем кэше CACHES['shared'] по окнам
+    длиной CAPACITY / RATE секунд: занято списанное в текущем окне и
+    ещё не истёкшая доля предыдущего (скользящее окно). Счётчики меняются
+    атомарными add/incr/decr, без транзакций и записи в базу; отказ
+    возвращает списанное из других вёдер запроса. Старые окна удаляет
+    сам кэш по таймауту.
+    Стоимость эндпоинта берётся из THROTTLE['COSTS'], иначе из замеров
+    MeasuredCostMixin, иначе DEFAULT_COST. Для запросов с ?limit=
+    стоимость растёт пропорционально размеру страницы.
+    IP берётся с учётом NUM_PROXIES: X-Forwarded-For, присланный
+    клиентом, не создаёт новое ведро.
+    """
+    timer = time.time
+    cache_alias = 'shared'
+    key_format = 'throttle:%(scope)s:%(ident)s:%(window)s'
+    # Счётчики целые: токены в тысячных.
+    scale = 1000
+
+    def __init__(self):
+        self.config = settings.THROTTLE
+        self.cache = caches[self.cache_alias]
+        self.wait_seconds = None
+
+    def get_cost(self, request, view):
+        key = endpoint_key(view)
+        cost = self.config['COSTS'].get(key)
+        if cost is None:
+            duration = measured_costs.get(key)
+            cost = (
+                duration / self.config['MS_PER_TOKEN']
+                if duration is not None else self.config['DEFAULT_COST']
+            )
+        limit = request.query_params.get('limit', '')
+        if limit.isdigit():
+            cost *= max(1, min(int(limit), MAX_PAGE_SIZE) / PAGE_SIZE)
+        return max(cost, self.config['DEFAULT_COST'])
+
+    def get_buckets(self, request):
+        buckets = [('ip', self.get_ident(request))]
+        if request.user and request.user.is_authenticated:
+            buckets.append(('user', request.user.pk))
+        return buckets
+
+    def get_key(self, scope, ident, window):
+        return self.key_format % {
+            'scope': scope, 'ident': ident, 'window': window
+        }
+
+    def add(self, key, amount, timeout):
+        """Прибавление к счётчику окна, новое значение."""
+        self.cache.add(key, 0, timeout)
+        try:
+            return self.cache.incr(key, amount)
+        except ValueError:
+            # Счётчик вытеснен между add и incr.
+            if self.cache.add(key, amount, timeout):
+                return amount
+            return self.cache.incr(key, amount)
+
+    def subtract(self, key, amount):
+        try:
+            self.cache.decr(key, amount)
+        except ValueError:
+            pass
+
+    def spend(self, scope, ident, cost, bucket, now):
+        """
+        Списание cost из ведра: (ключ счётчика, списано) или
+        (None, сколько токенов не хватило).
+        """
+        length = bucket['CAPACITY'] / bucket['RATE']
+        window, position = divmod(now / length, 1)
+        key = self.get_key(scope, ident, int(window))
+        amount = int(cost * self.scale)
+        spent = self.add(key, amount, math.ceil(length * 2) + 1)
+        previous = self.cache.get(
+            self.get_key(scope, ident, int(window) - 1), 0
+        )
+        excess = (
+            spent + previous * (1 - position)
+            - bucket['CAPACITY'] * self.scale
+        )
+        if excess > 0:
+            self.subtract(key, amount)
+            return None, excess / self.scale
+        return key, amount
+
+    def allow_request(self, request, view):
+        cost = self.get_cost(request, view)
+        now = self.timer()
+        spent = []
+        for scope, ident in self.get_buckets(request):
+            bucket = self.config['BUCKETS'][scope]
+            key, amount = self.spend(
+                scope, ident, min(cost, bucket['CAPACITY']), bucket, now
+            )
+            if key is None:
+                # Списания из других вёдер этого запроса возвращаются.
+                for spent_key, spent_amount in spent:
+                    self.subtract(spent_key, spent_amount)
+                self.wait_seconds = math.ceil(amount / bucket['RATE']) or 1
+                return False
+            spent.append((key, amount))
+        return True
+
+    def wait(self):
+        return self.wait_seconds
@@ -0,0 +1,88 @@
+"""
+Таблица единиц измерения для списка покупок.
+
+Единицы из ingredients.csv приводятся к каноническому виду,
+количество переводится в базовую единицу своей размерности.
+"""
+from collections import namedtuple
+
+Unit = namedtuple('Unit', ('dimension', 'base', 'factor'))
+
+MASS = 'mass'
+VOLUME = 'volume'
+COUNT = 'count'
+
+# Каноническое название -> (размерность, базовая единица, множитель).
+UNITS = {
+    'г': Unit(MASS, 'г', 1),
+    'кг': Unit(MASS, 'г', 1000),
+    'мл': Unit(VOLUME, 'мл', 1),
+    'л': Unit(VOLUME, 'мл', 1000),
+    'ч. л.': Unit(VOLUME, 'мл', 5),
+    'ст. л.': Unit(VOLUME, 'мл', 15),
+    'стакан': Unit(VOLUME, 'мл', 200),
+    'шт': Unit(COUNT, 'шт', 1),
+}
+
+# Бытовые меры объёма. В мл переводятся только для жидкостей:
+# '1 ч. л.' соли - это не 5 мл.
+HOUSEHOLD_UNITS = {'ч. л.', 'ст. л.', 'стакан'}
+
+# Крупная единица для вывода, если сумма её превышает.
+DISPLAY_UNITS = {
+    'г': ('кг', 1000),
+    'мл': ('л', 1000),
+}
+
+ALIASES = {
+    'гр': 'г',
+    'грамм': 'г',
+    'килограмм': 'кг',
+    'литр': 'л',
+    'ч.л.': 'ч. л.',
+    'ст.л.': 'ст. л.',
+}
+
+
+def canonical_unit(measurement_unit):
+    """
+    Канонический вид единицы: нижний регистр, без лишних пробелов
+    и точки на конце у сокращений ('Шт.' -> 'шт', 'Ст. л.' -> 'ст. л.').
+    """
+    unit = ' '.join(measurement_unit.lower().split())
+    unit = ALIASES.get(unit, unit)
+    if unit in UNITS:
+        return unit
+    stripped = unit.rstrip('.')
+    return stripped if stripped in UNITS else unit
+
+
+def is_liquid_unit(measurement_unit):
+    """Единица жидкости: мл или л, но не бытовая мера."""
+    unit = canonical_unit(measurement_unit)
+    return (
+        unit in UNITS and unit not in HOUSEHOLD_UNITS
+        and UNITS[unit].dimension == VOLUME
+    )
+
+
+def to_base(amount, measurement_unit, liquid=False):
+    """
+    Перевод количества в базовую единицу. Возвращает (количество, ед.).
+    Бытовые меры переводятся в мл, только если liquid.
+    """
+    unit = canonical_unit(measurement_unit)
+    conversion = UNITS.get(unit)
+    if conversion is None or unit in HOUSEHOLD_UNITS and not liquid:
+        return amount, unit
+    return amount * conversion.factor, conversion.base
+
+
+def humanize(amount, base_unit):
+    """Перевод суммы из базовой единицы в удобную для чтения."""
+    display = DISPLAY_UNITS.get(base_unit)
+    if display is not None and amount >= display[1]:
+        unit, factor = display
+        value = amount / factor
+        return (int(value) if value == int(value) else round(value, 2)), unit
+    return amount, base_unit
@@ -1,7 +1,9 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from api.views import (CustomUserViewSet, IngredientViewSet, RecipeViewSet,
+from api.views import (BatchView, CustomUserViewSet, EventStreamView,
+                       EventTicketView, IngredientViewSet, JobViewSet,
+                       ProfileReportView, QueryLogView, RecipeViewSet,
                        TagViewSet)
 
 router = DefaultRouter()
@@ -9,8 +11,15 @@ router.register('users', CustomUserViewSet, basename='users')
 router.register('recipes', RecipeViewSet)
 router.register('tags', TagViewSet)
 router.register('ingredients', IngredientViewSet)
+router.register('jobs', JobViewSet, basename='jobs')
 
 urlpatterns = [
+    path('batch/', BatchView.as_view(), name='batch'),
+    path('events/', EventStreamView.as_view(), name='events'),
+    path('events/ticket/', EventTicketView.as_view(), name='events-ticket'),
+    path('querylog/', QueryLogView.as_view(), name='querylog'),
+    path('profiles/<str:report_id>/', ProfileReportView.as_view(),
+         name='profile-report'),
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
     path('', include('djoser.urls')),
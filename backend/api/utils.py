@@ -1,21 +1,163 @@
-from django.conf import settings
-
-
-def create_file_with_ingredients(shop_cart):
-    file_path = f'{settings.BASE_DIR}/shopping-list.txt'
-    with open(file_path, 'w+') as file:
-        file.write('Список покупок:\n')
-        file.write('\n')
-        for cart in shop_cart:
-            file.write(
-                f'Рецепт {cart.recipe.name} от {cart.recipe.author}:\n'
-            )
-            for ingr_in_recipe in cart.recipe.recipe_ingredients.all():
-                ingredient = ingr_in_recipe.ingredient
-                file.write(
-                    f'{ingredient.name} -'
-                    f' {ingr_in_recipe.amount} '
-                    f'{ingredient.measurement_unit}\n'
-                )
-            file.write('\n')
-        return file
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, Exists, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from foodgram.constants import PROFILE_CACHE_TIMEOUT
+from foodgram.metrics import registry
+from recipe.catalog import get_catalog
+from recipe.models import (Favorite, Follow, Recipe, RecipeChange,
+                           ShoppingCart, ShoppingListItem, User)
+from .units import humanize, is_liquid_unit, to_base
+
+
+def aggregate_ingredients(rows):
+    """
+    Сложение ингредиентов с приведением единиц измерения.
+    rows - итерируемое из (название, единица, количество).
+    Одинаковые ингредиенты в 'г' и 'кг', 'мл' и 'л' складываются в одну строку.
+    Ложки и стаканы переводятся в мл, только если этот же ингредиент
+    есть в списке в мл или л, иначе остаются как есть.
+    """
+    rows = list(rows)
+    liquids = {
+        name.lower() for name, measurement_unit, _ in rows
+        if is_liquid_unit(measurement_unit)
+    }
+    totals = {}
+    for name, measurement_unit, amount in rows:
+        amount, base_unit = to_base(
+            amount, measurement_unit, liquid=name.lower() in liquids
+        )
+        key = (name.lower(), base_unit)
+        if key in totals:
+            totals[key][1] += amount
+        else:
+            totals[key] = [name, amount]
+
+    shopping_list = []
+    for (_, base_unit), (name, amount) in sorted(totals.items()):
+        amount, measurement_unit = humanize(amount, base_unit)
+        shopping_list.append({
+            'name': name,
+            'amount': amount,
+            'measurement_unit': measurement_unit,
+        })
+    return shopping_list
+
+
+def get_shopping_list_rows(user):
+    """
+    Строки списка покупок юзера: (название, единица, количество).
+    Суммы по ингредиентам хранятся в ShoppingListItem и поддерживаются
+    при изменениях, здесь только читаются: строка на ингредиент.
+    """
+    return list(ShoppingListItem.objects.filter(user=user).order_by(
+        'ingredient_id'
+    ).values_list(
+        'ingredient__name', 'ingredient__measurement_unit', 'amount'
+    ))
+
+
+def get_shopping_list(user):
+    """Список покупок юзера."""
+    return aggregate_ingredients(get_shopping_list_rows(user))
+
+
+def get_cart_recipes(user):
+    """Рецепты в списке покупок юзера: (название, автор)."""
+    return list(ShoppingCart.objects.filter(user=user).order_by(
+        'pk'
+    ).values_list('recipe__name', 'recipe__author__username'))
+
+
+def create_text_with_ingredients(shopping_list, recipes=()):
+    """
+    Текст списка покупок для скачивания.
+    recipes - из get_cart_recipes: строки 'Рецепт X от Y' перед суммами.
+    """
+    lines = ['Список покупок:', '']
+    if recipes:
+        lines.extend(f'Рецепт {name} от {author}' for name, author in recipes)
+        lines.append('')
+    lines.extend(
+        f'{item["name"]} - {item["amount"]} {item["measurement_unit"]}'
+        for item in shopping_list
+    )
+    return '\n'.join(lines) + '\n'
+
+
+def user_flags_changed(user):
+    """
+    Подзапрос: время последнего изменения избранного и списка покупок
+    юзера для ETag рецепта. is_favorited и is_in_shopping_cart зависят
+    от юзера, а не от updated_at рецепта. Берётся из журнала
+    RecipeChange, записи с user_id пишутся в одной транзакции
+    с изменением, поэтому время одинаково во всех воркерах.
+    """
+    return Subquery(RecipeChange.objects.filter(user_id=user.pk).order_by(
+        '-id'
+    ).values('created')[:1])
+
+
+def get_tag_ids():
+    """
+    Словарь slug -> id тэгов из справочника (recipe.catalog).
+    Справочник общий для воркеров и пересобирается после коммита
+    изменений тэгов, поэтому новый тэг сразу виден во всех воркерах.
+    """
+    return {tag['slug']: tag['id'] for tag in get_catalog().tags()}
+
+
+def count_subquery(model, field):
+    """Количество строк model, у которых field равно pk внешнего запроса."""
+    counts = model.objects.filter(
+        **{field: OuterRef('pk')}
+    ).order_by().values(field).annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def get_profile_queryset(user):
+    """Юзер со счётчиками рецептов, избранного, покупок и подписок."""
+    return User.objects.filter(pk=user.pk).annotate(
+        is_subscribed=Exists(Follow.objects.filter(
+            user=user, author=OuterRef('pk')
+        )),
+        recipes_count=count_subquery(Recipe, 'author'),
+        favorites_count=count_subquery(Favorite, 'user'),
+        shopping_cart_count=count_subquery(ShoppingCart, 'user'),
+        subscriptions_count=count_subquery(Follow, 'user'),
+        subscribers_count=count_subquery(Follow, 'author'),
+    )
+
+
+def get_profile_cache_key(user_id):
+    return f'user-profile:{user_id}'
+
+
+def get_cached_profile(user, serialize):
+    """
+    Профиль юзера из общего для воркеров кэша.
+    serialize(user) строит ответ, если в кэше его нет.
+    Сбрасывается сигналами из api.signals.
+    """
+    key = get_profile_cache_key(user.pk)
+    profile = caches['shared'].get(key)
+    registry.inc(
+        'cache_requests_total', cache='profile',
+        result='miss' if profile is None else 'hit'
+    )
+    if profile is None:
+        profile = serialize(get_profile_queryset(user).get())
+        caches['shared'].set(key, profile, PROFILE_CACHE_TIMEOUT)
+    return profile
+
+
+def reset_profiles(*user_ids):
+    """
+    Сброс сразу и после коммита: профиль, прочитанный другим воркером
+    до коммита, не остаётся в кэше.
+    """
+    keys = [get_profile_cache_key(pk) for pk in user_ids]
+    caches['shared'].delete_many(keys)
+    transaction.on_commit(lambda: caches['shared'].delete_many(keys))
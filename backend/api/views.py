@@ -1,55 +1,108 @@
-from django.conf import settings
-from django.http import FileResponse
+import hashlib
+import io
+import time
+from datetime import timedelta
+from functools import partial
+
+from django.core import signing
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from rest_framework import filters, status, viewsets
+from rest_framework import filters, mixins, status, viewsets
+from rest_framework.authtoken.models import Token
 from rest_framework.decorators import action
-from rest_framework.exceptions import ValidationError
-from rest_framework.pagination import PageNumberPagination
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.permissions import (AllowAny, IsAdminUser,
+                                        IsAuthenticated)
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
-
-from recipe.models import Ingredient, Recipe, Tag, User
+from rest_framework.views import APIView
+
+from foodgram import querylog
+from foodgram.constants import CHANGELOG_PAGE_SIZE, CHANGELOG_SETTLE_SECONDS
+from foodgram.profiling import get_report
+from jobs.models import Job
+from jobs.registry import enqueue
+from recipe import catalog
+from recipe.exchange import RecipeImporter, export_recipes
+from recipe.models import (Ingredient, IngredientInRecipe, Recipe,
+                           RecipeChange, Tag, User)
+from .batch import run_batch
+from .events import EventStreamRenderer, get_ticket, read_ticket, stream
+from .exports import (EXPORT_FORMATS, export_storage, get_cart_version,
+                      get_download_info, get_export_path, read_download_token,
+                      serve_export)
+from .fast_serializers import get_recipe_rows, serialize_recipe_rows
 from .filters import RecipeFilterSet
 from .paginators import CustomPagination
 from .permissions import IsAdminOrAuthorOrReadOnly
-from .utils import create_file_with_ingredients
-from .serializers import (CreateUpdateRecipeSerializer, CustomUserSerializer,
-                          FavoriteSerializer, FollowSerializer,
-                          IngredientSerializer, ListRecipeSerializer,
-                          ShoppingCartSerializer, SubscribeSerializer,
-                          TagSerializer)
-
-
-class CustomUserViewSet(UserViewSet):
+from .streaming import StreamingListMixin
+from .throttling import MeasuredCostMixin
+from .utils import (create_text_with_ingredients, get_cached_profile,
+                    get_cart_recipes, get_shopping_list,
+                    get_shopping_list_rows, user_flags_changed)
+from .serializers import (BatchSerializer, CreateUpdateRecipeSerializer,
+                          CustomUserSerializer, FavoriteSerializer,
+                          FollowSerializer,
+                          IngredientSerializer, JobSerializer,
+                          ListRecipeSerializer, ProfileSerializer, ShoppingCartSerializer,
+                          SubscribeSerializer, TagSerializer)
+
+
+class CustomUserViewSet(MeasuredCostMixin, StreamingListMixin, UserViewSet):
     """Вью для работы с юзером, подпиской  отображением подписки."""
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
     pagination_class = CustomPagination
     filter_backends = (DjangoFilterBackend,)
 
+    def list(self, request, *args, **kwargs):
+        """Список юзеров потоком: limit до MAX_PAGE_SIZE."""
+        return self.stream_list(self.filter_queryset(self.get_queryset()))
+
+    @action(
+        detail=False, methods=['GET'], url_path='me/profile',
+        permission_classes=(IsAuthenticated,)
+    )
+    def profile(self, request):
+        """
+        Текущий юзер со счётчиками рецептов, избранного, списка покупок,
+        подписок и подписчиков. Один запрос к БД, ответ кэшируется.
+        """
+        return Response(get_cached_profile(
+            request.user,
+            lambda user: ProfileSerializer(
+                user, context={'request': request}
+            ).data
+        ))
+
     @action(
         detail=False, methods=['GET'],
         permission_classes=(IsAuthenticated,)
     )
     def subscriptions(self, request):
-        """Отображение подписок."""
+        """
+        Отображение подписок потоком. Рецепты авторов подгружаются
+        на каждую пачку авторов.
+        """
         authors = User.objects.filter(
             following__user=self.request.user
         )
-        page = self.paginate_queryset(authors)
-        if page is not None:
-            serializer = FollowSerializer(
-                page, many=True, context={'request': request}
-            )
-
-            return self.get_paginated_response(serializer.data)
-
-        serializer = FollowSerializer(
-            authors, many=True, context={'request': request}
-        )
-
-        return Response(serializer.data)
+        return self.stream_list(authors, partial(
+            self.serialize_chunk, serializer_class=FollowSerializer,
+            prefetch=('recipe__tags', Prefetch(
+                'recipe__recipe_ingredients',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient'
+                )
+            ))
+        ))
 
     @action(
         detail=True, methods=['POST', 'DELETE'],
@@ -80,14 +133,19 @@ class CustomUserViewSet(UserViewSet):
         )
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(MeasuredCostMixin, viewsets.ReadOnlyModelViewSet):
     """Вью для работы с тегами."""
     serializer_class = TagSerializer
     pagination_class = None
     queryset = Tag.objects.all()
 
+    def list(self, request, *args, **kwargs):
+        """Список из общего справочника recipe.catalog, без запроса к базе."""
+        return Response(catalog.get_catalog().tags())
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+
+class IngredientViewSet(MeasuredCostMixin, StreamingListMixin,
+                        viewsets.ReadOnlyModelViewSet):
     """Вью для работы с ингредиентами."""
     serializer_class = IngredientSerializer
     queryset = Ingredient.objects.all()
@@ -95,27 +153,182 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = (filters.SearchFilter,)
     search_fields = ('^name',)
 
+    def list(self, request, *args, **kwargs):
+        """
+        Список из общего справочника recipe.catalog потоком, без запроса
+        к базе. Поиск - как у SearchFilter с '^name'.
+        """
+        terms = filters.SearchFilter().get_search_terms(request)
+        return self.stream_list(
+            catalog.get_catalog().search_ingredients(terms), serialize=list
+        )
+
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(MeasuredCostMixin, viewsets.ModelViewSet):
     """Вью для работы с рецептами. Сериализатор в зависимости от метода."""
     queryset = Recipe.objects.all()
     permission_classes = [IsAdminOrAuthorOrReadOnly, ]
-    pagination_class = PageNumberPagination
+    pagination_class = CustomPagination
     filter_backends = (DjangoFilterBackend,)
     search_fields = ('^name',)
     filterset_class = RecipeFilterSet
 
+    def get_requested_fields(self):
+        """
+        Поля рецепта из параметров ?fields= и ?omit=.
+        Например, для карточек: ?fields=id,name,image,cooking_time,is_favorited
+        """
+        params = self.request.query_params
+        fields = set(ListRecipeSerializer.Meta.fields)
+        if params.get('fields'):
+            fields &= set(params['fields'].split(','))
+        if params.get('omit'):
+            fields -= set(params['omit'].split(','))
+        return fields
+
+    def needs_user_flags(self):
+        """Нужны ли аннотации is_favorited/is_in_shopping_cart."""
+        if self.action not in ('list', 'retrieve'):
+            return True
+        flags = {'is_favorited', 'is_in_shopping_cart'}
+        return bool(
+            flags & self.get_requested_fields()
+            or flags & set(self.request.query_params)
+        )
+
     def get_queryset(self):
+        """
+        Рецепты с флагами юзера, если они нужны. Автор, тэги и
+        ингредиенты для list и retrieve берутся из карточек
+        (recipe.read_model) в fast_serializers.
+        """
         user = self.request.user
-
-        if user.is_authenticated:
-            queryset = Recipe.objects.with_is_favorite_and_shopping_cart(
+        if user.is_authenticated and self.needs_user_flags():
+            return Recipe.objects.with_is_favorite_and_shopping_cart(
                 user=user
             )
-        else:
-            queryset = Recipe.objects.all()
+        return Recipe.objects.all()
+
+    def list(self, request, *args, **kwargs):
+        """
+        Список рецептов. Строится из values() с карточками рецептов
+        в fast_serializers, вывод совпадает с ListRecipeSerializer.
+        """
+        fields = self.get_requested_fields()
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(get_recipe_rows(queryset, fields))
+        if page is not None:
+            return self.get_paginated_response(
+                serialize_recipe_rows(page, fields, request)
+            )
 
-        return queryset
+        return Response(serialize_recipe_rows(
+            get_recipe_rows(queryset, fields), fields, request
+        ))
+
+    def get_validators(self, updated_at, flags_changed):
+        """
+        ETag и Last-Modified рецепта.
+        Учитываются updated_at, запрошенные поля и для юзера - время
+        изменения его избранного и списка покупок (flags_changed).
+        """
+        last_modified = updated_at
+        if flags_changed is not None:
+            last_modified = max(last_modified, flags_changed)
+        etag = hashlib.md5(
+            f'{self.request.get_full_path()}:{self.request.user.pk}:'
+            f'{updated_at.isoformat()}:{flags_changed}'.encode()
+        ).hexdigest()
+        return quote_etag(etag), int(last_modified.timestamp())
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Рецепт с ETag/Last-Modified.
+        На If-None-Match/If-Modified-Since отвечаем 304 после одного
+        SQL-запроса: рецепт по первичному ключу (updated_at и проверка
+        прав на объект) с подзапросом времени изменения флагов юзера,
+        без сериализации.
+        """
+        recipe = Recipe.objects.filter(pk=kwargs['pk']).only(
+            'id', 'author_id', 'updated_at'
+        )
+        if request.user.is_authenticated:
+            recipe = recipe.annotate(
+                flags_changed=user_flags_changed(request.user)
+            )
+        recipe = recipe.first()
+        if recipe is None:
+            raise Http404
+        self.check_object_permissions(request, recipe)
+        etag, last_modified = self.get_validators(
+            recipe.updated_at, getattr(recipe, 'flags_changed', None)
+        )
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            fields = self.get_requested_fields()
+            data = serialize_recipe_rows(get_recipe_rows(
+                self.filter_queryset(self.get_queryset()).filter(
+                    pk=kwargs['pk']
+                ),
+                fields
+            ), fields, request)
+            if not data:
+                raise Http404
+            response = Response(data[0])
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def get_number_param(self, name, default):
+        value = self.request.query_params.get(name, str(default))
+        if not value.isdigit():
+            raise ValidationError({name: 'Должно быть целым числом.'})
+        return int(value)
+
+    @action(detail=False, methods=['GET'])
+    def changes(self, request):
+        """
+        Изменения рецептов после номера ?since= из журнала RecipeChange.
+        upserts - изменённые рецепты в текущем виде, deleted - id удалённых,
+        seq - since для следующего запроса, has_more - есть ли ещё изменения.
+        Записи моложе CHANGELOG_SETTLE_SECONDS не отдаются: транзакция,
+        записавшая меньший номер, может быть ещё не завершена.
+        Запись транзакции, которая коммитится позже чем через
+        CHANGELOG_SETTLE_SECONDS после записи в журнал, клиент пропустит:
+        транзакции, пишущие в журнал, должны быть короче этого окна.
+        """
+        since = self.get_number_param('since', 0)
+        limit = min(
+            self.get_number_param('limit', CHANGELOG_PAGE_SIZE),
+            CHANGELOG_PAGE_SIZE
+        ) or CHANGELOG_PAGE_SIZE
+        settled = timezone.now() - timedelta(seconds=CHANGELOG_SETTLE_SECONDS)
+        entries = list(RecipeChange.objects.visible_to(request.user).filter(
+            id__gt=since, created__lte=settled
+        ).values_list('id', 'recipe_id', 'action')[:limit + 1])
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+
+        actions = {recipe_id: action for _, recipe_id, action in entries}
+        fields = self.get_requested_fields()
+        rows = list(get_recipe_rows(
+            self.get_queryset().filter(pk__in=[
+                recipe_id for recipe_id, action in actions.items()
+                if action == RecipeChange.UPSERT
+            ]),
+            fields
+        ))
+        found = {row['id'] for row in rows}
+        return Response({
+            'seq': entries[-1][0] if entries else since,
+            'has_more': has_more,
+            'upserts': serialize_recipe_rows(rows, fields, request),
+            'deleted': sorted(set(actions) - found),
+        })
 
     def get_serializer_class(self):
         """выбор сериализатора."""
@@ -129,6 +342,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         detail=True, methods=['POST', 'DELETE'],
         permission_classes=(IsAuthenticated,)
     )
+    @transaction.atomic
     def favorite(self, request, pk):
         """Добавление в избранное, удаление из избранного. +валидация"""
         user = request.user
@@ -159,6 +373,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         detail=True, methods=['POST', 'DELETE'],
         permission_classes=(IsAuthenticated,)
     )
+    @transaction.atomic
     def shopping_cart(self, request, pk):
         """Добаление в список покупок, удаление из него. +валидация"""
         user = request.user
@@ -184,20 +399,261 @@ class RecipeViewSet(viewsets.ModelViewSet):
             status=status.HTTP_204_NO_CONTENT
         )
 
+    @action(
+        detail=False, methods=['GET'], url_path='shopping_cart/summary',
+        permission_classes=(IsAuthenticated,)
+    )
+    def shopping_cart_summary(self, request):
+        """Количество рецептов в списке покупок и суммы ингредиентов."""
+        return Response({
+            'recipes_count': request.user.shop_recipes.count(),
+            'ingredients': get_shopping_list(request.user),
+        })
+
+    @action(
+        detail=False, methods=['GET'], url_path='export',
+        permission_classes=(IsAdminUser,)
+    )
+    def export_recipes(self, request):
+        """Выгрузка всех рецептов в JSON Lines потоком. Только для staff."""
+        response = StreamingHttpResponse(
+            export_recipes(), content_type='application/x-ndjson'
+        )
+        response['Content-Disposition'] = (
+            'attachment; filename="recipes.jsonl"'
+        )
+        return response
+
+    @action(
+        detail=False, methods=['POST'], url_path='import',
+        permission_classes=(IsAdminUser,)
+    )
+    def import_recipes(self, request):
+        """
+        Загрузка рецептов из JSON Lines (поле file). Только для staff.
+        skip - сколько строк файла пропустить при повторной загрузке.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': 'Загрузите файл JSON Lines.'})
+        skip = request.data.get('skip', '0')
+        if not str(skip).isdigit():
+            raise ValidationError({'skip': 'skip должен быть числом!'})
+
+        progress = {'last_line': int(skip)}
+        stats = RecipeImporter().run(
+            io.TextIOWrapper(upload, encoding='utf-8'), skip=int(skip),
+            on_batch=lambda line: progress.update(last_line=line)
+        )
+        return Response({**stats, **progress}, status=status.HTTP_201_CREATED)
+
     @action(
         detail=False, methods=['GET'],
         permission_classes=(IsAuthenticated,)
     )
-    def download_shopping_cart(self, *args, **kwargs):
-        """Скачивание файла в txt-формате."""
-        create_file_with_ingredients(
-            shop_cart=self.request.user.shop_recipes.all().prefetch_related(
-                'recipe__recipe_ingredients__ingredient'
-            )
+    def download_shopping_cart(self, request, *args, **kwargs):
+        """
+        Скачивание списка покупок в txt-формате.
+        С параметром ?output=json список отдаётся в JSON.
+        С ?export=txt|csv|pdf файл собирается фоновой задачей: ответ 202
+        с задачей, токен и ссылка на файл появятся в её результате.
+        Если файл для текущего списка покупок уже есть - сразу 200
+        с токеном и ссылкой. ?background=1 - то же, что ?export=txt.
+        """
+        export_format = request.query_params.get('export') or (
+            'txt' if request.query_params.get('background') else None
+        )
+        if export_format is not None:
+            return self.export_shopping_cart(request, export_format)
+
+        shopping_list = get_shopping_list(user=request.user)
+        if request.query_params.get('output') == 'json':
+            return Response(shopping_list)
+
+        response = HttpResponse(
+            create_text_with_ingredients(
+                shopping_list, get_cart_recipes(request.user)
+            ),
+            content_type='text/plain; charset=utf-8'
         )
-        with open(f'{settings.BASE_DIR}/shopping-list.txt', 'r+') as file:
-            response = FileResponse(file.read(), content_type='text/plain')
         response['Content-Disposition'] = (
             'attachment; filename="shopping-list.txt"'
         )
         return response
+
+    def export_shopping_cart(self, request, export_format):
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError({'export': [
+                f'Доступные форматы: {", ".join(EXPORT_FORMATS)}.'
+            ]})
+        rows = get_shopping_list_rows(request.user)
+        version = get_cart_version(rows, get_cart_recipes(request.user))
+        path = get_export_path(request.user.pk, version, export_format)
+        if export_storage.exists(path):
+            return Response(get_download_info(path, request))
+
+        payload = {'user_id': request.user.pk, 'export': export_format}
+        key = f'shopping-list:{request.user.pk}:{version}:{export_format}'
+        job = enqueue(
+            'shopping_list_export', payload, user=request.user, key=key
+        )
+        if job.status == Job.DONE:
+            # Файл задачи удалён командой clean_shopping_list_exports.
+            Job.objects.filter(pk=job.pk).update(idempotency_key=None)
+            job = enqueue(
+                'shopping_list_export', payload, user=request.user, key=key
+            )
+        return Response(
+            JobSerializer(job, context={'request': request}).data,
+            status=status.HTTP_202_ACCEPTED
+        )
+
+    @action(
+        detail=False, methods=['GET'],
+        url_path=r'shopping_cart/files/(?P<token>[\w:-]+)',
+        url_name='shopping-cart-file', permission_classes=(AllowAny,)
+    )
+    def shopping_cart_file(self, request, token):
+        """Файл выгрузки списка покупок по токену из export_shopping_cart."""
+        try:
+            path = read_download_token(token)
+        except signing.BadSignature:
+            raise Http404
+        if not export_storage.exists(path):
+            raise Http404
+        return serve_export(path)
+
+
+class JobViewSet(MeasuredCostMixin, mixins.RetrieveModelMixin,
+                 viewsets.GenericViewSet):
+    """Статус фоновой задачи. Юзер видит только свои задачи."""
+    serializer_class = JobSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        if self.request.user.is_staff:
+            return Job.objects.all()
+        return Job.objects.filter(user=self.request.user)
+
+
+class QueryLogView(APIView):
+    """
+    Самые тяжёлые SQL-запросы по отпечаткам, сложенные по всем воркерам
+    (QUERY_LOG['DIR']). Только для staff.
+    ?sort=total|max|count, ?limit=, ?window=last - предыдущее окно,
+    уже записанное в лог, ?minutes= - окна из QUERY_LOG['FILE'] за
+    последние минуты вместе с текущими.
+    """
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        sort = request.query_params.get('sort', 'total')
+        if sort not in ('total', 'max', 'count'):
+            raise ValidationError({'sort': ['total, max или count.']})
+        limit = request.query_params.get('limit', '')
+        limit = int(limit) if limit.isdigit() else querylog.config['TOP']
+        minutes = request.query_params.get('minutes', '')
+        if minutes and not minutes.isdigit():
+            raise ValidationError({'minutes': ['Должно быть целым числом.']})
+        if minutes and not querylog.config['FILE']:
+            raise ValidationError({'minutes': ['QUERY_LOG_FILE не задан.']})
+
+        current, last = querylog.collect()
+        if request.query_params.get('window') == 'last':
+            windows = [window for window in last if window['started']]
+        elif minutes:
+            windows = list(querylog.read_flushed(
+                time.time() - int(minutes) * 60
+            )) + current
+        else:
+            windows = current
+        return Response({
+            'started': min(
+                (window['started'] for window in windows), default=None
+            ),
+            'processes': len(current),
+            'queries': querylog.merge(
+                (window['queries'] for window in windows), limit, sort
+            ),
+        })
+
+
+class ProfileReportView(APIView):
+    """Отчёт профилирования запроса по id из заголовка X-Profile-Id."""
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, report_id):
+        report = get_report(report_id)
+        if report is None:
+            raise Http404
+        return Response(report)
+
+
+class BatchView(APIView):
+    """
+    Несколько запросов к API в одном: {"requests": [{"method", "url",
+    "body"}], "parallel": false}. Ответ - список status/headers/body
+    в порядке запросов.
+    """
+    permission_classes = (AllowAny,)
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(run_batch(
+            request, serializer.validated_data['requests'],
+            parallel=serializer.validated_data['parallel']
+        ))
+
+
+class EventTicketView(APIView):
+    """
+    Билет на поток событий: EventSource не передаёт Authorization.
+    Билет привязан к токену запроса.
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        token = request.auth
+        if not isinstance(token, Token):
+            token = Token.objects.filter(user=request.user).first()
+        if token is None:
+            raise PermissionDenied('Билет выдаётся только по токену.')
+        ticket = get_ticket(token)
+        return Response({
+            'ticket': ticket,
+            'url': request.build_absolute_uri(
+                f'{reverse("events")}?ticket={ticket}'
+            ),
+        })
+
+
+class EventStreamView(APIView):
+    """
+    Поток событий юзера (text/event-stream): избранное, список покупок,
+    подписки. Открывается по билету из EventTicketView, переподключение
+    с Last-Event-ID - по тому же билету (контракт - в api.events).
+    """
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+    renderer_classes = (EventStreamRenderer, JSONRenderer)
+
+    def get(self, request):
+        last_event_id = request.META.get('HTTP_LAST_EVENT_ID', '')
+        reconnect = last_event_id.isdigit()
+        try:
+            user_id = read_ticket(
+                request.query_params.get('ticket', ''), reconnect
+            )
+        except signing.BadSignature:
+            raise PermissionDenied('Билет недействителен или истёк.')
+        response = StreamingHttpResponse(
+            stream(
+                user_id,
+                int(last_event_id) if reconnect else None
+            ),
+            content_type='text/event-stream; charset=utf-8'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
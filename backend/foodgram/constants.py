@@ -12,3 +12,10 @@ MAX_VALUE_SLUG = 30
 HEX_FORMAT_VALIDATE = '^#([A-Fa-f0-9]{6}|[A-Fa-f0-9]{3})$'
 MAX_VALUE_COLOR = 7
 MIN_VALUE_AMOUNT = 1
+TOKEN_CACHE_MAX_SIZE = 10000
+TOKEN_CACHE_TTL = 300
+ADMIN_COUNT_LIMIT = 10000
+PROFILE_CACHE_TIMEOUT = 600
+CHANGELOG_PAGE_SIZE = 500
+CHANGELOG_SETTLE_SECONDS = 2
+STREAM_CHUNK_SIZE = 200
@@ -0,0 +1,69 @@
+"""
+Общее для замеров запросов (metrics, querylog, profiling).
+Потоковый ответ выполняет SQL-запросы уже после выхода из middleware,
+пока отдаётся клиенту, поэтому замеры для него продолжаются до конца
+отдачи (finish_after_stream).
+"""
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+
+@contextmanager
+def execute_wrappers(wrapper):
+    """execute_wrapper на всех соединениях на время блока."""
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(wrapper))
+        yield
+
+
+class FinishingStream:
+    """
+    Содержимое потокового ответа, которое отдаётся под context()
+    и вызывает finish() один раз: после отдачи, при обрыве или при
+    закрытии ответа, если отдача не началась (response.close()
+    закрывает содержимое, у которого есть close).
+    """
+
+    def __init__(self, content, finish, context=None):
+        self.finish = finish
+        self.finished = False
+        self._iterator = self._stream(content, context)
+
+    def __iter__(self):
+        return self._iterator
+
+    def _stream(self, content, context):
+        try:
+            if context is None:
+                yield from content
+            else:
+                with context():
+                    yield from content
+        finally:
+            self._finish_once()
+
+    def _finish_once(self):
+        if not self.finished:
+            self.finished = True
+            self.finish()
+
+    def close(self):
+        self._iterator.close()
+        self._finish_once()
+
+
+def finish_after_stream(response, finish, context=None):
+    """
+    finish() - после отдачи ответа: для обычного ответа сразу, для
+    потокового - когда поток отдан, оборван или ответ закрыт.
+    context() - контекст, под которым отдаётся поток (execute_wrappers).
+    """
+    if not response.streaming:
+        finish()
+        return response
+    response.streaming_content = FinishingStream(
+        response.streaming_content, finish, context
+    )
+    return response
@@ -0,0 +1,257 @@
+"""
+Метрики в текстовом формате Prometheus: /metrics.
+Значения копятся в памяти процесса. Если задан METRICS['DIR'], каждый
+процесс раз в DUMP_INTERVAL секунд (и при выходе) пишет свои значения
+в файл <pid>.json в этой папке, а /metrics складывает файлы всех
+процессов: счётчики и гистограммы суммируются, gauge отдаются по pid
+только для живых процессов. Так работает несколько воркеров gunicorn
+без внешнего сервиса.
+"""
+import atexit
+import glob
+import json
+import os
+import resource
+import threading
+import time
+from collections import defaultdict
+from functools import partial
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from .instrumentation import execute_wrappers, finish_after_stream
+
+config = settings.METRICS
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Имя -> (тип, описание, границы гистограммы).
+METRICS = {
+    'http_request_duration_seconds': (
+        'histogram', 'Время ответа по маршруту и методу.', LATENCY_BUCKETS
+    ),
+    'http_requests_total': (
+        'counter', 'Запросы по маршруту, методу и статусу.', None
+    ),
+    'db_queries_per_request': (
+        'histogram', 'Количество SQL-запросов на HTTP-запрос.', QUERY_BUCKETS
+    ),
+    'cache_requests_total': (
+        'counter', 'Обращения к кэшам: result=hit|miss.', None
+    ),
+    'favorites_added_total': (
+        'counter', 'Добавления рецептов в избранное.', None
+    ),
+    'shopping_cart_added_total': (
+        'counter', 'Добавления рецептов в список покупок.', None
+    ),
+    'process_resident_memory_bytes': (
+        'gauge', 'Память процесса (RSS) по pid.', None
+    ),
+}
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(
+            name, str(value).replace('\\', r'\\').replace('"', r'\"')
+        )
+        for name, value in labels
+    ) + '}'
+
+
+def sort_key(item):
+    """Серии по имени и меткам, границы гистограммы - по возрастанию."""
+    name, labels, _ = item
+    return name, [
+        (label, float(value) if label == 'le' else str(value))
+        for label, value in labels
+    ]
+
+
+def format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def get_memory_usage():
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Registry:
+    """Значения метрик процесса: (имя серии, метки) -> число."""
+
+    def __init__(self):
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+        self._last_dump = time.monotonic()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] += value
+
+    def observe(self, name, value, **labels):
+        """Наблюдение для гистограммы: _bucket, _sum и _count."""
+        labels = tuple(sorted(labels.items()))
+        with self._lock:
+            for bound in METRICS[name][2]:
+                if value <= bound:
+                    self._values[
+                        (f'{name}_bucket', labels + (('le', bound),))
+                    ] += 1
+            self._values[(f'{name}_bucket', labels + (('le', '+Inf'),))] += 1
+            self._values[(f'{name}_sum', labels)] += value
+            self._values[(f'{name}_count', labels)] += 1
+
+    def collect(self):
+        """Счётчики и гистограммы процесса и его gauge."""
+        from api.authentication import token_cache
+
+        with self._lock:
+            values = dict(self._values)
+        stats = token_cache.stats()
+        for result, count in (('hit', stats['hits']),
+                              ('miss', stats['misses'])):
+            key = ('cache_requests_total',
+                   (('cache', 'token'), ('result', result)))
+            values[key] = values.get(key, 0) + count
+        gauges = {
+            ('process_resident_memory_bytes', (('pid', os.getpid()),)):
+                get_memory_usage(),
+        }
+        return values, gauges
+
+    def dump(self):
+        """Запись значений процесса в METRICS['DIR']."""
+        self._last_dump = time.monotonic()
+        values, gauges = self.collect()
+        path = os.path.join(config['DIR'], f'{os.getpid()}.json')
+        with open(path + '.tmp', 'w') as dump_file:
+            json.dump({
+                'values': [[name, labels, value]
+                           for (name, labels), value in values.items()],
+                'gauges': [[name, labels, value]
+                           for (name, labels), value in gauges.items()],
+            }, dump_file)
+        os.replace(path + '.tmp', path)
+
+    def dump_if_due(self):
+        if (config['DIR']
+                and time.monotonic() - self._last_dump
+                >= config['DUMP_INTERVAL']):
+            self.dump()
+
+    def aggregate(self):
+        """Значения всех процессов из METRICS['DIR'] или только этого."""
+        if not config['DIR']:
+            return self.collect()
+        self.dump()
+        values = defaultdict(float)
+        gauges = {}
+        for path in glob.glob(os.path.join(config['DIR'], '*.json')):
+            pid = int(os.path.basename(path).split('.')[0])
+            try:
+                with open(path) as dump_file:
+                    data = json.load(dump_file)
+            except (OSError, ValueError):
+                continue
+            for name, labels, value in data['values']:
+                values[(name, tuple(map(tuple, labels)))] += value
+            if is_alive(pid):
+                for name, labels, value in data['gauges']:
+                    gauges[(name, tuple(map(tuple, labels)))] = value
+        return values, gauges
+
+    def render(self):
+        values, gauges = self.aggregate()
+        values.update(gauges)
+        series = defaultdict(list)
+        for (name, labels), value in values.items():
+            base = name
+            for suffix in ('_bucket', '_sum', '_count'):
+                if name.endswith(suffix) and name[:-len(suffix)] in METRICS:
+                    base = name[:-len(suffix)]
+            series[base].append((name, labels, value))
+
+        lines = []
+        for base in sorted(series):
+            kind, description = METRICS.get(base, ('untyped', ''))[:2]
+            lines.append(f'# HELP {base} {description}')
+            lines.append(f'# TYPE {base} {kind}')
+            lines.extend(
+                f'{name}{format_labels(labels)} {format_value(value)}'
+                for name, labels, value in sorted(series[base], key=sort_key)
+            )
+        return '\n'.join(lines) + '\n'
+
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+registry = Registry()
+
+if config['DIR']:
+    os.makedirs(config['DIR'], exist_ok=True)
+    atexit.register(registry.dump)
+
+
+class MetricsMiddleware:
+    """Время ответа и количество SQL-запросов по маршрутам."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = [0]
+
+        def count_query(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        def finish():
+            duration = time.monotonic() - started
+            match = getattr(request, 'resolver_match', None)
+            route = match.view_name if match else 'unmatched'
+            registry.observe(
+                'http_request_duration_seconds', duration,
+                route=route, method=request.method
+            )
+            registry.inc(
+                'http_requests_total', route=route, method=request.method,
+                status=response.status_code
+            )
+            registry.observe(
+                'db_queries_per_request', queries[0], route=route
+            )
+            registry.dump_if_due()
+
+        started = time.monotonic()
+        with execute_wrappers(count_query):
+            response = self.get_response(request)
+        # Потоковый ответ замеряется до конца отдачи.
+        return finish_after_stream(
+            response, finish, partial(execute_wrappers, count_query)
+        )
+
+
+def metrics_view(request):
+    return HttpResponse(
+        registry.render(), content_type='text/plain; version=0.0.4'
+    )
@@ -0,0 +1,136 @@
+import gzip
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+
+from .metrics import registry
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = re.compile(
+    r'^(text/(?!event-stream)|'
+    r'application/(json|javascript|xml|.*\+json|.*\+xml))'
+)
+ACCEPT_ENCODING_RE = re.compile(r'\s*([^\s;,]+)\s*(?:;\s*q=([0-9.]+))?')
+
+
+def parse_accept_encoding(header):
+    """Кодировки из Accept-Encoding с ненулевым q."""
+    accepted = {}
+    for encoding, quality in ACCEPT_ENCODING_RE.findall(header or ''):
+        try:
+            accepted[encoding.lower()] = float(quality) if quality else 1.0
+        except ValueError:
+            continue
+    return {encoding for encoding, quality in accepted.items() if quality > 0}
+
+
+def compress(body, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(body, quality=level)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+class CompressionMiddleware:
+    """
+    Сжатие ответов gzip или brotli по заголовку Accept-Encoding.
+    Маленькие ответы не сжимаются. Сжатые варианты ответов с сильным
+    ETag кладутся в кэш по ETag: повторный такой же ответ не сжимается
+    заново. Ответы без ETag сжимаются каждый раз, без хеширования тела
+    и обращения к кэшу. Потоковые ответы сжимаются gzip по частям.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = settings.COMPRESSION
+        self.cache = caches[self.config['CACHE_ALIAS']]
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.should_compress(response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if response.streaming:
+            return self.compress_stream(request, response)
+        encoding = self.choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING')
+        )
+        if encoding is None:
+            return response
+
+        etag = response.get('ETag')
+        compressed = self.get_compressed(
+            response.content, encoding, etag, response.get('Content-Type')
+        )
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+    def should_compress(self, response):
+        return not (
+            response.has_header('Content-Encoding')
+            or not response.streaming
+            and len(response.content) < self.config['MIN_SIZE']
+            or not COMPRESSIBLE_TYPES.match(response.get('Content-Type', ''))
+        )
+
+    def compress_stream(self, request, response):
+        """Потоковый ответ сжимается по частям, только gzip."""
+        accepted = parse_accept_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING')
+        )
+        if 'gzip' not in accepted:
+            return response
+        response.streaming_content = compress_sequence(
+            response.streaming_content
+        )
+        if response.has_header('Content-Length'):
+            del response['Content-Length']
+        response['Content-Encoding'] = 'gzip'
+        return response
+
+    def choose_encoding(self, accept_encoding):
+        accepted = parse_accept_encoding(accept_encoding)
+        if brotli is not None and 'br' in accepted:
+            return 'br'
+        if 'gzip' in accepted:
+            return 'gzip'
+        return None
+
+    def get_compressed(self, body, encoding, etag=None, content_type=''):
+        """
+        Сжатое тело. Кэш - только по сильному ETag (слабый не означает
+        побайтно одинаковые тела) вместе с Content-Type: ETag рецепта
+        одинаков для JSON и browsable API.
+        """
+        level = self.config['LEVELS'][encoding]
+        if (not etag or not etag.startswith('"')
+                or len(body) > self.config['CACHE_MAX_SIZE']):
+            return compress(body, encoding, level)
+
+        key = 'compressed:{}:{}:{}'.format(encoding, level, hashlib.md5(
+            f'{content_type}:{etag}'.encode()
+        ).hexdigest())
+        compressed = self.cache.get(key)
+        registry.inc(
+            'cache_requests_total', cache='compression',
+            result='miss' if compressed is None else 'hit'
+        )
+        if compressed is None:
+            compressed = compress(body, encoding, level)
+            self.cache.set(key, compressed, self.config['CACHE_TIMEOUT'])
+        return compressed
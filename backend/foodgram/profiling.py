@@ -0,0 +1,200 @@
+"""
+Профилирование отдельного запроса по требованию staff.
+Запрос с заголовком X-Profile: 1 или параметром ?profile=1 выполняется
+под cProfile и tracemalloc, SQL-запросы собираются по отпечаткам.
+Отчёт кладётся в общий для воркеров кэш CACHES['shared'], его id -
+в заголовке ответа X-Profile-Id, забрать отчёт: GET /api/profiles/<id>/.
+Не чаще раза в PROFILING['RATE'] секунд на юзера во всех воркерах и не
+больше одного профилируемого запроса в процессе одновременно.
+"""
+import cProfile
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .instrumentation import execute_wrappers, finish_after_stream
+from .querylog import fingerprint
+
+config = settings.PROFILING
+_lock = threading.Lock()
+
+
+def get_report_key(report_id):
+    return f'profile-report:{report_id}'
+
+
+def get_report(report_id):
+    return caches['shared'].get(get_report_key(report_id))
+
+
+def get_staff_user(request):
+    """Юзер из сессии или токена, если он staff."""
+    from api.authentication import CachedTokenAuthentication
+
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        try:
+            result = CachedTokenAuthentication().authenticate(request)
+        except Exception:
+            return None
+        user = result[0] if result else None
+    if user is not None and user.is_active and user.is_staff:
+        return user
+    return None
+
+
+def get_function_stats(profile):
+    stats = pstats.Stats(profile)
+    rows = sorted(
+        stats.stats.items(), key=lambda item: item[1][3], reverse=True
+    )[:config['TOP']]
+    return [
+        {
+            'function': f'{filename}:{line}({name})',
+            'calls': calls,
+            'tottime_ms': round(tottime * 1000, 3),
+            'cumtime_ms': round(cumtime * 1000, 3),
+        }
+        for (filename, line, name), (_, calls, tottime, cumtime, _)
+        in rows
+    ]
+
+
+def get_sql_stats(queries):
+    by_fingerprint = defaultdict(lambda: [0, 0.0])
+    for sql, duration_ms in queries:
+        entry = by_fingerprint[fingerprint(sql)]
+        entry[0] += 1
+        entry[1] += duration_ms
+    top = sorted(
+        by_fingerprint.items(), key=lambda item: item[1][1], reverse=True
+    )[:config['TOP']]
+    return {
+        'count': len(queries),
+        'total_ms': round(sum(duration for _, duration in queries), 3),
+        'queries': [
+            {'sql': sql, 'count': count, 'total_ms': round(total, 3)}
+            for sql, (count, total) in top
+        ],
+    }
+
+
+def get_memory_stats(snapshot, peak):
+    top = snapshot.statistics('lineno')[:config['TOP']]
+    return {
+        'peak_bytes': peak,
+        'allocations': [
+            {
+                'where': str(stat.traceback[0]),
+                'size_bytes': stat.size,
+                'count': stat.count,
+            }
+            for stat in top
+        ],
+    }
+
+
+class ProfilingMiddleware:
+    """Запуск запроса под профилировщиком, если его попросил staff."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def wants_profile(self, request):
+        return config['ENABLED'] and (
+            request.META.get('HTTP_X_PROFILE') == '1'
+            or request.GET.get('profile') == '1'
+        )
+
+    def __call__(self, request):
+        if not self.wants_profile(request):
+            return self.get_response(request)
+
+        user = get_staff_user(request)
+        if user is None:
+            return self.get_response(request)
+        if not caches['shared'].add(
+                f'profile-rate:{user.pk}', 1, config['RATE']):
+            response = self.get_response(request)
+            response['X-Profile-Status'] = 'rate-limited'
+            return response
+        if not _lock.acquire(blocking=False):
+            response = self.get_response(request)
+            response['X-Profile-Status'] = 'busy'
+            return response
+        try:
+            response = self.profile(request, user)
+        except BaseException:
+            _lock.release()
+            raise
+        return finish_after_stream(response, _lock.release)
+
+    def profile(self, request, user):
+        """
+        Потоковый ответ профилируется до конца отдачи, отчёт
+        сохраняется после неё.
+        """
+        queries = []
+
+        def record_query(execute, sql, params, many, context):
+            started = time.monotonic()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries.append((sql, (time.monotonic() - started) * 1000))
+
+        @contextmanager
+        def profiling():
+            with execute_wrappers(record_query):
+                profile.enable()
+                try:
+                    yield
+                finally:
+                    profile.disable()
+
+        def finish():
+            duration_ms = (time.monotonic() - started) * 1000
+            try:
+                snapshot = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                if not was_tracing:
+                    tracemalloc.stop()
+            caches['shared'].set(get_report_key(report_id), {
+                'id': report_id,
+                'method': request.method,
+                'path': request.get_full_path(),
+                'user': user.pk,
+                'status': response.status_code,
+                'started': time.time() - duration_ms / 1000,
+                'duration_ms': round(duration_ms, 3),
+                'functions': get_function_stats(profile),
+                'sql': get_sql_stats(queries),
+                'memory': get_memory_stats(snapshot, peak),
+            }, config['REPORT_TTL'])
+
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start()
+        elif hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        profile = cProfile.Profile()
+        report_id = uuid.uuid4().hex
+        started = time.monotonic()
+        try:
+            with profiling():
+                response = self.get_response(request)
+        except BaseException:
+            if not was_tracing:
+                tracemalloc.stop()
+            raise
+        response['X-Profile-Id'] = report_id
+        response['X-Profile-Status'] = 'done'
+        return finish_after_stream(response, finish, profiling)
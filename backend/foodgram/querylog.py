@@ -0,0 +1,277 @@
+"""
+Наблюдение за SQL-запросами в продакшене.
+QueryLogMiddleware подключает к соединениям execute_wrapper, запросы
+сводятся к отпечаткам (литералы заменены на ?), по паре (вью, отпечаток)
+копятся количество, суммарное и максимальное время. Раз в FLUSH_INTERVAL
+секунд накопленное пишется в лог 'foodgram.querylog' (и в FILE, если
+задан) и начинается новое окно. Медленные запросы пишутся сразу.
+Данные - в памяти процесса. Если задан DIR, каждый процесс раз в
+DUMP_INTERVAL секунд пишет текущее и предыдущее окно в <pid>.json в этой
+папке, и QueryLogView складывает окна всех живых процессов, как /metrics
+с METRICS['DIR']. Окна за больший период складываются из FILE.
+"""
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+
+from django.conf import settings
+
+from .instrumentation import execute_wrappers, finish_after_stream
+from .metrics import is_alive
+
+logger = logging.getLogger('foodgram.querylog')
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?\b')
+IN_LIST_RE = re.compile(r'\bIN \((?:\?|%s)(?:, (?:\?|%s))*\)', re.IGNORECASE)
+VALUES_RE = re.compile(r'(\((?:\?|%s)(?:, (?:\?|%s))*\))(?:, \1)+')
+SPACE_RE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """
+    SQL без литералов и с одним элементом вместо списков:
+    запросы, отличающиеся только параметрами, дают один отпечаток.
+    """
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    sql = SPACE_RE.sub(' ', sql).strip()
+    sql = IN_LIST_RE.sub('IN (...)', sql)
+    return VALUES_RE.sub(r'\1, ...', sql)
+
+
+class QueryStats:
+    """
+    Статистика запросов по (вью, отпечаток) в памяти процесса.
+    Размер ограничен max_entries: при переполнении выбрасываются
+    записи с наименьшим суммарным временем.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.started = time.time()
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def record(self, view, sql, duration_ms):
+        key = (view, fingerprint(sql))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if len(self._entries) >= self.max_entries:
+                    self._evict()
+                self._entries[key] = [1, duration_ms, duration_ms]
+                return
+            entry[0] += 1
+            entry[1] += duration_ms
+            entry[2] = max(entry[2], duration_ms)
+
+    def _evict(self):
+        by_total = sorted(self._entries, key=lambda key: self._entries[key][1])
+        for key in by_total[:max(1, self.max_entries // 10)]:
+            del self._entries[key]
+
+    def top(self, limit=None, sort='total'):
+        index = {'count': 0, 'total': 1, 'max': 2}[sort]
+        with self._lock:
+            items = sorted(
+                self._entries.items(),
+                key=lambda item: item[1][index], reverse=True
+            )[:limit]
+        return [
+            {
+                'id': hashlib.sha1(sql.encode()).hexdigest()[:12],
+                'view': view,
+                'sql': sql,
+                'count': count,
+                'total_ms': round(total, 2),
+                'max_ms': round(maximum, 2),
+                'avg_ms': round(total / count, 2),
+            }
+            for (view, sql), (count, total, maximum) in items
+        ]
+
+    def reset(self):
+        with self._lock:
+            self._entries = {}
+            self.started = time.time()
+
+
+def merge(windows, limit=None, sort='total'):
+    """
+    Сложение окон статистики из разных процессов и периодов:
+    записи с одной парой (вью, отпечаток) суммируются.
+    """
+    entries = {}
+    for queries in windows:
+        for query in queries:
+            key = (query['view'], query['sql'])
+            entry = entries.get(key)
+            if entry is None:
+                entries[key] = dict(query)
+                continue
+            entry['count'] += query['count']
+            entry['total_ms'] = round(entry['total_ms'] + query['total_ms'], 2)
+            entry['max_ms'] = max(entry['max_ms'], query['max_ms'])
+            entry['avg_ms'] = round(entry['total_ms'] / entry['count'], 2)
+    field = {'count': 'count', 'total': 'total_ms', 'max': 'max_ms'}[sort]
+    return sorted(
+        entries.values(), key=lambda entry: entry[field], reverse=True
+    )[:limit]
+
+
+config = settings.QUERY_LOG
+query_stats = QueryStats(config['MAX_ENTRIES'])
+last_window = {'started': None, 'finished': None, 'queries': []}
+_local = threading.local()
+_flush_lock = threading.Lock()
+_last_flush = time.monotonic()
+_last_dump = time.monotonic()
+
+
+def observe(execute, sql, params, many, context):
+    started = time.monotonic()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration_ms = (time.monotonic() - started) * 1000
+        view = getattr(_local, 'view', None) or '-'
+        query_stats.record(view, sql, duration_ms)
+        if duration_ms >= config['SLOW_MS']:
+            logger.warning(
+                'Медленный запрос %.1f мс во вью %s: %s',
+                duration_ms, view, fingerprint(sql)
+            )
+
+
+def flush():
+    """Запись окна статистики в лог и файл, начало нового окна."""
+    global _last_flush
+    if not _flush_lock.acquire(blocking=False):
+        return
+    try:
+        _last_flush = time.monotonic()
+        queries = query_stats.top(config['TOP'])
+        last_window.update(
+            started=query_stats.started, finished=time.time(),
+            queries=queries
+        )
+        query_stats.reset()
+        if config['DIR']:
+            dump()
+        if not queries:
+            return
+        record = json.dumps(
+            dict(last_window, pid=os.getpid()), ensure_ascii=False
+        )
+        logger.info(record)
+        if config['FILE']:
+            with open(config['FILE'], 'a', encoding='utf-8') as log_file:
+                log_file.write(record + '\n')
+    finally:
+        _flush_lock.release()
+
+
+def get_current_window():
+    return {'started': query_stats.started, 'queries': query_stats.top()}
+
+
+def dump():
+    """Запись текущего и предыдущего окна процесса в DIR."""
+    global _last_dump
+    _last_dump = time.monotonic()
+    path = os.path.join(config['DIR'], f'{os.getpid()}.json')
+    with open(path + '.tmp', 'w', encoding='utf-8') as dump_file:
+        json.dump({
+            'current': get_current_window(), 'last': last_window,
+        }, dump_file, ensure_ascii=False)
+    os.replace(path + '.tmp', path)
+
+
+def collect():
+    """
+    Текущие и предыдущие окна живых процессов из DIR
+    или только этого процесса: (текущие, предыдущие).
+    """
+    if not config['DIR']:
+        return [get_current_window()], [last_window]
+    dump()
+    current, last = [], []
+    for path in glob.glob(os.path.join(config['DIR'], '*.json')):
+        if not is_alive(int(os.path.basename(path).split('.')[0])):
+            continue
+        try:
+            with open(path, encoding='utf-8') as dump_file:
+                data = json.load(dump_file)
+        except (OSError, ValueError):
+            continue
+        current.append(data['current'])
+        last.append(data['last'])
+    return current, last
+
+
+def read_flushed(since):
+    """Окна всех процессов из FILE, закрытые не раньше since."""
+    try:
+        with open(config['FILE'], encoding='utf-8') as log_file:
+            for line in log_file:
+                try:
+                    window = json.loads(line)
+                except ValueError:
+                    continue
+                if window['finished'] >= since:
+                    yield window
+    except FileNotFoundError:
+        return
+
+
+if config['DIR']:
+    os.makedirs(config['DIR'], exist_ok=True)
+
+
+@contextmanager
+def observing(view):
+    """observe на всех соединениях, запросы записываются на view."""
+    _local.view = view
+    try:
+        with execute_wrappers(observe):
+            yield
+    finally:
+        _local.view = None
+
+
+class QueryLogMiddleware:
+    """Подключение observe ко всем соединениям на время запроса."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not config['ENABLED']:
+            return self.get_response(request)
+
+        _local.view = None
+        with execute_wrappers(observe):
+            response = self.get_response(request)
+        view = _local.view
+        _local.view = None
+        if time.monotonic() - _last_flush >= config['FLUSH_INTERVAL']:
+            flush()
+        elif (config['DIR']
+              and time.monotonic() - _last_dump >= config['DUMP_INTERVAL']):
+            dump()
+        # Запросы потокового ответа записываются на ту же вью.
+        return finish_after_stream(
+            response, lambda: None, partial(observing, view)
+        )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        _local.view = match.view_name if match else view_func.__name__
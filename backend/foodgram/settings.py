@@ -2,7 +2,7 @@ import os
 
 from dotenv import load_dotenv
 
-from foodgram.constants import PAGE_SIZE
+from foodgram.constants import PAGE_SIZE, TOKEN_CACHE_MAX_SIZE, TOKEN_CACHE_TTL
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -10,8 +10,8 @@ env_file_path = '../../infra/.env'
 load_dotenv(dotenv_path=env_file_path)
 
 SECRET_KEY = os.getenv('SECRET_KEY', default='XXXXXXXXXXXXXXXXXX')
-DEBUG = eval(os.getenv('DEBUG', default='True'))
-DEVELOP = eval(os.getenv('DEVELOP', default='True'))
+DEBUG = os.getenv('DEBUG', default='True') == 'True'
+DEVELOP = os.getenv('DEVELOP', default='True') == 'True'
 
 # ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', default=['*']).split(' ')
 ALLOWED_HOSTS = ['*']
@@ -28,16 +28,21 @@ INSTALLED_APPS = [
     'rest_framework.authtoken',
     'djoser',
     'django_filters',
-    'recipe',
-    'api',
+    'recipe.apps.RecipeConfig',
+    'api.apps.ApiConfig',
+    'jobs.apps.JobsConfig',
 ]
 
 MIDDLEWARE = [
+    'foodgram.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'foodgram.middleware.CompressionMiddleware',
+    'foodgram.querylog.QueryLogMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'foodgram.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -115,19 +120,80 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 AUTH_USER_MODEL = 'recipe.User'
 
+# default - кэш процесса. shared - общий для всех воркеров и сервисов,
+# для того, что должно сразу быть видно во всех процессах (отзыв токенов,
+# вёдра троттлинга). В docker-compose это memcached (SHARED_CACHE_BACKEND
+# и SHARED_CACHE_LOCATION), без них - таблица в базе для разработки
+# (manage.py createcachetable).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    },
+    'shared': {
+        'BACKEND': os.getenv('SHARED_CACHE_BACKEND', default='django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': os.getenv('SHARED_CACHE_LOCATION', default='foodgram_cache'),
+    },
+}
+if CACHES['shared']['BACKEND'].endswith('DatabaseCache'):
+    # По умолчанию таблица чистится уже после 300 записей.
+    CACHES['shared']['OPTIONS'] = {'MAX_ENTRIES': 100000}
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication'
+        'api.authentication.CachedTokenAuthentication'
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.CostThrottle',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': PAGE_SIZE,
     'SEARCH_PARAM': 'name',
+    # Перед приложением один nginx: в X-Forwarded-For доверяем только
+    # последнему адресу, который добавил он.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', default=1)),
+}
+
+# Сжатие ответов: уровень gzip 1-9, качество brotli 0-11.
+# Замеры для выбора уровней: python manage.py bench_compression
+COMPRESSION = {
+    'MIN_SIZE': 1024,
+    'LEVELS': {'gzip': 6, 'br': 5},
+    'CACHE_ALIAS': 'default',
+    'CACHE_TIMEOUT': 600,
+    'CACHE_MAX_SIZE': 1024 * 1024,
+}
+
+# Стоимость эндпоинтов в токенах. Ключ - '<basename>.<action>' вьюсета.
+# Для остальных эндпоинтов стоимость измеряется: MS_PER_TOKEN мс = 1 токен.
+THROTTLE = {
+    'BUCKETS': {
+        'user': {'CAPACITY': 300, 'RATE': 5},
+        'ip': {'CAPACITY': 600, 'RATE': 10},
+    },
+    'COSTS': {
+        'tag.list': 1,
+        'ingredient.list': 2,
+        'recipe.create': 20,
+        'recipe.update': 20,
+        'recipe.partial_update': 20,
+        'recipe.download_shopping_cart': 30,
+        'users.subscriptions': 5,
+    },
+    'DEFAULT_COST': 1,
+    'MS_PER_TOKEN': 50,
+}
+
+TOKEN_CACHE = {
+    'MAX_SIZE': int(os.getenv('TOKEN_CACHE_MAX_SIZE', default=TOKEN_CACHE_MAX_SIZE)),
+    'TTL': int(os.getenv('TOKEN_CACHE_TTL', default=TOKEN_CACHE_TTL)),
+    'SHARED': os.getenv('TOKEN_CACHE_SHARED', default='False') == 'True',
 }
 
 DJOSER = {
@@ -143,8 +209,101 @@ DJOSER = {
         'user': ['rest_framework.permissions.IsAuthenticatedOrReadOnly']}
 }
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+EMAIL_BACKEND = 'jobs.mail.QueuedEmailBackend'
 ADMIN_EMAIL = 'adminfood@ya.ru'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# Статистика SQL-запросов по отпечаткам (foodgram.querylog).
+# При нескольких воркерах gunicorn нужна общая папка QUERY_LOG_DIR,
+# для окон за больший период (?minutes=) - общий файл QUERY_LOG_FILE.
+QUERY_LOG = {
+    'ENABLED': os.getenv('QUERY_LOG_ENABLED', default='True') == 'True',
+    'MAX_ENTRIES': 2000,
+    'FLUSH_INTERVAL': 60,
+    'SLOW_MS': 200,
+    'TOP': 20,
+    'FILE': os.getenv('QUERY_LOG_FILE'),
+    'DIR': os.getenv('QUERY_LOG_DIR'),
+    'DUMP_INTERVAL': 5,
+}
+
+# Метрики Prometheus (foodgram.metrics). При нескольких воркерах gunicorn
+# нужна общая папка METRICS_DIR, из неё /metrics собирает все процессы.
+METRICS = {
+    'DIR': os.getenv('METRICS_DIR'),
+    'DUMP_INTERVAL': 5,
+}
+
+# Поток событий юзера: /api/events/ (api.events).
+EVENTS = {
+    'POLL_INTERVAL': 2,
+    'SETTLE_SECONDS': 5,
+    'HEARTBEAT': 15,
+    'MAX_AGE': 3600,
+    'RETRY_MS': 3000,
+    'QUEUE_SIZE': 100,
+    'TICKET_MAX_AGE': 60,
+    'RETENTION_DAYS': 7,
+}
+
+# Пачки запросов к API: POST /api/batch/ (api.batch).
+BATCH = {
+    'PREFIX': '/api/',
+    'MAX_REQUESTS': 20,
+    'MAX_WORKERS': 4,
+}
+
+# Справочник ингредиентов и тэгов, общий для воркеров (recipe.catalog).
+CATALOG = {
+    'PATH': os.getenv(
+        'CATALOG_PATH', default=os.path.join(BASE_DIR, 'catalog', 'catalog.bin')
+    ),
+}
+
+# Профилирование запросов staff по X-Profile: 1 (foodgram.profiling).
+PROFILING = {
+    'ENABLED': os.getenv('PROFILING_ENABLED', default='True') == 'True',
+    'RATE': 60,
+    'REPORT_TTL': 3600,
+    'TOP': 30,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'foodgram': {'handlers': ['console'], 'level': 'INFO'},
+        'jobs': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
+# Выгрузки списка покупок (api.exports). За nginx (X_ACCEL_REDIRECT=True,
+# включено в infra/docker-compose.yml) файлы отдаёт nginx из internal
+# location по X-Accel-Redirect, без nginx - сам Django.
+SHOPPING_LIST_EXPORT = {
+    'ROOT': os.path.join(BASE_DIR, 'exports'),
+    'TOKEN_MAX_AGE': 3600,
+    'X_ACCEL_REDIRECT': os.getenv('X_ACCEL_REDIRECT', default='False') == 'True',
+    'X_ACCEL_PREFIX': '/protected/exports/',
+    'PDF_FONT': os.getenv(
+        'PDF_FONT', default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+    ),
+}
+
+# Фоновые задачи (приложение jobs), воркеры: manage.py run_workers.
+JOBS = {
+    'CONCURRENCY': int(os.getenv('JOBS_CONCURRENCY', default=2)),
+    'POLL_INTERVAL': 1,
+    'TIMEOUT': 300,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_DELAY': 5,
+    'RETRY_DELAY_MAX': 600,
+    # Завершённые задачи удаляет manage.py compact_changelog.
+    'RETENTION_DAYS': 7,
+    'EMAIL_BACKEND': 'django.core.mail.backends.filebased.EmailBackend',
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
@@ -0,0 +1,44 @@
+"""
+Настройки gunicorn.
+Приложение загружается в мастере до fork (preload_app): воркеры
+стартуют сразу с импортированными модулями и делят их память
+copy-on-write. Время старта по модулям: manage.py importtime.
+Сервис потоков событий (/api/events/) запускается с
+GUNICORN_WORKER_CLASS=gevent: соединение - гринлет, а не поток ОС.
+gevent подменяет модули стандартной библиотеки при старте воркера,
+поэтому с ним приложение в мастере не загружается.
+"""
+import gc
+import os
+
+bind = os.getenv('GUNICORN_BIND', default='0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', default=1))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', default='sync')
+worker_connections = int(
+    os.getenv('GUNICORN_WORKER_CONNECTIONS', default=5000)
+)
+preload_app = worker_class == 'sync'
+
+
+def when_ready(server):
+    """Прогрев мастера перед запуском воркеров."""
+    if not preload_app:
+        return
+    from django.db import connections
+    from django.urls import get_resolver
+
+    # Вью, сериализаторы и фильтры импортируются при загрузке urlconf.
+    get_resolver().url_patterns
+    # Соединения с базой не должны достаться воркерам от мастера.
+    connections.close_all()
+    # Объекты мастера не трогает сборщик мусора воркеров,
+    # поэтому их страницы памяти не копируются.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if worker_class == 'gevent':
+        # Запросы psycopg2 переключают гринлеты, а не блокируют воркер.
+        from psycogreen.gevent import patch_psycopg
+
+        patch_psycopg()
@@ -0,0 +1,23 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Настройка отображения фоновой задачи в админке."""
+    list_display = (
+        'pk',
+        'name',
+        'status',
+        'priority',
+        'attempts',
+        'user',
+        'created',
+        'finished',
+    )
+    list_filter = ('status', 'name')
+    search_fields = ('idempotency_key',)
+    autocomplete_fields = ('user',)
+    list_select_related = ('user',)
+    readonly_fields = ('created', 'finished', 'locked_until')
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class JobsConfig(AppConfig):
+    name = 'jobs'
+
+    def ready(self):
+        # Задачи регистрируются декоратором jobs.registry.task
+        # в модулях tasks.py приложений.
+        autodiscover_modules('tasks')
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+from .registry import enqueue
+
+
+def message_to_payload(message):
+    return {
+        'subject': message.subject,
+        'body': message.body,
+        'from_email': message.from_email,
+        'to': message.to,
+        'cc': message.cc,
+        'bcc': message.bcc,
+        'reply_to': message.reply_to,
+        'headers': message.extra_headers,
+        'alternatives': getattr(message, 'alternatives', []),
+    }
+
+
+def send_payload(payload):
+    message = EmailMultiAlternatives(
+        connection=get_connection(settings.JOBS['EMAIL_BACKEND']),
+        **payload
+    )
+    return message.send()
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """
+    Отправка писем фоновой задачей send_email.
+    Сама отправка - через JOBS['EMAIL_BACKEND']. Письма с вложениями
+    отправляются сразу, вложения в очередь не сохраняются.
+    """
+
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            if message.attachments:
+                message.connection = get_connection(
+                    settings.JOBS['EMAIL_BACKEND']
+                )
+                message.send(fail_silently=self.fail_silently)
+            else:
+                enqueue('send_email', message_to_payload(message))
+        return len(email_messages)
@@ -0,0 +1,63 @@
+import multiprocessing
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.worker import work
+
+
+class Command(BaseCommand):
+    help = (
+        'Воркеры фоновых задач (jobs.Job). Потоки по умолчанию, '
+        '--processes для задач, нагружающих процессор.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int,
+            default=settings.JOBS['CONCURRENCY'],
+            help='Количество воркеров.'
+        )
+        parser.add_argument(
+            '--processes', action='store_true',
+            help='Воркеры в отдельных процессах, а не потоках.'
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Выйти, когда очередь опустеет.'
+        )
+
+    def handle(self, *args, **options):
+        if options['processes']:
+            context = multiprocessing.get_context('fork')
+            stop = context.Event()
+            # Соединение с БД не должно наследоваться дочерними процессами.
+            connections.close_all()
+            workers = [
+                context.Process(target=work, args=(stop, options['burst']))
+                for _ in range(options['concurrency'])
+            ]
+        else:
+            stop = threading.Event()
+            workers = [
+                threading.Thread(target=work, args=(stop, options['burst']))
+                for _ in range(options['concurrency'])
+            ]
+
+        def shutdown(signum, frame):
+            stop.set()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+
+        self.stdout.write(
+            f'Воркеров: {options["concurrency"]} '
+            f'({"процессы" if options["processes"] else "потоки"})'
+        )
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
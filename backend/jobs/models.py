@@ -0,0 +1,71 @@
+import json
+
+from django.conf import settings
+from django.db import models
+
+
+class Job(models.Model):
+    """
+    Фоновая задача.
+    Воркеры (manage.py run_workers) берут задачи в порядке priority
+    (больше - раньше), затем run_after. Упавшая задача повторяется
+    с растущей задержкой, пока не кончатся попытки.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    ]
+    name = models.CharField('Задача', max_length=100)
+    payload = models.TextField('Параметры (JSON)', default='{}')
+    result = models.TextField('Результат (JSON)', blank=True, default='')
+    error = models.TextField('Ошибка', blank=True, default='')
+    status = models.CharField(
+        'Статус', max_length=10, choices=STATUS_CHOICES, default=QUEUED
+    )
+    priority = models.SmallIntegerField('Приоритет', default=0)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Максимум попыток')
+    idempotency_key = models.CharField(
+        'Ключ идемпотентности', max_length=200, unique=True,
+        null=True, blank=True
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='jobs',
+        verbose_name='Пользователь',
+    )
+    run_after = models.DateTimeField('Запустить после')
+    locked_until = models.DateTimeField(
+        'Занята воркером до', null=True, blank=True
+    )
+    created = models.DateTimeField('Создана', auto_now_add=True)
+    finished = models.DateTimeField('Завершена', null=True, blank=True)
+
+    class Meta:
+        ordering = ('-created',)
+        verbose_name = 'фоновая задача'
+        verbose_name_plural = 'фоновые задачи'
+        indexes = [
+            models.Index(
+                fields=['status', '-priority', 'run_after'],
+                name='job_queue_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
+
+    def get_payload(self):
+        return json.loads(self.payload)
+
+    def get_result(self):
+        return json.loads(self.result) if self.result else None
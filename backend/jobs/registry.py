@@ -0,0 +1,66 @@
+"""
+Регистрация и постановка фоновых задач.
+
+    @task('send_email', max_attempts=3)
+    def send_email(payload, job):
+        ...
+
+    enqueue('send_email', {'to': [...]}, key='welcome:42')
+
+Задача получает payload (dict из JSON) и сам Job, возвращает
+результат, который сохраняется в Job.result и виден в /api/jobs/<id>/.
+"""
+import json
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Job
+
+Task = namedtuple('Task', ('func', 'max_attempts', 'priority'))
+
+TASKS = {}
+
+
+def task(name, max_attempts=None, priority=0):
+    def decorator(func):
+        TASKS[name] = Task(
+            func, max_attempts or settings.JOBS['MAX_ATTEMPTS'], priority
+        )
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, user=None, priority=None, key=None,
+            delay=0):
+    """
+    Постановка задачи в очередь.
+    Если задача с таким key уже есть, новая не создаётся,
+    возвращается существующая. Ключ задачи, завершившейся ошибкой,
+    освобождается, и задача ставится заново.
+    """
+    registered = TASKS[name]
+    job = Job(
+        name=name,
+        payload=json.dumps(payload or {}, ensure_ascii=False),
+        user=user,
+        priority=registered.priority if priority is None else priority,
+        max_attempts=registered.max_attempts,
+        idempotency_key=key,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+    if key is None:
+        job.save()
+        return job
+    Job.objects.filter(idempotency_key=key, status=Job.FAILED).update(
+        idempotency_key=None
+    )
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        return Job.objects.get(idempotency_key=key)
+    return job
@@ -0,0 +1,7 @@
+from .mail import send_payload
+from .registry import task
+
+
+@task('send_email')
+def send_email(payload, job):
+    return {'sent': send_payload(payload)}
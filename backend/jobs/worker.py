@@ -0,0 +1,110 @@
+"""
+Выполнение задач из таблицы Job.
+Задача захватывается условным UPDATE (статус не изменился с момента
+выборки), поэтому несколько воркеров не берут одну задачу, и брокер
+не нужен. Задача воркера, который упал, снова становится доступна
+после locked_until.
+"""
+import json
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+from .registry import TASKS
+
+logger = logging.getLogger(__name__)
+
+# Сколько задач из начала очереди пробовать захватить за раз.
+CLAIM_CANDIDATES = 10
+
+
+def get_retry_delay(attempts):
+    config = settings.JOBS
+    return min(
+        config['RETRY_DELAY'] * 2 ** (attempts - 1), config['RETRY_DELAY_MAX']
+    )
+
+
+def claim_job():
+    now = timezone.now()
+    candidates = Job.objects.filter(
+        Q(status=Job.QUEUED, run_after__lte=now)
+        | Q(status=Job.RUNNING, locked_until__lt=now)
+    ).order_by('-priority', 'run_after', 'pk').values_list(
+        'pk', 'status', 'locked_until'
+    )[:CLAIM_CANDIDATES]
+    for pk, status, locked_until in candidates:
+        claimed = Job.objects.filter(
+            pk=pk, status=status, locked_until=locked_until
+        ).update(
+            status=Job.RUNNING,
+            attempts=F('attempts') + 1,
+            locked_until=now + timedelta(seconds=settings.JOBS['TIMEOUT']),
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run_job(job):
+    registered = TASKS.get(job.name)
+    now = timezone.now()
+    if registered is None or job.attempts > job.max_attempts:
+        error = (
+            f'Неизвестная задача {job.name}' if registered is None
+            else 'Воркер не завершил задачу за отведённые попытки'
+        )
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.FAILED, error=error, locked_until=None, finished=now
+        )
+        return
+
+    try:
+        result = registered.func(job.get_payload(), job)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning('Задача %s упала:\n%s', job, error)
+        if job.attempts < job.max_attempts:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.QUEUED, error=error, locked_until=None,
+                run_after=timezone.now() + timedelta(
+                    seconds=get_retry_delay(job.attempts)
+                )
+            )
+        else:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.FAILED, error=error, locked_until=None,
+                finished=timezone.now()
+            )
+        return
+
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.DONE, error='', locked_until=None,
+        result=json.dumps(result, ensure_ascii=False, default=str),
+        finished=timezone.now()
+    )
+
+
+def work(stop, burst=False):
+    """
+    Цикл воркера до stop.set().
+    burst - выйти, когда в очереди не останется готовых задач.
+    """
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            job = claim_job()
+            if job is None:
+                if burst:
+                    return
+                stop.wait(settings.JOBS['POLL_INTERVAL'])
+                continue
+            run_job(job)
+    finally:
+        connection.close()
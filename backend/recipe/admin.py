@@ -1,8 +1,13 @@
 from django import forms
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
 
 from foodgram.constants import (
-    MIN_VALUE_AMOUNT, MIN_VALUE_COOKING_TIME, MIN_VALUE_TEXT
+    ADMIN_COUNT_LIMIT, MIN_VALUE_AMOUNT, MIN_VALUE_COOKING_TIME, MIN_VALUE_TEXT
 )
 from .models import (
     Favorite, Follow, Ingredient, IngredientInRecipe, Recipe, Tag, User,
@@ -10,10 +15,56 @@ from .models import (
 )
 
 
+class LargeTablePaginator(Paginator):
+    """
+    Паджинатор без полного COUNT(*) по большой таблице.
+    Без фильтров в PostgreSQL берётся оценка из pg_class,
+    иначе считается не больше ADMIN_COUNT_LIMIT строк.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE relname = %s',
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            if row and row[0] > ADMIN_COUNT_LIMIT:
+                return int(row[0])
+        return queryset.order_by()[:ADMIN_COUNT_LIMIT].count()
+
+
+class IndexedSearchMixin:
+    """
+    Поиск только по условиям, которые используют индексы:
+    начало строки или точное совпадение с учётом регистра.
+    search_fields задаются сразу с lookup: ('name__startswith', 'email').
+    Для startswith ищется и вариант с заглавной буквы,
+    так как названия хранятся с заглавной (см. load_data).
+    """
+    paginator = LargeTablePaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        query = Q()
+        for lookup in self.get_search_fields(request):
+            query |= Q(**{lookup: search_term})
+            if lookup.endswith('__startswith'):
+                query |= Q(**{lookup: search_term.capitalize()})
+        return queryset.filter(query), False
+
+
 class IngredientReadUpdateInRecipe(admin.TabularInline):
     """Отображение ингредиентов при создании/редактировании рецепта."""
     model = IngredientInRecipe
     fields = ['ingredient', 'amount']
+    autocomplete_fields = ('ingredient',)
     extra = 1
     min_num = 1
 
@@ -183,7 +234,7 @@ class ShoppingCartAdminForm(forms.ModelForm):
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(IndexedSearchMixin, admin.ModelAdmin):
     """Настройка отображения пользователя в админке."""
     list_display = (
         'pk',
@@ -192,7 +243,8 @@ class UserAdmin(admin.ModelAdmin):
         'first_name',
         'last_name',
     )
-    list_filter = ('username', 'email')
+    list_filter = ('role', 'is_active')
+    search_fields = ('username__startswith', 'email')
     form = UserAdminForm
 
 
@@ -206,73 +258,108 @@ class TagsAdmin(admin.ModelAdmin):
         'slug',
     )
     list_filter = ('name',)
+    search_fields = ('name', 'slug')
     form = TagsAdminForm
 
 
 @admin.register(Ingredient)
-class IngredientsAdmin(admin.ModelAdmin):
+class IngredientsAdmin(IndexedSearchMixin, admin.ModelAdmin):
     """Настройка отображения ингредиента в админке."""
     list_display = (
         'pk',
         'name',
         'measurement_unit',
     )
-    list_filter = ('name',)
+    list_filter = ('measurement_unit',)
+    search_fields = ('name__startswith',)
+    ordering = ('name',)
     form = IngredientAdminForm
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(IndexedSearchMixin, admin.ModelAdmin):
     """Настройка отображения рецепта в админке."""
     list_display = (
-        'author',
         'name',
-        'text',
+        'author',
         'cooking_time',
         'pub_date',
         'favorite_count',
     )
+    list_select_related = ('author',)
     inlines = [IngredientReadUpdateInRecipe]
-    list_filter = ('author', 'name', 'tags')
+    list_filter = ('tags',)
+    search_fields = ('name__startswith', 'author__email')
+    autocomplete_fields = ('author', 'tags')
     form = RecipeAdminForm
 
+    def get_queryset(self, request):
+        """Количество добавлений в избранное подзапросом для каждой строки."""
+        favorite_count = Favorite.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            count=Count('pk')
+        ).values('count')
+        return super().get_queryset(request).annotate(
+            favorite_total=Coalesce(
+                Subquery(favorite_count, output_field=IntegerField()), 0
+            )
+        )
+
+    def favorite_count(self, obj):
+        return obj.favorite_total
+    favorite_count.short_description = 'В избранном'
+    favorite_count.admin_order_field = 'favorite_total'
+
 
 @admin.register(IngredientInRecipe)
-class IngredientInRecipeAdmin(admin.ModelAdmin):
+class IngredientInRecipeAdmin(IndexedSearchMixin, admin.ModelAdmin):
     """Настройка отображения ингредиента в рецепте в админке."""
     list_display = (
         'recipe',
         'ingredient',
         'amount',
     )
+    list_select_related = ('recipe', 'ingredient')
+    search_fields = ('recipe__name__startswith',)
+    autocomplete_fields = ('recipe', 'ingredient')
     form = IngredientInRecipeAdminForm
 
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(IndexedSearchMixin, admin.ModelAdmin):
     """Настройка отображения подписки в админке."""
     list_display = (
         'user',
         'author',
     )
+    list_select_related = ('user', 'author')
+    search_fields = ('user__email', 'author__email')
+    autocomplete_fields = ('user', 'author')
     form = FollowAdminForm
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(IndexedSearchMixin, admin.ModelAdmin):
     """Настройка отображения избранного в админке."""
     list_display = (
         'user',
         'recipe',
     )
+    list_select_related = ('user', 'recipe')
+    search_fields = ('user__email', 'recipe__name__startswith')
+    autocomplete_fields = ('user', 'recipe')
     form = FavoriteAdminForm
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(IndexedSearchMixin, admin.ModelAdmin):
     """Настройка отображения списка покупок в админке."""
     list_display = (
         'user',
         'recipe',
     )
+    list_select_related = ('user', 'recipe')
+    search_fields = ('user__email', 'recipe__name__startswith')
+    autocomplete_fields = ('user', 'recipe')
     form = ShoppingCartAdminForm
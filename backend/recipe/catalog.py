@@ -0,0 +1,231 @@
+"""
+Справочник ингредиентов и тэгов в файле CATALOG['PATH'].
+Воркеры отображают файл в память (mmap) только на чтение, поэтому
+страницы справочника общие для всех процессов, а не копия в каждом.
+
+Формат (little-endian):
+    заголовок      MAGIC, число ингредиентов, число тэгов;
+    ингредиенты    записи фиксированной длины по возрастанию id;
+    индекс имён    номера записей ингредиентов по name.lower();
+    тэги           записи фиксированной длины в порядке Tag.Meta.ordering;
+    строки         utf-8, записи ссылаются на них смещением и длиной.
+
+Файл пересобирается после коммита изменений Ingredient и Tag и заменяется
+атомарно (os.replace). Читатели замечают новый файл по inode и
+отображают его заново.
+"""
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Ingredient, Tag
+
+MAGIC = b'FGCAT\x00\x00\x01'
+HEADER = struct.Struct('<8sII')
+# id, (смещение, длина) name, measurement_unit.
+INGREDIENT = struct.Struct('<IIHIH')
+POSITION = struct.Struct('<I')
+# id, (смещение, длина) name, color, slug.
+TAG = struct.Struct('<IIHIHIH')
+
+
+class Catalog:
+    """Справочник, отображённый в память."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as catalog_file:
+            stat = os.fstat(catalog_file.fileno())
+            self._map = mmap.mmap(
+                catalog_file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+        self.key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        self._view = memoryview(self._map)
+        magic, self.ingredients_count, self.tags_count = (
+            HEADER.unpack_from(self._map)
+        )
+        if magic != MAGIC:
+            raise ValueError(f'{path}: не файл справочника')
+        self._ingredients = HEADER.size
+        self._names = (
+            self._ingredients + self.ingredients_count * INGREDIENT.size
+        )
+        self._tags = self._names + self.ingredients_count * POSITION.size
+        self._strings = self._tags + self.tags_count * TAG.size
+
+    def _string(self, offset, length):
+        start = self._strings + offset
+        return str(self._view[start:start + length], 'utf-8')
+
+    def _ingredient_id(self, position):
+        return INGREDIENT.unpack_from(
+            self._map, self._ingredients + position * INGREDIENT.size
+        )[0]
+
+    def ingredient(self, position):
+        (pk, name, name_length, unit, unit_length) = INGREDIENT.unpack_from(
+            self._map, self._ingredients + position * INGREDIENT.size
+        )
+        return {
+            'id': pk,
+            'name': self._string(name, name_length),
+            'measurement_unit': self._string(unit, unit_length),
+        }
+
+    def find_ingredient(self, pk):
+        """Номер записи ингредиента по id (двоичный поиск) или None."""
+        low, high = 0, self.ingredients_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._ingredient_id(middle) < pk:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.ingredients_count and self._ingredient_id(low) == pk:
+            return low
+        return None
+
+    def get_ingredient(self, pk):
+        position = self.find_ingredient(pk)
+        return None if position is None else self.ingredient(position)
+
+    def ingredients(self):
+        for position in range(self.ingredients_count):
+            yield self.ingredient(position)
+
+    def _name_at(self, index):
+        position = POSITION.unpack_from(
+            self._map, self._names + index * POSITION.size
+        )[0]
+        _, name, name_length, _, _ = INGREDIENT.unpack_from(
+            self._map, self._ingredients + position * INGREDIENT.size
+        )
+        return position, self._string(name, name_length).lower()
+
+    def search_ingredients(self, terms):
+        """
+        Ингредиенты, название которых начинается с каждого из terms,
+        без учёта регистра, по возрастанию id - как SearchFilter('^name').
+        Генератор: список целиком не собирается.
+        """
+        if not terms:
+            yield from self.ingredients()
+            return
+        prefixes = [term.lower() for term in terms]
+        low, high = 0, self.ingredients_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._name_at(middle)[1] < prefixes[0]:
+                low = middle + 1
+            else:
+                high = middle
+        positions = []
+        for index in range(low, self.ingredients_count):
+            position, name = self._name_at(index)
+            if not name.startswith(prefixes[0]):
+                break
+            if all(name.startswith(prefix) for prefix in prefixes[1:]):
+                positions.append(position)
+        for position in sorted(positions):
+            yield self.ingredient(position)
+
+    def tags(self):
+        """Тэги в порядке Tag.Meta.ordering."""
+        tags = []
+        for position in range(self.tags_count):
+            (pk, name, name_length, color, color_length, slug,
+             slug_length) = TAG.unpack_from(
+                self._map, self._tags + position * TAG.size
+            )
+            tags.append({
+                'id': pk,
+                'name': self._string(name, name_length),
+                'color': self._string(color, color_length),
+                'slug': self._string(slug, slug_length),
+            })
+        return tags
+
+
+def get_path():
+    return settings.CATALOG['PATH']
+
+
+def build():
+    """Запись справочника из базы во временный файл и замена им текущего."""
+    strings = bytearray()
+
+    def add_string(value):
+        encoded = value.encode()
+        strings.extend(encoded)
+        return len(strings) - len(encoded), len(encoded)
+
+    ingredients = list(Ingredient.objects.order_by('pk').values_list(
+        'id', 'name', 'measurement_unit'
+    ))
+    tags = list(Tag.objects.values_list('id', 'name', 'color', 'slug'))
+    records = bytearray()
+    for pk, name, unit in ingredients:
+        records += INGREDIENT.pack(pk, *add_string(name), *add_string(unit))
+    for position in sorted(range(len(ingredients)),
+                           key=lambda position: ingredients[position][1]
+                           .lower()):
+        records += POSITION.pack(position)
+    for pk, name, color, slug in tags:
+        records += TAG.pack(
+            pk, *add_string(name), *add_string(color), *add_string(slug)
+        )
+
+    path = get_path()
+    directory, name = os.path.split(path)
+    os.makedirs(directory, exist_ok=True)
+    # Свой временный файл у каждой сборки, в том числе в потоках
+    # одного процесса; в том же каталоге, чтобы os.replace был атомарным.
+    descriptor, temporary_path = tempfile.mkstemp(
+        dir=directory, prefix=f'{name}.', suffix='.tmp'
+    )
+    try:
+        with os.fdopen(descriptor, 'wb') as catalog_file:
+            os.fchmod(catalog_file.fileno(), 0o644)
+            catalog_file.write(
+                HEADER.pack(MAGIC, len(ingredients), len(tags))
+            )
+            catalog_file.write(records)
+            catalog_file.write(strings)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+    return len(ingredients), len(tags)
+
+
+def schedule_build():
+    """Пересборка после коммита, одна на транзакцию."""
+    if any(item[1] is build for item in connection.run_on_commit):
+        return
+    transaction.on_commit(build)
+
+
+_catalog = None
+_lock = threading.Lock()
+
+
+def get_catalog():
+    """Текущий справочник; собирается, если файла ещё нет."""
+    global _catalog
+    path = get_path()
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        build()
+        stat = os.stat(path)
+    key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        if _catalog is None or _catalog.key != key:
+            # Старое отображение закроется, когда на него не останется
+            # ссылок у запросов, которые его ещё читают.
+            _catalog = Catalog(path)
+        return _catalog
@@ -0,0 +1,204 @@
+"""
+Выгрузка и загрузка рецептов в формате JSON Lines: один рецепт на строку.
+Рецепты читаются курсором пачками по chunk_size, загружаются пачками
+через bulk_create, поэтому память не растёт с размером данных.
+"""
+import json
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils.dateparse import parse_datetime
+
+from .catalog import schedule_build
+from .models import (Ingredient, IngredientInRecipe, Recipe, RecipeChange,
+                     Tag, User)
+from .read_model import schedule_refresh
+
+RECIPE_COLUMNS = (
+    'id', 'author__email', 'name', 'text', 'cooking_time', 'image', 'pub_date'
+)
+
+
+def chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def export_recipes(queryset=None, chunk_size=500):
+    """Генератор строк JSON Lines с рецептами, их тэгами и ингредиентами."""
+    if queryset is None:
+        queryset = Recipe.objects.all()
+    rows = queryset.order_by('pk').values(*RECIPE_COLUMNS).iterator(
+        chunk_size=chunk_size
+    )
+    for chunk in chunks(rows, chunk_size):
+        recipe_ids = [row['id'] for row in chunk]
+        tags = defaultdict(list)
+        for recipe_id, slug in Recipe.tags.through.objects.filter(
+                recipe_id__in=recipe_ids
+        ).values_list('recipe_id', 'tag__slug'):
+            tags[recipe_id].append(slug)
+        ingredients = defaultdict(list)
+        for recipe_id, name, unit, amount in IngredientInRecipe.objects.filter(
+                recipe_id__in=recipe_ids
+        ).order_by('pk').values_list(
+            'recipe_id', 'ingredient__name', 'ingredient__measurement_unit',
+            'amount'
+        ):
+            ingredients[recipe_id].append({
+                'name': name, 'measurement_unit': unit, 'amount': amount
+            })
+
+        for row in chunk:
+            yield json.dumps({
+                'id': row['id'],
+                'author': row['author__email'],
+                'name': row['name'],
+                'text': row['text'],
+                'cooking_time': row['cooking_time'],
+                'image': row['image'] or None,
+                'pub_date': row['pub_date'].isoformat(),
+                'tags': tags[row['id']],
+                'ingredients': ingredients[row['id']],
+            }, ensure_ascii=False) + '\n'
+
+
+class RecipeImporter:
+    """
+    Загрузка рецептов из JSON Lines пачками.
+    Авторы ищутся по email, тэги по slug, ингредиенты по
+    (name, measurement_unit); недостающие ингредиенты создаются.
+    Рецепт, который у автора уже есть (по названию), пропускается,
+    поэтому повторный запуск после сбоя безопасен.
+    """
+
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+        self.stats = defaultdict(int)
+        self.tags = dict(Tag.objects.values_list('slug', 'id'))
+        self.ingredients = {
+            (name, unit): pk for pk, name, unit in
+            Ingredient.objects.values_list('id', 'name', 'measurement_unit')
+        }
+
+    def run(self, lines, skip=0, on_batch=None):
+        """
+        lines - итерируемое строк, skip - сколько строк пропустить.
+        on_batch(номер последней загруженной строки) вызывается после
+        каждой сохранённой пачки, по нему можно продолжить загрузку.
+        """
+        numbered = (
+            (number, line) for number, line in enumerate(lines, 1)
+            if number > skip and line.strip()
+        )
+        for batch in chunks(numbered, self.batch_size):
+            self.load_batch([json.loads(line) for _, line in batch])
+            if on_batch is not None:
+                on_batch(batch[-1][0])
+        return dict(self.stats)
+
+    def get_ingredient_ids(self, records):
+        missing = {
+            (item['name'], item['measurement_unit'])
+            for record in records for item in record['ingredients']
+        } - set(self.ingredients)
+        if missing:
+            Ingredient.objects.bulk_create(
+                [Ingredient(name=name, measurement_unit=unit)
+                 for name, unit in missing],
+                ignore_conflicts=True
+            )
+            self.ingredients.update(
+                ((name, unit), pk) for pk, name, unit in
+                Ingredient.objects.filter(
+                    name__in={name for name, _ in missing}
+                ).values_list('id', 'name', 'measurement_unit')
+            )
+            self.stats['ingredients_created'] += len(missing)
+            # bulk_create не отправляет сигналы.
+            schedule_build()
+        return self.ingredients
+
+    @transaction.atomic
+    def load_batch(self, records):
+        authors = dict(User.objects.filter(
+            email__in={record['author'] for record in records}
+        ).values_list('email', 'id'))
+        existing = set(Recipe.objects.filter(
+            author_id__in=authors.values(),
+            name__in={record['name'] for record in records}
+        ).values_list('author_id', 'name'))
+
+        new_records = {}
+        for record in records:
+            author_id = authors.get(record['author'])
+            if author_id is None:
+                self.stats['skipped_no_author'] += 1
+            elif (author_id, record['name']) in existing:
+                self.stats['skipped_existing'] += 1
+            elif (author_id, record['name']) not in new_records:
+                new_records[(author_id, record['name'])] = record
+        if not new_records:
+            return
+
+        Recipe.objects.bulk_create(
+            Recipe(
+                author_id=author_id, name=name, text=record['text'],
+                cooking_time=record['cooking_time'],
+                image=record.get('image') or None
+            )
+            for (author_id, name), record in new_records.items()
+        )
+        recipe_ids = {
+            (author_id, name): pk for pk, author_id, name in
+            Recipe.objects.filter(
+                author_id__in={key[0] for key in new_records},
+                name__in={key[1] for key in new_records}
+            ).values_list('id', 'author_id', 'name')
+            if (author_id, name) in new_records
+        }
+        Recipe.objects.filter(pk__in=recipe_ids.values()).update(
+            pub_date=Case(
+                *[When(pk=recipe_ids[key],
+                       then=Value(parse_datetime(record['pub_date'])))
+                  for key, record in new_records.items()
+                  if record.get('pub_date')],
+                default='pub_date',
+                output_field=DateTimeField()
+            )
+        )
+
+        ingredients = self.get_ingredient_ids(new_records.values())
+        recipe_tags = []
+        recipe_ingredients = []
+        for key, record in new_records.items():
+            recipe_id = recipe_ids[key]
+            for slug in record['tags']:
+                if slug in self.tags:
+                    recipe_tags.append(Recipe.tags.through(
+                        recipe_id=recipe_id, tag_id=self.tags[slug]
+                    ))
+                else:
+                    self.stats['skipped_unknown_tags'] += 1
+            recipe_ingredients.extend(
+                IngredientInRecipe(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredients[
+                        (item['name'], item['measurement_unit'])
+                    ],
+                    amount=item['amount']
+                ) for item in record['ingredients']
+            )
+        Recipe.tags.through.objects.bulk_create(recipe_tags)
+        IngredientInRecipe.objects.bulk_create(recipe_ingredients)
+        # bulk_create не отправляет сигналы.
+        RecipeChange.objects.log(recipe_ids.values())
+        schedule_refresh(recipe_ids.values())
+        self.stats['recipes_created'] += len(new_records)
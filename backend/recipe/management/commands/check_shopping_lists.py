@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from recipe.models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверка ShoppingListItem со списками покупок, пересчитанными '
+        'по рецептам. С --fix списки расходящихся юзеров пересобираются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true')
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Пересобрать все списки без сверки.'
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            ShoppingListItem.objects.rebuild()
+            self.stdout.write('Списки покупок пересобраны.')
+            return
+
+        expected = ShoppingListItem.objects.expected()
+        stored = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in
+            ShoppingListItem.objects.values_list(
+                'user_id', 'ingredient_id', 'amount'
+            ).iterator()
+        }
+        broken = {
+            user_id for user_id, ingredient_id in set(expected) | set(stored)
+            if expected.get((user_id, ingredient_id))
+            != stored.get((user_id, ingredient_id))
+        }
+        if not broken:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
+            return
+
+        self.stdout.write(self.style.WARNING(
+            f'Расхождения у юзеров: {sorted(broken)}'
+        ))
+        if options['fix']:
+            ShoppingListItem.objects.rebuild(broken)
+            self.stdout.write('Списки покупок исправлены.')
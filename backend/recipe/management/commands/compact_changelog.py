@@ -0,0 +1,49 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from jobs.models import Job
+from recipe.exchange import chunks
+from recipe.models import RecipeChange, UserEvent
+
+
+class Command(BaseCommand):
+    help = (
+        'Сжатие журнала изменений рецептов: удаляются записи, после которых '
+        'есть запись по тому же рецепту. Ответы ?since= при этом не меняются. '
+        'Также удаляются события юзеров старше EVENTS[\'RETENTION_DAYS\'] '
+        'и завершённые фоновые задачи старше JOBS[\'RETENTION_DAYS\'].'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        ids = RecipeChange.objects.superseded().values_list(
+            'id', flat=True
+        ).iterator(chunk_size=options['batch_size'])
+        deleted = 0
+        for batch in chunks(ids, options['batch_size']):
+            deleted += RecipeChange.objects.filter(pk__in=batch).delete()[0]
+        self.stdout.write(
+            f'Удалено записей: {deleted}, '
+            f'осталось: {RecipeChange.objects.count()}'
+        )
+
+        expired_before = timezone.now() - timedelta(
+            days=settings.EVENTS['RETENTION_DAYS']
+        )
+        expired = UserEvent.objects.filter(
+            created__lt=expired_before
+        ).delete()[0]
+        self.stdout.write(f'Удалено событий юзеров: {expired}')
+
+        finished_before = timezone.now() - timedelta(
+            days=settings.JOBS['RETENTION_DAYS']
+        )
+        finished = Job.objects.filter(
+            status__in=(Job.DONE, Job.FAILED), finished__lt=finished_before
+        ).delete()[0]
+        self.stdout.write(f'Удалено завершённых задач: {finished}')
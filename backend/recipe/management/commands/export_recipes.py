@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from recipe.exchange import export_recipes
+
+
+class Command(BaseCommand):
+    help = 'Выгрузка рецептов в JSON Lines (файл или stdout).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Файл, по умолчанию stdout.')
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = 0
+        lines = export_recipes(chunk_size=options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                for line in lines:
+                    output.write(line)
+                    count += 1
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
+                count += 1
+        self.stderr.write(f'Выгружено рецептов: {count}')
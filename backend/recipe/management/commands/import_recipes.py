@@ -0,0 +1,40 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from recipe.exchange import RecipeImporter
+
+
+class Command(BaseCommand):
+    help = (
+        'Загрузка рецептов из JSON Lines. С --resume-file номер последней '
+        'загруженной строки сохраняется, и повторный запуск продолжает с неё.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл JSON Lines.')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--skip', type=int, default=0,
+                            help='Пропустить первые N строк.')
+        parser.add_argument('--resume-file',
+                            help='Файл с номером последней загруженной строки.')
+
+    def handle(self, *args, **options):
+        skip = options['skip']
+        resume_file = options['resume_file']
+        if resume_file and os.path.exists(resume_file):
+            with open(resume_file) as file:
+                skip = max(skip, int(file.read().strip() or 0))
+            self.stdout.write(f'Продолжаем после строки {skip}')
+
+        def save_progress(line_number):
+            if resume_file:
+                with open(resume_file, 'w') as file:
+                    file.write(str(line_number))
+            self.stdout.write(f'Загружено строк: {line_number}')
+
+        importer = RecipeImporter(batch_size=options['batch_size'])
+        with open(options['path'], encoding='utf-8') as lines:
+            stats = importer.run(lines, skip=skip, on_batch=save_progress)
+        for key, value in sorted(stats.items()):
+            self.stdout.write(f'{key}: {value}')
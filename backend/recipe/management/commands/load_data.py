@@ -2,6 +2,7 @@ import csv
 
 from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db import transaction
 
 from recipe.models import Ingredient, Tag
 
@@ -9,8 +10,12 @@ from recipe.models import Ingredient, Tag
 class Command(BaseCommand):
     help = 'Load data from static'
 
+    @transaction.atomic
     def handle(self, *args, **kwargs):
-        """Добавляем ингредиенты и теги в базы из готового CSV."""
+        """
+        Добавляем ингредиенты и теги в базы из готового CSV.
+        Справочник recipe.catalog пересобирается один раз после коммита.
+        """
         with open(
                 f'{settings.BASE_DIR}/static/data/ingredients.csv',
                 'r',
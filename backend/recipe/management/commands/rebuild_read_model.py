@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from recipe import read_model
+from recipe.exchange import chunks
+from recipe.models import Recipe, RecipeCard
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересборка карточек рецептов (recipe.read_model): отсутствующих '
+        'и устаревших, с --all - всех.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        rows = Recipe.objects.order_by('pk').values(
+            'id', 'updated_at', 'card__recipe_updated_at'
+        ).iterator(chunk_size=options['batch_size'])
+        if not options['all']:
+            rows = (
+                row for row in rows
+                if row['card__recipe_updated_at'] != row['updated_at']
+            )
+        rebuilt = 0
+        for batch in chunks(rows, options['batch_size']):
+            rebuilt += len(read_model.refresh(row['id'] for row in batch))
+        self.stdout.write(
+            f'Пересобрано карточек: {rebuilt}, '
+            f'всего: {RecipeCard.objects.count()}'
+        )
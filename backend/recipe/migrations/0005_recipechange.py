@@ -0,0 +1,45 @@
+# Generated by Django 2.2.16 on 2026-10-19 07:39
+
+from django.db import migrations, models
+
+
+def log_existing_recipes(apps, schema_editor):
+    """Существующие рецепты попадают в журнал, чтобы их получил ?since=0."""
+    Recipe = apps.get_model('recipe', 'Recipe')
+    RecipeChange = apps.get_model('recipe', 'RecipeChange')
+    RecipeChange.objects.bulk_create(
+        (RecipeChange(recipe_id=pk, action='upsert')
+         for pk in Recipe.objects.order_by('pk').values_list('pk', flat=True)
+         .iterator()),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0004_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe_id', models.PositiveIntegerField(verbose_name='Рецепт')),
+                ('user_id', models.PositiveIntegerField(blank=True, null=True, verbose_name='Пользователь')),
+                ('action', models.CharField(choices=[('upsert', 'Изменение'), ('delete', 'Удаление')], default='upsert', max_length=6, verbose_name='Действие')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'изменение рецепта',
+                'verbose_name_plural': 'журнал изменений рецептов',
+                'ordering': ('id',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recipechange',
+            index=models.Index(fields=['recipe_id', 'id'], name='recipechange_recipe_id_idx'),
+        ),
+        migrations.RunPython(log_existing_recipes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.16 on 2026-10-19 07:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0006_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.PositiveIntegerField(verbose_name='Пользователь')),
+                ('kind', models.CharField(choices=[('favorite', 'Избранное'), ('shopping_cart', 'Список покупок'), ('follow', 'Подписка')], max_length=13, verbose_name='Тип')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Рецепт или автор')),
+                ('active', models.BooleanField(verbose_name='Добавлено')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата события')),
+            ],
+            options={
+                'verbose_name': 'событие юзера',
+                'verbose_name_plural': 'события юзеров',
+                'ordering': ('id',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='userevent',
+            index=models.Index(fields=['user_id', 'id'], name='userevent_user_id_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.16 on 2026-10-19 08:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0007_userevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeCard',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='recipe.Recipe', verbose_name='Рецепт')),
+                ('data', models.TextField(verbose_name='Карточка в JSON')),
+                ('recipe_updated_at', models.DateTimeField(verbose_name='Дата изменения рецепта')),
+            ],
+            options={
+                'verbose_name': 'карточка рецепта',
+                'verbose_name_plural': 'карточки рецептов',
+            },
+        ),
+    ]
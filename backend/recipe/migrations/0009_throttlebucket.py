@@ -0,0 +1,26 @@
+# Generated by Django 2.2.16 on 2026-10-19 08:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0008_recipecard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThrottleBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True, verbose_name='Ключ')),
+                ('tokens', models.FloatField(verbose_name='Токены')),
+                ('updated', models.FloatField(verbose_name='Время пополнения')),
+            ],
+            options={
+                'verbose_name': 'ведро троттлинга',
+                'verbose_name_plural': 'вёдра троттлинга',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.16 on 2026-10-19 08:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0009_throttlebucket'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipechange',
+            index=models.Index(fields=['user_id', 'id'], name='recipechange_user_id_idx'),
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 2.2.16 on 2026-10-19 08:38
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0010_recipechange_user_id_idx'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='ThrottleBucket',
+        ),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def fill_recipe_cards(apps, schema_editor):
+    from recipe.read_model import fill
+
+    fill(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0011_delete_throttlebucket'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_recipe_cards, migrations.RunPython.noop),
+    ]
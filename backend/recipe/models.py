@@ -1,7 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import (MaxValueValidator, MinValueValidator,
                                     RegexValidator)
-from django.db import models
+from django.db import IntegrityError, models, transaction
 
 from foodgram.constants import (
     HEX_FORMAT_VALIDATE, LENGTH_EMAIL, MAX_LENGTH_CHARFIELD,
@@ -139,7 +139,9 @@ class Recipe(models.Model):
         verbose_name='Автор рецепта',
         related_name='recipe',
     )
-    name = models.CharField(max_length=MAX_VALUE_NAME, null=False, blank=False)
+    name = models.CharField(
+        max_length=MAX_VALUE_NAME, null=False, blank=False, db_index=True
+    )
     image = models.ImageField(
         upload_to='recipe/image/', null=True, blank=True, default=None)
     text = models.TextField(null=False, blank=False)
@@ -159,6 +161,9 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         'Дата добавления', auto_now_add=True, db_index=True
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения', auto_now=True, db_index=True
+    )
     ingredients = models.ManyToManyField(
         Ingredient,
         through='IngredientInRecipe',
@@ -172,6 +177,12 @@ class Recipe(models.Model):
         ordering = ('-pub_date',)
         verbose_name = 'Рецепт',
         verbose_name_plural = 'Рецепты',
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='recipe_author_pub_date_idx'
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['author', 'name'],
@@ -311,9 +322,287 @@ class ShoppingCart(models.Model):
     class Meta:
         verbose_name = 'список покупок'
         verbose_name_plural = 'списки покупок'
+        indexes = [
+            models.Index(
+                fields=['user', 'recipe'],
+                name='shoppingcart_user_recipe_idx'
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['recipe', 'user'],
                 name='unique_recipe_in_shop_cart'
             )
         ]
+
+
+class ShoppingListItemQuerySet(models.QuerySet):
+    @transaction.atomic
+    def add(self, user_ids, amounts):
+        """
+        Изменение сумм в списках покупок юзеров.
+        amounts - {id ингредиента: сколько прибавить}, может быть < 0.
+        """
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        for ingredient_id, delta in amounts.items():
+            if not delta:
+                continue
+            added = self._add_existing(user_ids, ingredient_id, delta)
+            if delta > 0:
+                self._create_missing(
+                    set(user_ids) - added, ingredient_id, delta
+                )
+        self.filter(user_id__in=user_ids, amount__lte=0).delete()
+
+    def _add_existing(self, user_ids, ingredient_id, delta):
+        """
+        Прибавление к уже существующим строкам, id их юзеров.
+        Строки блокируются: прибавляется ровно к найденным.
+        """
+        rows = dict(self.select_for_update().filter(
+            user_id__in=user_ids, ingredient_id=ingredient_id
+        ).values_list('user_id', 'pk'))
+        self.filter(pk__in=rows.values()).update(
+            amount=models.F('amount') + delta
+        )
+        return set(rows)
+
+    def _create_missing(self, user_ids, ingredient_id, amount):
+        """
+        Новые строки. Параллельная транзакция могла вставить их раньше
+        (unique_shopping_list_item): тогда к ним прибавляется amount.
+        """
+        while user_ids:
+            try:
+                with transaction.atomic():
+                    self.bulk_create(
+                        ShoppingListItem(
+                            user_id=user_id, ingredient_id=ingredient_id,
+                            amount=amount
+                        ) for user_id in user_ids
+                    )
+                return
+            except IntegrityError:
+                added = self._add_existing(user_ids, ingredient_id, amount)
+                if not added:
+                    raise
+                user_ids -= added
+
+    def add_to_carts(self, recipe_id, amounts):
+        """Изменение ингредиентов рецепта у всех, у кого он в покупках."""
+        self.add(
+            ShoppingCart.objects.filter(recipe_id=recipe_id).values_list(
+                'user_id', flat=True
+            ),
+            amounts
+        )
+
+    def expected(self, user_ids=None):
+        """Суммы, посчитанные заново по ShoppingCart и IngredientInRecipe."""
+        rows = IngredientInRecipe.objects.all()
+        if user_ids is not None:
+            rows = rows.filter(recipe__shop_users__user_id__in=user_ids)
+        return {
+            (user_id, ingredient_id): total for user_id, ingredient_id, total
+            in rows.values_list(
+                'recipe__shop_users__user_id', 'ingredient_id'
+            ).annotate(total=models.Sum('amount')).order_by()
+            if user_id is not None
+        }
+
+    @transaction.atomic
+    def rebuild(self, user_ids=None):
+        expected = self.expected(user_ids)
+        items = self.all()
+        if user_ids is not None:
+            items = items.filter(user_id__in=user_ids)
+        items.delete()
+        self.bulk_create(
+            (ShoppingListItem(
+                user_id=user_id, ingredient_id=ingredient_id, amount=amount
+            ) for (user_id, ingredient_id), amount in expected.items()),
+            batch_size=1000
+        )
+
+
+class ShoppingListItem(models.Model):
+    """
+    Сумма ингредиента в списке покупок юзера.
+    Обновляется при изменении списка покупок и ингредиентов рецептов
+    (recipe.signals, CreateUpdateRecipeSerializer.create_ingredients),
+    проверка и пересборка: manage.py check_shopping_lists.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент',
+    )
+    amount = models.IntegerField('Количество')
+
+    objects = ShoppingListItemQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'строка списка покупок'
+        verbose_name_plural = 'строки списков покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} {self.amount}'
+
+
+class RecipeChangeQuerySet(models.QuerySet):
+    def log(self, recipe_ids, action=None, user_id=None):
+        """Запись изменений рецептов одним INSERT."""
+        return self.bulk_create(
+            RecipeChange(
+                recipe_id=recipe_id, user_id=user_id,
+                action=action or RecipeChange.UPSERT
+            )
+            for recipe_id in recipe_ids
+        )
+
+    def visible_to(self, user):
+        """Общие изменения и изменения избранного/покупок юзера."""
+        if user.is_authenticated:
+            return self.filter(
+                models.Q(user_id__isnull=True) | models.Q(user_id=user.pk)
+            )
+        return self.filter(user_id__isnull=True)
+
+    def superseded(self):
+        """
+        Записи, после которых есть запись по тому же рецепту:
+        общая или для того же юзера.
+        """
+        newer = RecipeChange.objects.filter(
+            recipe_id=models.OuterRef('recipe_id'),
+            id__gt=models.OuterRef('id')
+        ).filter(
+            models.Q(user_id__isnull=True)
+            | models.Q(user_id=models.OuterRef('user_id'))
+        )
+        return self.annotate(
+            has_newer=models.Exists(newer)
+        ).filter(has_newer=True)
+
+
+class RecipeChange(models.Model):
+    """
+    Журнал изменений рецептов, только добавление записей.
+    id - номер изменения, по нему клиенты забирают изменения (?since=).
+    user_id заполнен для изменений избранного и списка покупок,
+    они видны только этому юзеру.
+    """
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ACTION_CHOICES = [
+        (UPSERT, 'Изменение'),
+        (DELETE, 'Удаление'),
+    ]
+    recipe_id = models.PositiveIntegerField('Рецепт')
+    user_id = models.PositiveIntegerField(
+        'Пользователь', null=True, blank=True
+    )
+    action = models.CharField(
+        'Действие', max_length=6, choices=ACTION_CHOICES, default=UPSERT
+    )
+    created = models.DateTimeField('Дата изменения', auto_now_add=True)
+
+    objects = RecipeChangeQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('id',)
+        verbose_name = 'изменение рецепта'
+        verbose_name_plural = 'журнал изменений рецептов'
+        indexes = [
+            models.Index(
+                fields=['recipe_id', 'id'], name='recipechange_recipe_id_idx'
+            ),
+            models.Index(
+                fields=['user_id', 'id'], name='recipechange_user_id_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.id}: {self.action} {self.recipe_id}'
+
+
+class UserEvent(models.Model):
+    """
+    События юзера для потока /api/events/: избранное, список покупок,
+    подписки. Через таблицу события доходят до процессов, в которых
+    изменения не было; id - номер события (Last-Event-ID).
+    """
+    FAVORITE = 'favorite'
+    SHOPPING_CART = 'shopping_cart'
+    FOLLOW = 'follow'
+    KIND_CHOICES = [
+        (FAVORITE, 'Избранное'),
+        (SHOPPING_CART, 'Список покупок'),
+        (FOLLOW, 'Подписка'),
+    ]
+    user_id = models.PositiveIntegerField('Пользователь')
+    kind = models.CharField('Тип', max_length=13, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField('Рецепт или автор')
+    active = models.BooleanField('Добавлено')
+    created = models.DateTimeField('Дата события', auto_now_add=True)
+
+    class Meta:
+        ordering = ('id',)
+        verbose_name = 'событие юзера'
+        verbose_name_plural = 'события юзеров'
+        indexes = [
+            models.Index(
+                fields=['user_id', 'id'], name='userevent_user_id_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.id}: {self.kind} {self.object_id} {self.active}'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'object_id': self.object_id,
+            'active': self.active,
+        }
+
+
+class RecipeCard(models.Model):
+    """
+    Рецепт в готовом для выдачи виде: поля ListRecipeSerializer без
+    is_favorited и is_in_shopping_cart (модель чтения, recipe.read_model).
+    recipe_updated_at - Recipe.updated_at, по которому собрана карточка:
+    если они не совпадают, карточка устарела.
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='card',
+        verbose_name='Рецепт',
+    )
+    data = models.TextField('Карточка в JSON')
+    recipe_updated_at = models.DateTimeField('Дата изменения рецепта')
+
+    class Meta:
+        verbose_name = 'карточка рецепта'
+        verbose_name_plural = 'карточки рецептов'
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.recipe_updated_at}'
@@ -0,0 +1,168 @@
+"""
+Модель чтения рецептов: RecipeCard с готовой частью вывода
+ListRecipeSerializer, одинаковой для всех юзеров (автор, тэги,
+ингредиенты). Список и рецепт читаются одним запросом к Recipe с
+присоединённой карточкой, без запросов к User, Tag и Ingredient.
+
+Карточки пересобираются после коммита изменений рецепта, его тэгов,
+ингредиентов и автора (recipe.signals). Карточка, собранная не по
+текущему Recipe.updated_at, или отсутствующая собирается при чтении
+без записи: чтение не блокирует строки и не пишет в базу.
+Полная проверка и пересборка: manage.py rebuild_read_model.
+"""
+import json
+from collections import defaultdict
+from itertools import islice
+
+from django.apps import apps as global_apps
+from django.db import connection, transaction
+
+from .models import Recipe, RecipeCard
+
+# Поля автора - как в CustomUserForRecipeSerializer.
+AUTHOR_FIELDS = ('id', 'email', 'first_name', 'last_name')
+# Колонки рецепта с карточкой для load().
+CARD_COLUMNS = ('id', 'updated_at', 'card__data', 'card__recipe_updated_at')
+
+
+def build(recipe_ids, apps=global_apps):
+    """
+    id рецепта -> (updated_at, карточка) по данным из базы.
+    apps - реестр моделей, в миграции - исторический.
+    """
+    recipe_model = apps.get_model('recipe', 'Recipe')
+    user_model = apps.get_model('recipe', 'User')
+    amount_model = apps.get_model('recipe', 'IngredientInRecipe')
+    recipes = list(recipe_model.objects.filter(pk__in=recipe_ids).values(
+        'id', 'author_id', 'name', 'image', 'text', 'cooking_time',
+        'updated_at'
+    ))
+    authors = {
+        author['id']: author for author in user_model.objects.filter(
+            pk__in={recipe['author_id'] for recipe in recipes}
+        ).values(*AUTHOR_FIELDS)
+    }
+    tags = defaultdict(list)
+    # Порядок тэгов - Tag.Meta.ordering.
+    for recipe_id, pk, name, color, slug in recipe_model.tags.through.objects.filter(
+            recipe_id__in=recipe_ids).order_by('tag__name').values_list(
+            'recipe_id', 'tag_id', 'tag__name', 'tag__color', 'tag__slug'):
+        tags[recipe_id].append(
+            {'id': pk, 'name': name, 'color': color, 'slug': slug}
+        )
+    ingredients = defaultdict(list)
+    for recipe_id, pk, name, unit, amount in amount_model.objects.filter(
+            recipe_id__in=recipe_ids).order_by('pk').values_list(
+            'recipe_id', 'ingredient_id', 'ingredient__name',
+            'ingredient__measurement_unit', 'amount'):
+        ingredients[recipe_id].append({
+            'id': pk, 'name': name, 'measurement_unit': unit,
+            'amount': amount,
+        })
+
+    return {
+        recipe['id']: (recipe['updated_at'], {
+            'id': recipe['id'],
+            'author': authors[recipe['author_id']],
+            'name': recipe['name'],
+            # Имя файла: url зависит от хоста запроса.
+            'image': recipe['image'],
+            'text': recipe['text'],
+            'cooking_time': recipe['cooking_time'],
+            'tags': tags[recipe['id']],
+            'ingredients': ingredients[recipe['id']],
+        }) for recipe in recipes
+    }
+
+
+@transaction.atomic
+def refresh(recipe_ids):
+    """
+    Пересборка и сохранение карточек, id рецепта -> карточка.
+    Строки рецептов блокируются: параллельные пересборки одного рецепта
+    выполняются по очереди, а транзакция, меняющая рецепт, успевает
+    закоммититься до чтения его данных.
+    """
+    recipe_ids = sorted(set(recipe_ids))
+    list(Recipe.objects.select_for_update().filter(
+        pk__in=recipe_ids
+    ).order_by('pk').values_list('pk', flat=True))
+    cards = build(recipe_ids)
+    RecipeCard.objects.filter(recipe_id__in=recipe_ids).delete()
+    RecipeCard.objects.bulk_create(
+        RecipeCard(
+            recipe_id=pk, recipe_updated_at=updated_at,
+            data=json.dumps(card, ensure_ascii=False)
+        ) for pk, (updated_at, card) in cards.items()
+    )
+    return {pk: card for pk, (_, card) in cards.items()}
+
+
+def fill(apps=global_apps, batch_size=500):
+    """
+    Карточки для рецептов, у которых их нет (миграция 0012).
+    Рецепты без карточек читаются медленнее: load() собирает их заново
+    на каждое чтение.
+    """
+    recipe_model = apps.get_model('recipe', 'Recipe')
+    card_model = apps.get_model('recipe', 'RecipeCard')
+    recipe_ids = recipe_model.objects.filter(card__isnull=True).order_by(
+        'pk'
+    ).values_list('pk', flat=True).iterator(chunk_size=batch_size)
+    created = 0
+    while True:
+        batch = list(islice(recipe_ids, batch_size))
+        if not batch:
+            return created
+        created += len(card_model.objects.bulk_create(
+            card_model(
+                recipe_id=pk, recipe_updated_at=updated_at,
+                data=json.dumps(card, ensure_ascii=False)
+            ) for pk, (updated_at, card) in build(batch, apps).items()
+        ))
+
+
+class PendingRefresh:
+    """Пересборка после коммита, одна на транзакцию."""
+
+    def __init__(self):
+        self.recipe_ids = set()
+
+    def __call__(self):
+        refresh(self.recipe_ids)
+
+
+def schedule_refresh(recipe_ids):
+    for _, func in connection.run_on_commit:
+        if isinstance(func, PendingRefresh):
+            func.recipe_ids.update(recipe_ids)
+            return
+    pending = PendingRefresh()
+    pending.recipe_ids.update(recipe_ids)
+    if pending.recipe_ids:
+        transaction.on_commit(pending)
+
+
+def is_stale(row):
+    return (
+        row['card__data'] is None
+        or row['card__recipe_updated_at'] != row['updated_at']
+    )
+
+
+def load(rows):
+    """
+    id рецепта -> карточка для строк values(*CARD_COLUMNS).
+    Устаревшие и отсутствующие карточки собираются из базы (build), но не
+    сохраняются: это делают хук после коммита и rebuild_read_model.
+    """
+    cards = {
+        row['id']: json.loads(row['card__data'])
+        for row in rows if not is_stale(row)
+    }
+    stale = [row['id'] for row in rows if is_stale(row)]
+    if stale:
+        cards.update(
+            (pk, card) for pk, (_, card) in build(stale).items()
+        )
+    return cards
@@ -0,0 +1,150 @@
+from collections import Counter
+
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .catalog import schedule_build
+from .models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                     RecipeChange, ShoppingCart, ShoppingListItem, Tag, User)
+from .read_model import schedule_refresh
+
+# Поля юзера, которые выводятся в рецепте.
+AUTHOR_FIELDS = {'email', 'first_name', 'last_name'}
+
+
+def touch_recipes(recipes):
+    """
+    Обновление updated_at рецептов без загрузки и сохранения моделей,
+    запись изменения в журнал и пересборка карточек после коммита.
+    """
+    recipe_ids = list(recipes.values_list('pk', flat=True))
+    if recipe_ids:
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            updated_at=timezone.now()
+        )
+        RecipeChange.objects.log(recipe_ids)
+        schedule_refresh(recipe_ids)
+
+
+@receiver(post_save, sender=Recipe)
+def log_recipe_save(sender, instance, **kwargs):
+    RecipeChange.objects.log([instance.pk])
+    schedule_refresh([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def log_recipe_delete(sender, instance, **kwargs):
+    RecipeChange.objects.log([instance.pk], RecipeChange.DELETE)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def log_user_flags_change(sender, instance, **kwargs):
+    """is_favorited и is_in_shopping_cart меняются только для этого юзера."""
+    RecipeChange.objects.log([instance.recipe_id], user_id=instance.user_id)
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+def touch_recipe_on_ingredients_change(sender, instance, **kwargs):
+    touch_recipes(Recipe.objects.filter(pk=instance.recipe_id))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def touch_recipe_on_tags_change(sender, instance, action, reverse, pk_set,
+                                **kwargs):
+    """
+    Изменение тэгов рецепта.
+    reverse - изменение со стороны тэга (tag.recipe.add(...)).
+    """
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        touch_recipes(Recipe.objects.filter(pk=instance.pk))
+    elif reverse and action in ('post_add', 'post_remove'):
+        touch_recipes(Recipe.objects.filter(pk__in=pk_set))
+    elif reverse and action == 'pre_clear':
+        touch_recipes(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=Tag)
+def touch_recipes_on_tag_change(sender, instance, created, **kwargs):
+    if not created:
+        touch_recipes(Recipe.objects.filter(tags=instance))
+
+
+@receiver(pre_delete, sender=Tag)
+def touch_recipes_on_tag_delete(sender, instance, **kwargs):
+    """Связи с тэгом удаляются без сигнала m2m_changed."""
+    touch_recipes(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=Ingredient)
+def touch_recipes_on_ingredient_change(sender, instance, created, **kwargs):
+    if not created:
+        touch_recipes(Recipe.objects.filter(ingredients=instance))
+
+
+@receiver(post_save, sender=User)
+def touch_recipes_on_author_change(sender, instance, created, update_fields,
+                                   **kwargs):
+    if created or update_fields and not AUTHOR_FIELDS & set(update_fields):
+        return
+    touch_recipes(Recipe.objects.filter(author=instance))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def rebuild_catalog(sender, **kwargs):
+    schedule_build()
+
+
+def get_recipe_amounts(recipe_id, sign=1):
+    return {
+        ingredient_id: sign * amount
+        for ingredient_id, amount in IngredientInRecipe.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('ingredient_id', 'amount')
+    }
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        ShoppingListItem.objects.add(
+            [instance.user_id], get_recipe_amounts(instance.recipe_id)
+        )
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def remove_from_shopping_list(sender, instance, **kwargs):
+    ShoppingListItem.objects.add(
+        [instance.user_id], get_recipe_amounts(instance.recipe_id, -1)
+    )
+
+
+@receiver(pre_save, sender=IngredientInRecipe)
+def remember_ingredient_amount(sender, instance, **kwargs):
+    instance._previous = IngredientInRecipe.objects.filter(
+        pk=instance.pk
+    ).values_list('ingredient_id', 'amount').first()
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+def update_shopping_lists_on_save(sender, instance, **kwargs):
+    amounts = Counter({instance.ingredient_id: instance.amount})
+    if instance._previous is not None:
+        ingredient_id, amount = instance._previous
+        amounts[ingredient_id] -= amount
+    ShoppingListItem.objects.add_to_carts(instance.recipe_id, amounts)
+
+
+@receiver(post_delete, sender=IngredientInRecipe)
+def update_shopping_lists_on_delete(sender, instance, **kwargs):
+    ShoppingListItem.objects.add_to_carts(
+        instance.recipe_id, {instance.ingredient_id: -instance.amount}
+    )
@@ -0,0 +1,112 @@
+import multiprocessing
+
+import pytest
+from django.db import connections
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipe.models import User
+
+
+@pytest.fixture(scope='session')
+def django_db_modify_db_settings(tmp_path_factory):
+    """Тестовая база в файле: её видят процессы, запущенные тестом."""
+    from django.conf import settings
+
+    settings.DATABASES['default']['TEST']['NAME'] = str(
+        tmp_path_factory.mktemp('db') / 'test.sqlite3'
+    )
+
+
+@pytest.fixture(autouse=True)
+def isolated_storage(monkeypatch, settings, tmp_path):
+    from api.exports import export_storage
+
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    settings.CATALOG = {'PATH': str(tmp_path / 'catalog' / 'catalog.bin')}
+    # Каталог хранилища выгрузок задан при импорте: подменяем его
+    # закешированный путь.
+    for name in ('base_location', 'location'):
+        monkeypatch.setitem(
+            export_storage.__dict__, name, str(tmp_path / 'exports')
+        )
+
+
+@pytest.fixture
+def user(django_user_model):
+    return User.objects.create_user(
+        username='cook', email='cook@example.com', password='pass12345',
+        first_name='Имя', last_name='Фамилия'
+    )
+
+
+@pytest.fixture
+def token(user):
+    return Token.objects.create(user=user)
+
+
+@pytest.fixture
+def user_client(token):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+# Сколько ждать другой процесс, секунд.
+PROCESS_TIMEOUT = 10
+
+
+class ProcessChannel:
+    """
+    Связь теста с другим процессом. В процессе: put() - результат,
+    wait() - ждать proceed(). В тесте: get() - следующий результат,
+    proceed() - разрешить процессу продолжить.
+    """
+
+    def __init__(self, context):
+        self._proceed = context.Event()
+        self._results = context.Queue()
+
+    def put(self, value):
+        self._results.put(value)
+
+    def wait(self):
+        self._proceed.wait(PROCESS_TIMEOUT)
+
+    def get(self):
+        return self._results.get(timeout=PROCESS_TIMEOUT)
+
+    def proceed(self):
+        self._proceed.set()
+
+
+def run_in_process(target, channel, args):
+    # Соединения основного процесса не используются после fork.
+    connections.close_all()
+    target(channel, *args)
+
+
+@pytest.fixture
+def other_process():
+    """
+    start(target, *args) - target(channel, *args) в другом процессе
+    (fork), как в другом воркере gunicorn; возвращает channel.
+    Процесс видит ту же тестовую базу-файл: тесту нужен
+    django_db(transaction=True).
+    """
+    context = multiprocessing.get_context('fork')
+    processes = []
+
+    def start(target, *args):
+        channel = ProcessChannel(context)
+        process = context.Process(
+            target=run_in_process, args=(target, channel, args)
+        )
+        connections.close_all()
+        process.start()
+        processes.append(process)
+        return channel
+
+    yield start
+    for process in processes:
+        process.join(PROCESS_TIMEOUT)
@@ -0,0 +1,61 @@
+import pytest
+from rest_framework.exceptions import AuthenticationFailed
+
+from api.authentication import CachedTokenAuthentication, TokenCache
+from api.checks import check_shared_cache
+
+
+def authenticate_twice(channel, key):
+    """
+    Другой процесс: токен попадает в его кэш, после выхода в основном
+    процессе тот же токен проверяется ещё раз.
+    """
+    authentication = CachedTokenAuthentication()
+    authentication.cache = TokenCache(max_size=10, ttl=300)
+    user, _ = authentication.authenticate_credentials(key)
+    channel.put(user.pk)
+    channel.wait()
+    try:
+        authentication.authenticate_credentials(key)
+    except AuthenticationFailed:
+        channel.put('rejected')
+    else:
+        channel.put('accepted')
+
+
+@pytest.mark.django_db(transaction=True)
+def test_logout_revokes_token_in_other_process(other_process, user, token,
+                                               user_client):
+    channel = other_process(authenticate_twice, token.key)
+    assert channel.get() == user.pk
+    response = user_client.post('/api/auth/token/logout/')
+    assert response.status_code == 204
+    channel.proceed()
+    assert channel.get() == 'rejected'
+
+
+@pytest.mark.django_db
+def test_cached_token_rejected_after_password_change(user, token):
+    authentication = CachedTokenAuthentication()
+    authentication.cache = TokenCache(max_size=10, ttl=300)
+    authentication.authenticate_credentials(token.key)
+    assert authentication.cache.get(token.key) is not None
+
+    user.set_password('new-pass12345')
+    user.save()
+
+    assert authentication.cache.get(token.key) is None
+
+
+@pytest.mark.parametrize('backend, workers, errors', (
+    ('django.core.cache.backends.locmem.LocMemCache', '3', ['api.E001']),
+    ('django.core.cache.backends.db.DatabaseCache', '3', ['api.E002']),
+    ('django.core.cache.backends.db.DatabaseCache', '1', []),
+    ('django.core.cache.backends.memcached.MemcachedCache', '3', []),
+))
+def test_shared_cache_check(monkeypatch, settings, backend, workers, errors):
+    monkeypatch.setenv('GUNICORN_WORKERS', workers)
+    settings.CACHES = dict(
+        settings.CACHES, shared={'BACKEND': backend, 'LOCATION': ''}
+    )
+    assert [error.id for error in check_shared_cache(None)] == errors
@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+from rest_framework.test import APIClient
+
+from api import batch
+
+BATCH_URL = '/api/batch/'
+
+
+def get_requests(*urls):
+    return {'requests': [{'method': 'GET', 'url': url} for url in urls]}
+
+
+@pytest.fixture
+def runs(monkeypatch):
+    """Выполненные подзапросы: (метод, url, поток)."""
+    calls = []
+    run = batch.run
+
+    def counted(request, method, url, body=None):
+        calls.append((method, url, threading.current_thread()))
+        return run(request, method, url, body)
+
+    monkeypatch.setattr(batch, 'run', counted)
+    return calls
+
+
+@pytest.mark.django_db
+def test_user_passed_to_subrequests(user_client, user):
+    response = user_client.post(
+        BATCH_URL, get_requests('/api/users/me/'), format='json'
+    )
+    assert response.status_code == 200
+    assert response.data[0]['status'] == 200
+    assert response.data[0]['body']['email'] == user.email
+
+    response = APIClient().post(
+        BATCH_URL, get_requests('/api/users/me/profile/'), format='json'
+    )
+    assert response.data[0]['status'] == 401
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url, status', (
+    ('/api/batch/', 400),
+    ('/admin/', 400),
+    ('/api/no-such-page/', 404),
+))
+def test_rejected_paths(user_client, url, status):
+    response = user_client.post(BATCH_URL, get_requests(url), format='json')
+    assert response.status_code == 200
+    assert response.data[0]['status'] == status
+
+
+@pytest.mark.django_db
+def test_batch_size_limited(settings, user_client):
+    urls = ['/api/tags/'] * (settings.BATCH['MAX_REQUESTS'] + 1)
+    response = user_client.post(BATCH_URL, get_requests(*urls), format='json')
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_same_get_runs_once(user_client, runs):
+    response = user_client.post(
+        BATCH_URL, get_requests('/api/tags/', '/api/users/me/', '/api/tags/'),
+        format='json'
+    )
+    assert [item['status'] for item in response.data] == [200, 200, 200]
+    assert response.data[0] == response.data[2]
+    assert [url for _, url, _ in runs] == ['/api/tags/', '/api/users/me/']
+
+
+@pytest.mark.django_db(transaction=True)
+def test_parallel_only_without_writes(user_client, runs):
+    urls = ('/api/tags/', '/api/users/me/', '/api/ingredients/')
+    sequential = user_client.post(
+        BATCH_URL, get_requests(*urls), format='json'
+    ).data
+    parallel = user_client.post(
+        BATCH_URL, {**get_requests(*urls), 'parallel': True}, format='json'
+    ).data
+    assert parallel == sequential
+    main = threading.current_thread()
+    assert all(thread is main for _, _, thread in runs[:3])
+    assert all(thread is not main for _, _, thread in runs[3:])
+
+    del runs[:]
+    requests = get_requests(*urls)['requests'] + [
+        {'method': 'DELETE', 'url': '/api/recipes/0/favorite/'}
+    ]
+    user_client.post(
+        BATCH_URL, {'requests': requests, 'parallel': True}, format='json'
+    )
+    assert all(thread is main for _, _, thread in runs)
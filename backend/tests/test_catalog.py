@@ -0,0 +1,92 @@
+import os
+import threading
+
+import pytest
+from django.db import connections
+
+from recipe import catalog
+from recipe.models import Ingredient, Tag
+
+NAMES = (
+    'мука', 'мука ржаная', 'молоко', 'масло сливочное', 'Mozzarella',
+    'mozzarella light', 'Milk', 'соль', 'сахар', 'сахарная пудра',
+)
+
+
+@pytest.fixture
+def data():
+    # Вперемешку, чтобы порядок id не совпадал с порядком имён.
+    for name in sorted(NAMES, key=lambda name: name[::-1]):
+        Ingredient.objects.create(name=name, measurement_unit='г')
+    for name, color, slug in (
+            ('Ужин', '#8775D2', 'dinner'), ('Завтрак', '#E26C2D', 'breakfast'),
+            ('Обед', '#49B64E', 'lunch')):
+        Tag.objects.create(name=name, color=color, slug=slug)
+
+
+def ingredient_rows(queryset):
+    return list(queryset.order_by('pk').values(
+        'id', 'name', 'measurement_unit'
+    ))
+
+
+@pytest.mark.django_db
+def test_round_trip(data):
+    assert catalog.build() == (len(NAMES), 3)
+    current = catalog.get_catalog()
+    assert list(current.ingredients()) == ingredient_rows(
+        Ingredient.objects.all()
+    )
+    assert current.tags() == list(
+        Tag.objects.values('id', 'name', 'color', 'slug')
+    )
+
+
+@pytest.mark.django_db
+# Регистр меняется только в латинице: LIKE в SQLite не приводит
+# к одному регистру кириллицу.
+@pytest.mark.parametrize('terms', (
+    [], ['м'], ['мука'], ['сахар'], ['moz'], ['MOZZ', 'mozzarella l'],
+    ['m'], ['мука', 'мука р'], ['я'], ['сахарная пудра и'],
+))
+def test_prefix_search_matches_orm(data, terms):
+    queryset = Ingredient.objects.all()
+    for term in terms:
+        queryset = queryset.filter(name__istartswith=term)
+    assert list(
+        catalog.get_catalog().search_ingredients(terms)
+    ) == ingredient_rows(queryset)
+
+
+@pytest.mark.django_db
+def test_lookup_by_id(data):
+    current = catalog.get_catalog()
+    for row in ingredient_rows(Ingredient.objects.all()):
+        assert current.get_ingredient(row['id']) == row
+    assert current.get_ingredient(0) is None
+    last = Ingredient.objects.latest('pk').pk
+    assert current.get_ingredient(last + 1) is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_builds_in_threads(data):
+    errors = []
+
+    def build():
+        try:
+            catalog.build()
+        except Exception as error:
+            errors.append(error)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=build) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    directory = os.path.dirname(catalog.get_path())
+    assert os.listdir(directory) == [os.path.basename(catalog.get_path())]
+    assert catalog.Catalog(catalog.get_path()).ingredients_count == len(NAMES)
@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+from recipe.exchange import RecipeImporter
+from recipe.models import (Favorite, Recipe, RecipeChange,
+                           RecipeChangeQuerySet, ShoppingCart)
+
+
+@pytest.fixture
+def recipe(user):
+    return Recipe.objects.create(
+        author=user, name='Рецепт', text='Текст', cooking_time=10
+    )
+
+
+@pytest.mark.django_db
+def test_import_logs_changes(user):
+    line = json.dumps({
+        'author': user.email, 'name': 'Блины', 'text': 'Текст',
+        'cooking_time': 20, 'tags': [], 'ingredients': [
+            {'name': 'Мука', 'measurement_unit': 'г', 'amount': 200},
+        ],
+    })
+    RecipeImporter().run([line])
+    recipe = Recipe.objects.get(name='Блины')
+    assert RecipeChange.objects.filter(
+        recipe_id=recipe.pk, action=RecipeChange.UPSERT, user_id=None
+    ).exists()
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('action', ('favorite', 'shopping_cart'))
+def test_flag_change_rolled_back_with_log(monkeypatch, user_client, recipe,
+                                          action):
+    def fail(*args, **kwargs):
+        raise RuntimeError('log failed')
+
+    monkeypatch.setattr(RecipeChangeQuerySet, 'log', fail)
+    with pytest.raises(RuntimeError):
+        user_client.post(f'/api/recipes/{recipe.pk}/{action}/')
+    assert not Favorite.objects.exists()
+    assert not ShoppingCart.objects.exists()
@@ -0,0 +1,101 @@
+import gzip
+import json
+
+import brotli
+import pytest
+from django.core.cache import caches
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory
+
+from foodgram.middleware import CompressionMiddleware
+
+BODY = json.dumps([{'id': number, 'name': 'Мука пшеничная'}
+                   for number in range(200)]).encode()
+
+
+@pytest.fixture(autouse=True)
+def clear_cache(settings):
+    caches[settings.COMPRESSION['CACHE_ALIAS']].clear()
+
+
+def respond(response, accept_encoding='gzip, deflate, br'):
+    request = RequestFactory().get(
+        '/', HTTP_ACCEPT_ENCODING=accept_encoding
+    )
+    return CompressionMiddleware(lambda request: response)(request)
+
+
+def json_response(body=BODY, **headers):
+    response = HttpResponse(body, content_type='application/json')
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+@pytest.mark.parametrize('accept_encoding, expected', (
+    ('gzip, deflate, br', 'br'),
+    ('gzip', 'gzip'),
+    ('br;q=0, gzip;q=0.5', 'gzip'),
+    ('gzip;q=0', None),
+    ('identity', None),
+    ('', None),
+))
+def test_encoding_negotiation(accept_encoding, expected):
+    response = respond(json_response(), accept_encoding)
+    assert response.get('Content-Encoding') == expected
+    assert response['Vary'] == 'Accept-Encoding'
+    decode = {'br': brotli.decompress, 'gzip': gzip.decompress}.get(
+        expected, bytes
+    )
+    assert decode(response.content) == BODY
+
+
+def test_small_and_non_text_not_compressed(settings):
+    small = b'x' * (settings.COMPRESSION['MIN_SIZE'] - 1)
+    response = respond(json_response(small))
+    assert not response.has_header('Content-Encoding')
+    assert not response.has_header('Vary')
+
+    response = respond(json_response(small + b'x'))
+    assert response['Content-Encoding'] == 'br'
+
+    image = HttpResponse(BODY, content_type='image/png')
+    assert not respond(image).has_header('Content-Encoding')
+    events = StreamingHttpResponse(
+        iter([BODY]), content_type='text/event-stream'
+    )
+    assert not respond(events).has_header('Content-Encoding')
+
+
+def test_stream_gzipped_in_chunks():
+    chunks = [BODY[:1000], BODY[1000:]]
+    response = respond(
+        StreamingHttpResponse(iter(chunks), content_type='application/json'),
+        'gzip'
+    )
+    assert response['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(b''.join(response.streaming_content)) == BODY
+
+    # Потоки сжимаются только gzip.
+    response = respond(
+        StreamingHttpResponse(iter(chunks), content_type='application/json'),
+        'br'
+    )
+    assert not response.has_header('Content-Encoding')
+    assert b''.join(response.streaming_content) == BODY
+
+
+def test_cache_keyed_by_strong_etag():
+    first = respond(json_response(ETag='"v1"'), 'gzip')
+    assert first['ETag'] == 'W/"v1"'
+    # Тот же ETag - тело из кэша, не сжимается заново.
+    other = BODY.replace(b'\\u041c', b'\\u0420')
+    assert other != BODY
+    cached = respond(json_response(other, ETag='"v1"'), 'gzip')
+    assert cached.content == first.content
+
+    fresh = respond(json_response(other, ETag='W/"v1"'), 'gzip')
+    assert gzip.decompress(fresh.content) == other
+    assert gzip.decompress(
+        respond(json_response(other), 'gzip').content
+    ) == other
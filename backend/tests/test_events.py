@@ -0,0 +1,68 @@
+import pytest
+from django.core.signals import request_finished
+from django.db import close_old_connections
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api import events
+from api.events import EventBus
+
+
+@pytest.fixture(autouse=True)
+def bus(monkeypatch):
+    """Своя шина без опроса таблицы в фоновом потоке."""
+    monkeypatch.setattr(EventBus, 'run_poller', lambda self: None)
+    monkeypatch.setattr(events, 'bus', EventBus())
+
+
+@pytest.fixture
+def ticket(user_client):
+    response = user_client.post('/api/events/ticket/')
+    assert response.status_code == 200
+    return response.data['ticket']
+
+
+def open_stream(ticket, last_event_id=None):
+    """Статус и первое сообщение потока, поток закрывается."""
+    headers = {}
+    if last_event_id is not None:
+        headers['HTTP_LAST_EVENT_ID'] = str(last_event_id)
+    response = APIClient().get('/api/events/', {'ticket': ticket}, **headers)
+    if not response.streaming:
+        return response.status_code, None
+    first = next(iter(response.streaming_content)).decode()
+    # Как тестовый клиент: соединение с тестовой базой не закрывается.
+    request_finished.disconnect(close_old_connections)
+    try:
+        response.close()
+    finally:
+        request_finished.connect(close_old_connections)
+    return response.status_code, first
+
+
+@pytest.mark.django_db
+def test_first_message_sets_event_id(ticket):
+    status, first = open_stream(ticket)
+    assert status == 200
+    assert 'id: 0\n' in first
+
+
+@pytest.mark.django_db
+def test_expired_ticket_rejected(monkeypatch, ticket):
+    monkeypatch.setitem(events.config, 'TICKET_MAX_AGE', -1)
+    assert open_stream(ticket)[0] == 403
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('last_event_id', (None, 0))
+def test_ticket_rejected_after_logout(user_client, ticket, last_event_id):
+    assert user_client.post('/api/auth/token/logout/').status_code == 204
+    assert open_stream(ticket, last_event_id)[0] == 403
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('last_event_id', (None, 0))
+def test_ticket_rejected_after_new_login(user, token, ticket, last_event_id):
+    token.delete()
+    Token.objects.create(user=user)
+    assert open_stream(ticket, last_event_id)[0] == 403
@@ -0,0 +1,105 @@
+import pytest
+
+from api.exports import export_storage, read_download_token
+from jobs import worker
+from recipe.models import (Ingredient, IngredientInRecipe, Recipe,
+                           ShoppingCart)
+
+EXPORT_URL = '/api/recipes/download_shopping_cart/'
+
+
+@pytest.fixture
+def cart(user):
+    recipe = Recipe.objects.create(
+        author=user, name='Блины', text='Текст', cooking_time=10
+    )
+    for name, unit, amount in (('мука', 'г', 200), ('молоко', 'мл', 500)):
+        IngredientInRecipe.objects.create(
+            recipe=recipe, amount=amount,
+            ingredient=Ingredient.objects.create(
+                name=name, measurement_unit=unit
+            )
+        )
+    ShoppingCart.objects.create(user=user, recipe=recipe)
+
+
+def export(client, export_format):
+    """Выгрузка через задачу: ответ 202, воркер, результат задачи."""
+    response = client.get(EXPORT_URL, {'export': export_format})
+    assert response.status_code == 202
+    worker.run_job(worker.claim_job())
+    response = client.get(response.data['url'])
+    assert response.data['status'] == 'done', response.data['error']
+    return response.data['result']
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('export_format, content_type, marker', (
+    ('txt', 'text/plain; charset=utf-8', 'мука'.encode()),
+    ('csv', 'text/csv; charset=utf-8', 'мука,200,г'.encode()),
+    ('pdf', 'application/pdf', b'%PDF'),
+))
+def test_export_formats(user_client, cart, export_format, content_type,
+                        marker):
+    result = export(user_client, export_format)
+    response = user_client.get(result['url'])
+    assert response.status_code == 200
+    assert response['Content-Type'] == content_type
+    assert marker in b''.join(response.streaming_content)
+    response.close()
+
+
+@pytest.mark.django_db
+def test_export_reused_while_cart_unchanged(user_client, cart):
+    result = export(user_client, 'csv')
+
+    response = user_client.get(EXPORT_URL, {'export': 'csv'})
+    assert response.status_code == 200
+    assert response.data['url'] == result['url']
+
+
+@pytest.mark.django_db
+def test_export_served_by_nginx(settings, user_client, cart):
+    settings.SHOPPING_LIST_EXPORT = dict(
+        settings.SHOPPING_LIST_EXPORT, X_ACCEL_REDIRECT=True
+    )
+    result = export(user_client, 'txt')
+    response = user_client.get(result['url'])
+    assert response.status_code == 200
+    assert response['X-Accel-Redirect'].startswith('/protected/exports/')
+    assert not response.content
+
+
+@pytest.mark.django_db
+def test_export_token_expired_or_unknown(settings, user_client, cart):
+    result = export(user_client, 'txt')
+    token = result['token']
+    assert user_client.get(result['url'].replace(
+        token, token[:-1] + ('A' if token[-1] != 'A' else 'B')
+    )).status_code == 404
+
+    settings.SHOPPING_LIST_EXPORT = dict(
+        settings.SHOPPING_LIST_EXPORT, TOKEN_MAX_AGE=-1
+    )
+    assert user_client.get(result['url']).status_code == 404
+
+
+@pytest.mark.django_db
+def test_export_file_removed(user_client, cart):
+    result = export(user_client, 'txt')
+    export_storage.delete(read_download_token(result['token']))
+    assert user_client.get(result['url']).status_code == 404
+
+
+@pytest.mark.django_db
+def test_download_lists_recipes(user_client, cart):
+    response = user_client.get(EXPORT_URL)
+    assert response.status_code == 200
+    assert 'Рецепт Блины от cook\n' in response.content.decode()
+
+    result = export(user_client, 'txt')
+    response = user_client.get(result['url'])
+    assert 'Рецепт Блины от cook\n'.encode() in b''.join(
+        response.streaming_content
+    )
+    response.close()
@@ -0,0 +1,101 @@
+import pytest
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.fast_serializers import get_recipe_rows, serialize_recipe_rows
+from api.serializers import ListRecipeSerializer
+from api.views import RecipeViewSet
+from recipe.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                           ShoppingCart, Tag, User)
+
+
+@pytest.fixture
+def recipes(user):
+    author = User.objects.create_user(
+        username='baker', email='baker@example.com', password='pass12345',
+        first_name='Пекарь', last_name='Хлебов'
+    )
+    tags = [
+        Tag.objects.create(name=name, color=color, slug=slug)
+        for name, color, slug in (
+            ('Завтрак', '#E26C2D', 'breakfast'),
+            ('Ужин', '#8775D2', 'dinner'),
+        )
+    ]
+    flour = Ingredient.objects.create(name='Мука', measurement_unit='г')
+    milk = Ingredient.objects.create(name='Молоко', measurement_unit='мл')
+    recipes = []
+    for number, (recipe_author, image) in enumerate(
+            ((user, 'recipe/image/pancakes.png'), (author, ''), (author, ''))):
+        recipe = Recipe.objects.create(
+            author=recipe_author, name=f'Рецепт {number}', text='Текст',
+            cooking_time=10 + number, image=image
+        )
+        recipe.tags.set(tags[:number + 1])
+        IngredientInRecipe.objects.create(
+            recipe=recipe, ingredient=milk, amount=200 + number
+        )
+        IngredientInRecipe.objects.create(
+            recipe=recipe, ingredient=flour, amount=100
+        )
+        recipes.append(recipe)
+    Favorite.objects.create(user=user, recipe=recipes[0])
+    ShoppingCart.objects.create(user=user, recipe=recipes[1])
+    return recipes
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('authenticated', (False, True))
+@pytest.mark.parametrize('fields_query', (
+    '', 'id,name,image,cooking_time', 'id,is_favorited,is_in_shopping_cart'
+))
+def test_fast_path_matches_serializer(user, recipes, authenticated,
+                                      fields_query):
+    params = {'fields': fields_query} if fields_query else {}
+    request = Request(APIRequestFactory().get('/api/recipes/', params))
+    if authenticated:
+        request.user = user
+    view = RecipeViewSet(
+        request=request, action='list', format_kwarg=None, kwargs={}
+    )
+    fields = view.get_requested_fields()
+    queryset = view.get_queryset()
+
+    expected = JSONRenderer().render(ListRecipeSerializer(
+        queryset.all(), many=True, fields=fields,
+        context={'request': request}
+    ).data)
+    actual = JSONRenderer().render(serialize_recipe_rows(
+        get_recipe_rows(queryset.all(), fields), fields, request
+    ))
+    assert actual == expected
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params, expected', (
+    ({'fields': 'id,name'}, {'id', 'name'}),
+    ({'fields': 'id,name,unknown'}, {'id', 'name'}),
+    ({'omit': 'author,ingredients,text'},
+     set(ListRecipeSerializer.Meta.fields)
+     - {'author', 'ingredients', 'text'}),
+    ({'fields': 'id,name,tags', 'omit': 'tags'}, {'id', 'name'}),
+))
+def test_sparse_fields(user_client, recipes, params, expected):
+    response = user_client.get('/api/recipes/', params)
+    assert response.status_code == 200
+    assert all(
+        set(recipe) == expected for recipe in response.data['results']
+    )
+    response = user_client.get(f'/api/recipes/{recipes[0].pk}/', params)
+    assert set(response.data) == expected
+
+
+@pytest.mark.django_db
+def test_anonymous_fields_without_user_flags(recipes):
+    response = APIClient().get(
+        '/api/recipes/', {'fields': 'id,is_favorited'}
+    )
+    assert all(
+        set(recipe) == {'id'} for recipe in response.data['results']
+    )
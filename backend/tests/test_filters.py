@@ -0,0 +1,67 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipe.models import Recipe, Tag
+
+
+@pytest.fixture
+def tags():
+    return [
+        Tag.objects.create(name=name, color=color, slug=slug)
+        for name, color, slug in (
+            ('Завтрак', '#E26C2D', 'breakfast'),
+            ('Обед', '#49B64E', 'lunch'),
+            ('Ужин', '#8775D2', 'dinner'),
+        )
+    ]
+
+
+@pytest.fixture
+def recipes(user, tags):
+    recipes = []
+    for number, recipe_tags in enumerate(
+            (tags[:2], tags[1:2], tags[2:])):
+        recipe = Recipe.objects.create(
+            author=user, name=f'Рецепт {number}', text='Текст',
+            cooking_time=10
+        )
+        recipe.tags.set(recipe_tags)
+        recipes.append(recipe)
+    return recipes
+
+
+@pytest.mark.django_db
+def test_tags_filter_without_duplicates_and_distinct(recipes):
+    with CaptureQueriesContext(connection) as queries:
+        response = APIClient().get(
+            '/api/recipes/', {'tags': ['breakfast', 'lunch']}
+        )
+    assert response.status_code == 200
+    ids = [recipe['id'] for recipe in response.data['results']]
+    assert sorted(ids) == sorted([recipes[0].pk, recipes[1].pk])
+    assert response.data['count'] == 2
+    assert not any(
+        'DISTINCT' in query['sql'].upper() for query in queries
+    )
+
+
+def filter_by_tag(channel):
+    """
+    Другой процесс: фильтр по тэгам работает до и после создания
+    нового тэга в основном процессе.
+    """
+    client = APIClient()
+    channel.put(client.get('/api/recipes/', {'tags': 'lunch'}).status_code)
+    channel.wait()
+    channel.put(client.get('/api/recipes/', {'tags': 'brunch'}).status_code)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_new_tag_accepted_in_other_process(other_process, recipes):
+    channel = other_process(filter_by_tag)
+    assert channel.get() == 200
+    Tag.objects.create(name='Бранч', color='#FFD700', slug='brunch')
+    channel.proceed()
+    assert channel.get() == 200
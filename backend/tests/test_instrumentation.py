@@ -0,0 +1,87 @@
+import pytest
+from django.core.signals import request_finished
+from django.db import close_old_connections, connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from foodgram import profiling, querylog
+from foodgram.metrics import registry
+from recipe.models import Follow, Recipe, User
+
+ROUTE = 'users-subscriptions'
+
+
+@pytest.fixture
+def subscriptions(user):
+    for number in range(3):
+        author = User.objects.create_user(
+            username=f'author{number}', email=f'author{number}@example.com',
+            password='pass12345', first_name='Автор', last_name='Авторов'
+        )
+        Recipe.objects.create(
+            author=author, name=f'Рецепт {number}', text='Текст',
+            cooking_time=10
+        )
+        Follow.objects.create(user=user, author=author)
+
+
+def get_queries_sum():
+    return registry.collect()[0].get(
+        ('db_queries_per_request_sum', (('route', ROUTE),)), 0
+    )
+
+
+@pytest.mark.django_db
+def test_streamed_queries_are_measured(user_client, subscriptions):
+    querylog.query_stats.reset()
+    before = get_queries_sum()
+    with CaptureQueriesContext(connection) as queries:
+        response = user_client.get('/api/users/subscriptions/')
+        assert response.streaming
+        b''.join(response.streaming_content)
+
+    assert get_queries_sum() - before == len(queries)
+    assert sum(
+        query['count'] for query in querylog.query_stats.top()
+        if query['view'] == ROUTE
+    ) == len(queries)
+
+
+@pytest.mark.django_db
+def test_streamed_response_profiled_to_the_end(user, subscriptions):
+    user.is_staff = True
+    user.save()
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}'
+    )
+    response = client.get('/api/users/subscriptions/', HTTP_X_PROFILE='1')
+    b''.join(response.streaming_content)
+
+    assert not profiling._lock.locked()
+    report = profiling.get_report(response['X-Profile-Id'])
+    # Рецепты авторов подгружаются уже во время отдачи.
+    assert any(
+        'recipe_recipe' in query['sql']
+        for query in report['sql']['queries']
+    )
+
+
+@pytest.mark.django_db
+def test_profiling_lock_released_when_stream_not_read(user, subscriptions):
+    user.is_staff = True
+    user.save()
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}'
+    )
+    response = client.get('/api/users/subscriptions/', HTTP_X_PROFILE='1')
+    assert profiling._lock.locked()
+    # Как тестовый клиент: соединение с тестовой базой не закрывается.
+    request_finished.disconnect(close_old_connections)
+    try:
+        response.close()
+    finally:
+        request_finished.connect(close_old_connections)
+    assert not profiling._lock.locked()
@@ -0,0 +1,140 @@
+import signal
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from jobs import worker
+from jobs.models import Job
+from jobs.registry import TASKS, Task, enqueue
+
+
+@pytest.fixture
+def tasks(monkeypatch, settings):
+    """Тестовые задачи: 'echo' возвращает payload, 'fail' падает."""
+    settings.JOBS = dict(settings.JOBS, RETRY_DELAY=5, RETRY_DELAY_MAX=12)
+
+    def fail(payload, job):
+        raise ValueError('секретные подробности')
+
+    monkeypatch.setitem(TASKS, 'echo', Task(
+        lambda payload, job: payload, 3, 0
+    ))
+    monkeypatch.setitem(TASKS, 'fail', Task(fail, 3, 0))
+
+
+@pytest.mark.django_db
+def test_claim_takes_job_once(tasks):
+    low = enqueue('echo', {'n': 1})
+    high = enqueue('echo', {'n': 2}, priority=5)
+    enqueue('echo', {'n': 3}, delay=60)
+
+    assert worker.claim_job().pk == high.pk
+    assert worker.claim_job().pk == low.pk
+    assert worker.claim_job() is None
+
+    # Задача упавшего воркера снова доступна после locked_until.
+    Job.objects.filter(pk=low.pk).update(
+        locked_until=timezone.now() - timedelta(seconds=1)
+    )
+    job = worker.claim_job()
+    assert (job.pk, job.attempts) == (low.pk, 2)
+
+
+@pytest.mark.django_db
+def test_retry_with_backoff_then_fail(tasks):
+    job = enqueue('fail')
+    delays = []
+    for _ in range(job.max_attempts):
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        started = timezone.now()
+        worker.run_job(worker.claim_job())
+        job.refresh_from_db()
+        delays.append(round((job.run_after - started).total_seconds()))
+
+    assert job.status == Job.FAILED
+    assert job.attempts == 3
+    assert 'ValueError' in job.error
+    assert delays[:2] == [5, 10]
+    assert worker.get_retry_delay(3) == 12
+
+
+@pytest.mark.django_db
+def test_error_traceback_only_for_staff(tasks, user, user_client,
+                                        django_user_model):
+    job = enqueue('fail', user=user)
+    worker.run_job(worker.claim_job())
+
+    response = user_client.get(f'/api/jobs/{job.pk}/')
+    assert response.status_code == 200
+    assert response.data['error'] == 'Ошибка при выполнении задачи.'
+
+    admin = django_user_model.objects.create_user(
+        username='admin', email='admin@example.com', password='pass12345',
+        is_staff=True
+    )
+    client = APIClient()
+    client.force_authenticate(admin)
+    response = client.get(f'/api/jobs/{job.pk}/')
+    assert 'секретные подробности' in response.data['error']
+
+
+@pytest.mark.django_db
+def test_idempotency_key_reused(tasks):
+    job = enqueue('echo', key='export:1')
+    assert enqueue('echo', key='export:1').pk == job.pk
+
+    worker.run_job(worker.claim_job())
+    assert enqueue('echo', key='export:1').pk == job.pk
+
+    # Ключ задачи с ошибкой освобождается.
+    Job.objects.filter(pk=job.pk).update(status=Job.FAILED)
+    retried = enqueue('echo', key='export:1')
+    assert retried.pk != job.pk
+    job.refresh_from_db()
+    assert job.idempotency_key is None
+
+
+@pytest.fixture
+def keep_signal_handlers():
+    """run_workers ставит свои обработчики SIGTERM и SIGINT."""
+    handlers = {
+        signum: signal.getsignal(signum)
+        for signum in (signal.SIGTERM, signal.SIGINT)
+    }
+    yield
+    for signum, handler in handlers.items():
+        signal.signal(signum, handler)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_run_workers_burst(tasks, keep_signal_handlers):
+    jobs = [enqueue('echo', {'n': number}) for number in range(3)]
+
+    call_command(
+        'run_workers', '--burst', '--concurrency', '2', stdout=StringIO()
+    )
+
+    assert [
+        (job.status, job.get_result()) for job in
+        Job.objects.filter(pk__in=[job.pk for job in jobs]).order_by('pk')
+    ] == [(Job.DONE, {'n': number}) for number in range(3)]
+
+
+@pytest.mark.django_db
+def test_compact_changelog_prunes_finished_jobs(tasks):
+    old, recent, queued = (enqueue('echo') for _ in range(3))
+    Job.objects.filter(pk__in=[old.pk, recent.pk]).update(
+        status=Job.DONE, finished=timezone.now()
+    )
+    Job.objects.filter(pk=old.pk).update(
+        finished=timezone.now() - timedelta(days=8)
+    )
+
+    call_command('compact_changelog', stdout=StringIO())
+    assert set(Job.objects.values_list('pk', flat=True)) == {
+        recent.pk, queued.pk
+    }
@@ -0,0 +1,27 @@
+import pytest
+from rest_framework.test import APIClient
+
+from recipe.models import Recipe
+
+
+def read_profile(channel, key):
+    """
+    Другой процесс: профиль попадает в кэш, после создания рецепта
+    в основном процессе читается ещё раз.
+    """
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+    channel.put(client.get('/api/users/me/profile/').data['recipes_count'])
+    channel.wait()
+    channel.put(client.get('/api/users/me/profile/').data['recipes_count'])
+
+
+@pytest.mark.django_db(transaction=True)
+def test_profile_reset_in_other_process(other_process, user, token):
+    channel = other_process(read_profile, token.key)
+    assert channel.get() == 0
+    Recipe.objects.create(
+        author=user, name='Рецепт', text='Текст', cooking_time=10
+    )
+    channel.proceed()
+    assert channel.get() == 1
@@ -0,0 +1,33 @@
+import pytest
+from django.core.cache import caches
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipe.models import User
+
+
+@pytest.fixture
+def staff_client():
+    admin = User.objects.create_superuser(
+        username='admin', email='admin@example.com', password='pass12345',
+        first_name='Админ', last_name='Админов'
+    )
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=admin).key}'
+    )
+    return client
+
+
+@pytest.mark.django_db
+def test_report_and_rate_shared_between_workers(staff_client):
+    response = staff_client.get('/api/tags/', HTTP_X_PROFILE='1')
+    assert response['X-Profile-Status'] == 'done'
+    # Другой воркер: своего locmem-кэша у него нет.
+    caches['default'].clear()
+
+    report = staff_client.get(f'/api/profiles/{response["X-Profile-Id"]}/')
+    assert report.status_code == 200
+    assert report.data['path'] == '/api/tags/'
+    response = staff_client.get('/api/tags/', HTTP_X_PROFILE='1')
+    assert response['X-Profile-Status'] == 'rate-limited'
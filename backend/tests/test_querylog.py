@@ -0,0 +1,90 @@
+import json
+import os
+import time
+
+import pytest
+from rest_framework.test import APIClient
+
+from foodgram import querylog
+from recipe.models import User
+
+QUERY = {
+    'id': 'abc', 'view': 'api:recipes-list', 'sql': 'SELECT ?',
+    'count': 3, 'total_ms': 30.0, 'max_ms': 20.0, 'avg_ms': 10.0,
+}
+
+
+@pytest.fixture(autouse=True)
+def empty_stats():
+    querylog.query_stats.reset()
+
+
+@pytest.fixture
+def admin_client():
+    admin = User.objects.create_superuser(
+        username='admin', email='admin@example.com', password='pass12345',
+        first_name='Админ', last_name='Админов'
+    )
+    client = APIClient()
+    client.force_authenticate(admin)
+    return client
+
+
+def write_window(path, window):
+    with open(path, 'a', encoding='utf-8') as window_file:
+        window_file.write(json.dumps(window) + '\n')
+
+
+@pytest.mark.django_db
+def test_windows_of_other_processes_are_merged(monkeypatch, tmp_path,
+                                               admin_client):
+    monkeypatch.setitem(querylog.config, 'DIR', str(tmp_path))
+    querylog.query_stats.record('api:recipes-list', 'SELECT 1', 5.0)
+    # Живой процесс - родитель pytest, умерший - заведомо несуществующий pid.
+    for pid in (os.getppid(), 2 ** 22 + 1):
+        with open(tmp_path / f'{pid}.json', 'w') as dump_file:
+            json.dump({
+                'current': {'started': time.time(), 'queries': [QUERY]},
+                'last': {'started': None, 'finished': None, 'queries': []},
+            }, dump_file)
+
+    response = admin_client.get('/api/querylog/')
+
+    assert response.status_code == 200
+    assert response.data['processes'] == 2
+    query = next(
+        query for query in response.data['queries']
+        if query['view'] == 'api:recipes-list'
+    )
+    assert query['count'] == 4
+    assert query['total_ms'] == 35.0
+    assert query['max_ms'] == 20.0
+
+
+@pytest.mark.django_db
+def test_flushed_windows_from_file(monkeypatch, tmp_path, admin_client):
+    log_path = tmp_path / 'querylog.jsonl'
+    monkeypatch.setitem(querylog.config, 'FILE', str(log_path))
+    now = time.time()
+    for finished in (now - 3600, now - 120, now - 60):
+        write_window(log_path, {
+            'started': finished - 60, 'finished': finished, 'pid': 1,
+            'queries': [QUERY],
+        })
+
+    response = admin_client.get('/api/querylog/', {'minutes': 5})
+
+    assert response.status_code == 200
+    query = next(
+        query for query in response.data['queries']
+        if query['sql'] == 'SELECT ?'
+    )
+    assert query['count'] == 6
+    assert response.data['started'] == pytest.approx(now - 180)
+
+
+@pytest.mark.django_db
+def test_minutes_without_file(monkeypatch, admin_client):
+    monkeypatch.setitem(querylog.config, 'FILE', None)
+    response = admin_client.get('/api/querylog/', {'minutes': 5})
+    assert response.status_code == 400
@@ -0,0 +1,57 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.permissions import IsAdminOrAuthorOrReadOnly
+from recipe import read_model
+from recipe.models import Recipe, RecipeCard
+
+
+@pytest.fixture
+def recipe(user):
+    # Транзакция теста не коммитится: карточку хук не собирает.
+    return Recipe.objects.create(
+        author=user, name='Рецепт', text='Текст', cooking_time=10
+    )
+
+
+@pytest.mark.django_db
+def test_read_does_not_write_cards(recipe):
+    with CaptureQueriesContext(connection) as queries:
+        response = APIClient().get(f'/api/recipes/{recipe.pk}/')
+    assert response.status_code == 200
+    assert response.data['name'] == 'Рецепт'
+    assert not RecipeCard.objects.exists()
+    assert not any(
+        'recipe_recipecard' in query['sql']
+        and not query['sql'].startswith('SELECT')
+        for query in queries
+    )
+
+    read_model.refresh([recipe.pk])
+    assert RecipeCard.objects.filter(recipe_id=recipe.pk).exists()
+
+
+@pytest.mark.django_db
+def test_retrieve_checks_object_permissions(monkeypatch, user_client,
+                                            recipe):
+    monkeypatch.setattr(
+        IsAdminOrAuthorOrReadOnly, 'has_object_permission',
+        lambda self, request, view, obj: False
+    )
+    response = user_client.get(f'/api/recipes/{recipe.pk}/')
+    assert response.status_code == 403
+
+
+@pytest.mark.django_db
+def test_fill_creates_missing_cards(user, recipe):
+    other = Recipe.objects.create(
+        author=user, name='Другой', text='Текст', cooking_time=5
+    )
+    read_model.refresh([recipe.pk])
+
+    assert read_model.fill(batch_size=1) == 1
+    card = RecipeCard.objects.get(recipe_id=other.pk)
+    assert card.recipe_updated_at == other.updated_at
+    assert read_model.fill() == 0
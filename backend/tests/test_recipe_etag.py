@@ -0,0 +1,57 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipe.models import Recipe
+
+
+@pytest.fixture
+def recipe(user):
+    return Recipe.objects.create(
+        author=user, name='Рецепт', text='Текст', cooking_time=10
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('authenticated', (False, True))
+def test_not_modified_with_one_query(user_client, recipe, authenticated):
+    client = user_client if authenticated else APIClient()
+    url = f'/api/recipes/{recipe.pk}/'
+    etag = client.get(url)['ETag']
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert response['ETag'] == etag
+    assert len([
+        query for query in queries if 'recipe_recipe' in query['sql']
+    ]) == 1
+
+
+@pytest.mark.django_db
+def test_favorite_changes_etag(user_client, recipe):
+    url = f'/api/recipes/{recipe.pk}/'
+    response = user_client.get(url)
+    etag = response['ETag']
+    assert response.data['is_favorited'] is False
+
+    assert user_client.post(f'{url}favorite/').status_code == 201
+    response = user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.data['is_favorited'] is True
+    assert response['ETag'] != etag
+
+    response = user_client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+    assert response.status_code == 304
+
+
+@pytest.mark.django_db
+def test_etag_depends_on_fields(user_client, recipe):
+    url = f'/api/recipes/{recipe.pk}/'
+    etag = user_client.get(url)['ETag']
+    response = user_client.get(
+        url, {'fields': 'id,name'}, HTTP_IF_NONE_MATCH=etag
+    )
+    assert response.status_code == 200
+    assert set(response.data) == {'id', 'name'}
@@ -0,0 +1,144 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from recipe.models import (Ingredient, IngredientInRecipe, Recipe,
+                           ShoppingCart, ShoppingListItem,
+                           ShoppingListItemQuerySet, Tag)
+
+
+@pytest.fixture
+def ingredients():
+    return [
+        Ingredient.objects.create(name=name, measurement_unit='г')
+        for name in ('мука', 'сахар', 'соль')
+    ]
+
+
+@pytest.fixture
+def recipes(user, ingredients):
+    flour, sugar, salt = ingredients
+    recipes = []
+    for name, amounts in (
+            ('Блины', ((flour, 200), (sugar, 30))),
+            ('Хлеб', ((flour, 500), (salt, 10)))):
+        recipe = Recipe.objects.create(
+            author=user, name=name, text='Текст', cooking_time=10
+        )
+        for ingredient, amount in amounts:
+            IngredientInRecipe.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=amount
+            )
+        recipes.append(recipe)
+    return recipes
+
+
+def shopping_list(user):
+    return dict(ShoppingListItem.objects.filter(user=user).values_list(
+        'ingredient__name', 'amount'
+    ))
+
+
+def assert_consistent():
+    stored = {
+        (user_id, ingredient_id): amount
+        for user_id, ingredient_id, amount
+        in ShoppingListItem.objects.values_list(
+            'user_id', 'ingredient_id', 'amount'
+        )
+    }
+    assert stored == ShoppingListItem.objects.expected()
+
+
+@pytest.mark.django_db
+def test_add_and_remove_cart(user_client, user, recipes):
+    for recipe in recipes:
+        response = user_client.post(f'/api/recipes/{recipe.pk}/shopping_cart/')
+        assert response.status_code == 201
+    assert shopping_list(user) == {'мука': 700, 'сахар': 30, 'соль': 10}
+
+    response = user_client.delete(
+        f'/api/recipes/{recipes[0].pk}/shopping_cart/'
+    )
+    assert response.status_code == 204
+    assert shopping_list(user) == {'мука': 500, 'соль': 10}
+    assert_consistent()
+
+
+@pytest.mark.django_db
+def test_recipe_edit_updates_carts(user_client, user, recipes, ingredients):
+    flour, sugar, salt = ingredients
+    tag = Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+    ShoppingCart.objects.create(user=user, recipe=recipes[0])
+
+    response = user_client.patch(
+        f'/api/recipes/{recipes[0].pk}/', {
+            'name': 'Блины', 'text': 'Текст', 'cooking_time': 10,
+            'tags': [tag.pk],
+            'ingredients': [
+                {'id': flour.pk, 'amount': 250},
+                {'id': salt.pk, 'amount': 5},
+            ],
+        }, format='json'
+    )
+    assert response.status_code == 200, response.data
+    assert shopping_list(user) == {'мука': 250, 'соль': 5}
+
+    item = IngredientInRecipe.objects.get(recipe=recipes[0], ingredient=flour)
+    item.amount = 300
+    item.save()
+    assert shopping_list(user) == {'мука': 300, 'соль': 5}
+    assert_consistent()
+
+
+@pytest.mark.django_db
+def test_recipe_delete_updates_carts(user, recipes):
+    for recipe in recipes:
+        ShoppingCart.objects.create(user=user, recipe=recipe)
+
+    recipes[1].delete()
+    assert shopping_list(user) == {'мука': 200, 'сахар': 30}
+    assert_consistent()
+
+
+@pytest.mark.django_db
+def test_add_retries_row_inserted_concurrently(monkeypatch, user,
+                                               ingredients):
+    flour = ingredients[0]
+    add_existing = ShoppingListItemQuerySet._add_existing
+    calls = []
+
+    def racing(self, user_ids, ingredient_id, delta):
+        added = add_existing(self, user_ids, ingredient_id, delta)
+        if not calls:
+            # Параллельная транзакция вставила строку после проверки.
+            ShoppingListItem.objects.create(
+                user=user, ingredient=flour, amount=5
+            )
+        calls.append(added)
+        return added
+
+    monkeypatch.setattr(ShoppingListItemQuerySet, '_add_existing', racing)
+    ShoppingListItem.objects.add([user.pk], {flour.pk: 100})
+
+    assert calls == [set(), {user.pk}]
+    assert shopping_list(user) == {'мука': 105}
+
+
+@pytest.mark.django_db
+def test_check_shopping_lists(user, recipes):
+    ShoppingCart.objects.create(user=user, recipe=recipes[0])
+    ShoppingListItem.objects.filter(user=user).update(amount=1)
+
+    out = StringIO()
+    call_command('check_shopping_lists', stdout=out)
+    assert f'[{user.pk}]' in out.getvalue()
+    assert shopping_list(user) == {'мука': 1, 'сахар': 1}
+
+    call_command('check_shopping_lists', '--fix', stdout=StringIO())
+    assert shopping_list(user) == {'мука': 200, 'сахар': 30}
+
+    out = StringIO()
+    call_command('check_shopping_lists', stdout=out)
+    assert 'Расхождений нет' in out.getvalue()
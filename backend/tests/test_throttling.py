@@ -0,0 +1,73 @@
+import pytest
+from django.core.cache import caches
+from rest_framework.test import APIClient
+
+from api import throttling
+from api.throttling import CostThrottle, MeasuredCosts
+
+
+@pytest.fixture
+def small_buckets(settings):
+    settings.THROTTLE = dict(settings.THROTTLE, BUCKETS={
+        'user': {'CAPACITY': 3, 'RATE': 0.001},
+        'ip': {'CAPACITY': 3, 'RATE': 0.001},
+    }, COSTS={'tag.list': 1})
+
+
+@pytest.mark.django_db
+def test_forwarded_for_does_not_reset_ip_bucket(small_buckets):
+    client = APIClient()
+    statuses = [
+        client.get(
+            '/api/tags/', HTTP_X_FORWARDED_FOR=f'10.0.0.{number}, 127.0.0.1'
+        ).status_code
+        for number in range(4)
+    ]
+    assert statuses == [200, 200, 200, 429]
+
+
+@pytest.mark.django_db
+def test_user_bucket_is_shared_between_addresses(
+        small_buckets, user_client):
+    for _ in range(3):
+        assert user_client.get('/api/tags/').status_code == 200
+    assert user_client.get('/api/tags/').status_code == 429
+
+    other_client = APIClient(REMOTE_ADDR='10.0.0.2')
+    other_client.credentials(**user_client._credentials)
+    assert other_client.get('/api/tags/').status_code == 429
+    # Списание из ведра IP возвращено вместе с отказом.
+    window = int(CostThrottle.timer() // (3 / 0.001))
+    assert caches['shared'].get(
+        CostThrottle().get_key('ip', '10.0.0.2', window)
+    ) == 0
+
+
+@pytest.mark.django_db
+def test_bucket_refills_over_time(monkeypatch, small_buckets):
+    now = [1000000.0]
+    monkeypatch.setattr(CostThrottle, 'timer', lambda self=None: now[0])
+    client = APIClient()
+    for _ in range(3):
+        assert client.get('/api/tags/').status_code == 200
+    response = client.get('/api/tags/')
+    assert response.status_code == 429
+    assert int(response['Retry-After']) > 0
+
+    # Через два окна (CAPACITY / RATE) ведро снова полное.
+    now[0] += 3 / 0.001 * 2
+    for _ in range(3):
+        assert client.get('/api/tags/').status_code == 200
+
+
+@pytest.mark.django_db
+def test_stream_cost_excludes_client_reading(monkeypatch):
+    costs = MeasuredCosts()
+    monkeypatch.setattr(throttling, 'measured_costs', costs)
+    response = APIClient().get('/api/ingredients/')
+    assert response.streaming
+    measured = costs.get('ingredient.list')
+    assert measured is not None
+
+    b''.join(response.streaming_content)
+    assert costs.get('ingredient.list') == measured
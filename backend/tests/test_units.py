@@ -0,0 +1,67 @@
+import pytest
+
+from api.units import canonical_unit, humanize, to_base
+from api.utils import aggregate_ingredients, create_text_with_ingredients
+
+
+@pytest.mark.parametrize('unit, expected', (
+    ('Шт.', 'шт'), ('Ст. л.', 'ст. л.'), ('ч.л.', 'ч. л.'), ('гр', 'г'),
+    ('  КГ ', 'кг'), ('щепотка', 'щепотка'),
+))
+def test_canonical_unit(unit, expected):
+    assert canonical_unit(unit) == expected
+
+
+@pytest.mark.parametrize('amount, unit, liquid, expected', (
+    (2, 'кг', False, (2000, 'г')),
+    (300, 'г', False, (300, 'г')),
+    (1, 'л', False, (1000, 'мл')),
+    (3, 'шт.', False, (3, 'шт')),
+    (2, 'ст. л.', False, (2, 'ст. л.')),
+    (2, 'ст. л.', True, (30, 'мл')),
+    (1, 'стакан', True, (200, 'мл')),
+    (5, 'щепотка', True, (5, 'щепотка')),
+))
+def test_to_base(amount, unit, liquid, expected):
+    assert to_base(amount, unit, liquid=liquid) == expected
+
+
+@pytest.mark.parametrize('amount, unit, expected', (
+    (999, 'г', (999, 'г')),
+    (1000, 'г', (1, 'кг')),
+    (1250, 'г', (1.25, 'кг')),
+    (1333, 'мл', (1.33, 'л')),
+    (5, 'шт', (5, 'шт')),
+))
+def test_humanize(amount, unit, expected):
+    assert humanize(amount, unit) == expected
+
+
+def test_aggregate_converts_spoons_only_for_liquids():
+    shopping_list = aggregate_ingredients([
+        ('Молоко', 'л', 1),
+        ('молоко', 'стакан', 1),
+        ('Соль', 'ч. л.', 2),
+        ('соль', 'г', 5),
+        ('Мука', 'кг', 1),
+        ('мука', 'г', 500),
+    ])
+    assert shopping_list == [
+        {'name': 'Молоко', 'amount': 1.2, 'measurement_unit': 'л'},
+        {'name': 'Мука', 'amount': 1.5, 'measurement_unit': 'кг'},
+        {'name': 'соль', 'amount': 5, 'measurement_unit': 'г'},
+        {'name': 'Соль', 'amount': 2, 'measurement_unit': 'ч. л.'},
+    ]
+
+
+def test_text_lists_recipes_before_totals():
+    text = create_text_with_ingredients(
+        [{'name': 'Мука', 'amount': 200, 'measurement_unit': 'г'}],
+        [('Блины', 'cook'), ('Хлеб', 'baker')]
+    )
+    assert text == (
+        'Список покупок:\n\n'
+        'Рецепт Блины от cook\n'
+        'Рецепт Хлеб от baker\n\n'
+        'Мука - 200 г\n'
+    )